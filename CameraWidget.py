@@ -6,29 +6,27 @@
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QPushButton, QGridLayout, QComboBox, QSlider, QLineEdit
     )
-from PyQt5.QtGui import QPixmap, QImage
+from PyQt5.QtGui import QImage, QPainter
 
 # Standard
 import numpy as np
 import cv2
 import sys
 import math
+import time
 
 from PyQt5.QtWidgets import QMainWindow, QLabel, QComboBox, QWidget, QGroupBox
-from PyQt5.QtCore import QTimer, Qt
-
-# Camera
-from pyueye import ueye
-import cameraUeye as camera
-if camera.get_nb_of_cam() == 0 :
-    import cameraBasler as camera
-    if camera.get_nb_of_cam() == 0 :
-        print("No camera detected, try to search for an answer.")
-        sys.exit()
-    else:
-        print("Using a Basler camera.")
-else:
-    print('Using a uEye camera.')
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal, QSize
+
+# Acquisition
+from cameraAcquisition import FrameRingBuffer, AcquisitionThread, BurstCapture, PipelineStats
+from cameraRecorder import FrameRecorder
+
+# Display
+from cameraDisplay import DisplayScaler, DisplayLUT, DisplayScheduler, FramePyramid, get_buffer
+
+# Camera : the backends are imported and enumerated lazily, in background threads
+from cameraBackends import registry, STARTUP_TIME
 
 #-----------------------------------------------------------------------------------------------
 
@@ -39,9 +37,31 @@ class Camera_Widget(QWidget):
         QWidget (class): QWidget can be put in another widget and / or window.
     """
 
-    def __init__(self, colormode = "MONO8", type = "basler"):
+    # Emitted in the GUI thread once the list of the cameras is known
+    camerasDiscovered = pyqtSignal()
+    discoveryFinished = pyqtSignal()
+
+    # Emitted in the GUI thread with the BurstCapture once its stack is full
+    burstFinished = pyqtSignal(object)
+
+    # Emitted by the acquisition thread with the AOI (x, y, width, height) if its offset could not be moved
+    aoiOffsetFailed = pyqtSignal(int, int, int, int)
+
+    # Emitted by the acquisition thread with a message if the camera is lost or a command failed
+    acquisitionError = pyqtSignal(str)
+
+    def __init__(self, colormode = "MONO8", type = "basler", nbBuffers = 4, baslerGrabMode = "callback", aoiDelay = 200,
+                 displayRate = None):
         """
         Initialisation of our camera widget.
+
+        Args:
+            colormode (str, optional): "MONO8", "MONO10" or "MONO12". Defaults to "MONO8".
+            type (str, optional): "basler", "ueye", "simulated" or "replay", set by connectCamera. Defaults to "basler".
+            nbBuffers (int, optional): number of frames in the acquisition ring. Defaults to 4.
+            baslerGrabMode (str, optional): "retrieve" or "callback" grab mode of a Basler camera. Defaults to "callback".
+            aoiDelay (int, optional): time in ms during which AOI changes are gathered before being applied. Defaults to 200.
+            displayRate (float, optional): maximum number of display refreshes per second. Defaults to None (refresh rate of the monitor).
         """
         super().__init__(parent=None)
 
@@ -55,17 +75,45 @@ class Camera_Widget(QWidget):
         self.colormode = colormode
         self.aoiTrueFalse = False
         self.camera = None
+        self.cameraModule = None
         self.type = type
+        self.firstFrameShown = False
+
+        # Acquisition (worker thread filling the ring, the GUI only reads the latest frame)
+        self.nbBuffers = nbBuffers
+        self.baslerGrabMode = baslerGrabMode
+        self.frameRing = None
+        self.acquisitionThread = None
+        self.lastFrameCount = 0
+        self.displayedFrameCount = 0
+
+        # Copies of the latest frame read by the consumers, never overwritten by the acquisition thread.
+        # Two copies, so the previous frame stays valid while the next one is copied
+        self.frameCopies = [None, None]
+        self.cameraFrame = None
+        self.cameraFrameInfo = (0, 0, 0)
+        self.recorder = None
+        self.temporalHistogram = None
+        self.pipelineStats = PipelineStats()
+        self.errorMessage = None
+
+        # AOI transaction : the AOI requested by the sliders is only applied once they stop moving
+        self.pendingAOI = None
+        self.aoiTimer = QTimer()
+        self.aoiTimer.setSingleShot(True)
+        self.aoiTimer.setInterval(aoiDelay)
+        self.aoiTimer.timeout.connect(self.applyPendingAOI)
+        self.aoiOffsetFailed.connect(self.forceAOI)
+        self.acquisitionError.connect(self.setErrorMessage)
 
         # Graphical interface
         self.cameraInfo = QLabel("Camera Info")
         self.cameraListCombo = QComboBox()
         self.initListCamera()
 
-        self.cameraDisplay = QLabel()
-        
-        # Center the camera widget
-        self.cameraDisplay.setAlignment(Qt.AlignCenter)
+        self.cameraDisplay = Frame_Display_Widget()
+        self.cameraDisplay.viewChanged.connect(self.showFrame)
+        self.cameraDisplay.cursorMoved.connect(self.updatePixelInfo)
 
         # Create a self.layout and add widgets
         self.layout = QGridLayout()
@@ -74,6 +122,17 @@ class Camera_Widget(QWidget):
         
         self.setLayout(self.layout)
 
+        # Display path, its buffers are kept from one frame to the next
+        self.displayScaler = DisplayScaler()
+        self.displayLUT = DisplayLUT()
+        self.framePyramid = FramePyramid()
+
+        # Rate of the display, capped at the monitor and slowed down if the refreshes take too long
+        if displayRate is None:
+            screen = QApplication.primaryScreen()
+            displayRate = screen.refreshRate() if screen is not None and screen.refreshRate() > 0 else 60
+        self.displayScheduler = DisplayScheduler(displayRate)
+
         # Other variables
         self.timerUpdate = QTimer()
         self.frameWidth = self.cameraDisplay.width()
@@ -82,64 +141,328 @@ class Camera_Widget(QWidget):
 
     def launchVideo(self):
         """
-        Method used to launch the video.
+        Method used to launch the video. The display timer runs at the rate of the display scheduler,
+        whatever the frame rate of the camera : the acquisition thread takes every frame anyway.
         """
-        self.timerUpdate.setInterval(int(self.camera.get_frame_rate()))
+        self.timerUpdate.setInterval(self.displayScheduler.get_interval())
         self.timerUpdate.timeout.connect(self.refreshGraph)
         self.timerUpdate.start()    
 
+    def startAcquisition(self):
+        """
+        Method used to create the frame ring at the current AOI size and to start the acquisition thread.
+        The camera must already be allocated and capturing.
+        """
+        AOIX, AOIY, AOIWidth, AOIHeight = self.camera.get_aoi()
+        dtype = np.uint16 if self.bytes_per_pixel >= 2 else np.uint8
+
+        self.frameRing = FrameRingBuffer(self.nbBuffers, AOIHeight, AOIWidth, dtype)
+        self.lastFrameCount = 0
+        self.displayedFrameCount = 0
+        self.errorMessage = None
+
+        self.acquisitionThread = AcquisitionThread(self.camera, self.frameRing, self.bytes_per_pixel, self.pipelineStats,
+                                                   on_error = self.acquisitionError.emit)
+
+        self.acquisitionThread.start()
+
+        # The frames of another AOI are not added to the previous ones
+        if self.temporalHistogram is not None:
+            self.temporalHistogram.reset()
+            self.temporalHistogram.start_feeding(self.frameRing)
+
+    def stopAcquisition(self):
+        """
+        Method used to stop the acquisition thread. The ring is kept so the last frames can still be read.
+        """
+        if self.temporalHistogram is not None:
+            self.temporalHistogram.stop_feeding()
+        if self.acquisitionThread is not None:
+            self.acquisitionThread.stop()
+            self.acquisitionThread = None
+
+    def setErrorMessage(self, message):
+        """
+        Method used to keep the last error of the acquisition thread, shown by the status bar.
+
+        Args:
+            message (str): description of the error.
+        """
+        self.errorMessage = message
+
+    def isAcquiring(self):
+        """
+        Method used to know if the acquisition thread is running.
+
+        Returns:
+            bool: True if the acquisition thread is running.
+        """
+        return self.acquisitionThread is not None and self.acquisitionThread.is_alive()
+
+    def isBurstRunning(self):
+        """
+        Method used to know if a burst is being captured.
+
+        Returns:
+            bool: True if the acquisition thread is filling a burst.
+        """
+        return self.isAcquiring() and self.acquisitionThread.burst is not None
+
+    def startBurst(self, nbFrames):
+        """
+        Method used to capture nbFrames consecutive frames at the rate of the sensor. The acquisition thread
+        fills the stack without the GUI, then burstFinished is emitted. The display is frozen during the burst.
+
+        Args:
+            nbFrames (int): number of frames of the burst.
+
+        Returns:
+            BurstCapture: burst, whose stack (nbFrames, height, width) is full once burst.wait() returns.
+                          None if there is no acquisition or if a burst is already running.
+        """
+        if not self.isAcquiring() or self.isBurstRunning():
+            print("Burst : no acquisition running or burst already running.")
+            return None
+
+        burst = BurstCapture(nbFrames, self.frameRing.height, self.frameRing.width, self.frameRing.dtype,
+                             callback = self.burstFinished.emit)
+        self.acquisitionThread.start_burst(burst)
+        return burst
+
+    def setTemporalHistogram(self, histogram):
+        """
+        Method used to feed a temporal histogram with the frames of the ring, from its own thread.
+
+        Args:
+            histogram (TemporalHistogram): histogram to feed, None to stop.
+        """
+        if self.temporalHistogram is not None and self.temporalHistogram is not histogram:
+            self.temporalHistogram.stop_feeding()
+        self.temporalHistogram = histogram
+        if histogram is not None and self.acquisitionThread is not None:
+            histogram.start_feeding(self.frameRing)
+
+    def startRecording(self, path = None, chunkFrames = 256):
+        """
+        Method used to stream every frame of the acquisition thread to raw chunk files (see cameraRecorder).
+
+        Args:
+            path (str, optional): path of the recording. Defaults to "Recording_<date>_<time>".
+            chunkFrames (int, optional): number of frames per chunk file. Defaults to 256.
+
+        Returns:
+            FrameRecorder: recorder, stopped by stopRecording(). None if there is no acquisition.
+        """
+        if not self.isAcquiring():
+            print("Recording : no acquisition running.")
+            return None
+        if self.recorder is not None:
+            self.stopRecording()
+        if path is None:
+            path = time.strftime("Recording_%Y%m%d_%H%M%S")
+
+        self.recorder = FrameRecorder(path, self.frameRing.height, self.frameRing.width, self.frameRing.dtype,
+                                      bit_depth = int(self.nBitsPerPixel), exposure = self.camera.get_exposure(),
+                                      chunk_frames = chunkFrames, info = {'backend': self.type})
+        self.recorder.start()
+        self.acquisitionThread.recorder = self.recorder
+
+        # Print into the command prompt
+        print(f"Recording : started into {path}_XXXX.raw.")
+        return self.recorder
+
+    def stopRecording(self):
+        """
+        Method used to stop the recording and to close its last chunk.
+
+        Returns:
+            dict: statistics of the recording, None if nothing was recorded.
+        """
+        if self.recorder is None:
+            return None
+        if self.acquisitionThread is not None:
+            self.acquisitionThread.recorder = None
+        stats = self.recorder.stop()
+        self.recorder = None
+
+        # Print into the command prompt
+        print(f"Recording : {stats['written']} frames written in {stats['chunks']} chunk(s) at {stats['rate']:.0f} MB/s, "
+              f"{stats['dropped']} dropped (max {stats['max_queued']} queued).")
+        if stats['error'] is not None:
+            print(f"Recording : failed ({stats['error']}), {stats['lost']} frames lost.")
+        return stats
+
+    def getPipelineStats(self):
+        """
+        Method used to get the counters of the pipeline (see PipelineStats.get_stats()).
+
+        Returns:
+            dict: frames delivered, dropped, skipped, displayed and analysed, frame rates and latencies in ms.
+        """
+        # Frames skipped inside the driver, before the acquisition thread (Basler "callback" mode)
+        if self.type == 'basler' and self.camera is not None:
+            self.pipelineStats.set_pool_counts(*self.camera.get_pool_stats())
+        return self.pipelineStats.get_stats()
+
+    def fetchLatestFrame(self):
+        """
+        Method used to copy the latest frame of the ring into cameraFrame, if the acquisition thread published
+        a new one. The copy is checked against the writer (FrameRingBuffer.copy_latest), so the consumers
+        never read a frame being overwritten.
+
+        Returns:
+            bool: True if cameraFrame is a new frame.
+        """
+        if self.frameRing is None:
+            return False
+        frame, count = self.frameRing.get_latest()
+        if frame is None or count == self.lastFrameCount:
+            return False
+
+        # The copy goes into the buffer which is not cameraFrame, and replaces it only if it is valid
+        spare = 1 if self.frameCopies[0] is self.cameraFrame else 0
+        self.frameCopies[spare] = get_buffer(self.frameCopies[spare], frame.shape, frame.dtype)
+        frame, count, info = self.frameRing.copy_latest(self.frameCopies[spare])
+        if frame is None:
+            return False
+
+        self.lastFrameCount = count
+        self.cameraFrame = frame
+        self.cameraFrameInfo = info
+        self.framePyramid.set_frame(frame)
+        return True
+
+    def getLatestFrame(self):
+        """
+        Method used by the consumers (display, histogram, chart) to read the latest frame of the ring.
+
+        Returns:
+            np.ndarray: copy of the latest full bit depth frame (height, width), valid until the next but one
+                        call, None if no frame has been grabbed yet.
+        """
+        self.fetchLatestFrame()
+        return self.cameraFrame
+
+    def getLatestFrameInfo(self):
+        """
+        Method used by the consumers dating their measurements to read the latest frame with its frame ID
+        and its timestamp, given by the camera.
+
+        Returns:
+            np.ndarray, int, float: latest frame (None if no frame has been grabbed yet), its frame ID and
+                                    its timestamp in seconds, None if the camera does not give them.
+        """
+        self.fetchLatestFrame()
+        if self.cameraFrame is None:
+            return None, None, None
+        frameId, timestamp, arrivalTime = self.cameraFrameInfo
+
+        # The drivers give 0 when the frame ID or the timestamp is unknown
+        frameId = int(frameId) if frameId > 0 else None
+        timestamp = timestamp * 1e-9 if timestamp > 0 else None
+        return self.cameraFrame, frameId, timestamp
+
     def refreshGraph(self):
         """
         Method used to refresh the graph for the image display.
         """
-        self.cameraRawArray = self.camera.get_image()
+        if self.frameRing is None:
+            return
+        refreshStart = time.perf_counter()
 
-        AOIX, AOIY, AOIWidth, AOIHeight = self.camera.get_aoi()
+        # Nothing to do if the acquisition thread has not published a new frame since the last refresh.
+        # C'est cette matrice (a copy of the ring slot) qui compte pour les graphiques temporelles et les histogrammes
+        self.fetchLatestFrame()
+        if self.cameraFrame is None or self.lastFrameCount == self.displayedFrameCount:
+            return
+        self.displayedFrameCount = self.lastFrameCount
 
-        # On teste combien d'octets par pixel
-        if(self.bytes_per_pixel >= 2):
-            # on créée une nouvelle matrice en 16 bits / C'est celle-ci qui compte pour les graphiques temporelles et les histogrammes
-            self.cameraFrame = self.cameraRawArray.view(np.uint16)
-            self.cameraFrame = np.reshape(self.cameraFrame, (AOIHeight, AOIWidth, -1))
-            
-            # on génère une nouvelle matrice spécifique à l'affichage.
-            cameraFrame8b = self.cameraFrame / (2**(self.nBitsPerPixel-8))
-            self.cameraArray = cameraFrame8b.astype(np.uint8)    
-        else:
-            self.cameraFrame = self.cameraRawArray.view(np.uint8)
-            self.cameraFrame = np.reshape(self.cameraFrame, (AOIHeight, AOIWidth, -1))
-            self.cameraArray = self.cameraFrame
+        self.showFrame()
+        self.pipelineStats.count_displayed(self.cameraFrameInfo[2])
 
+        # Cost of this refresh, with the painting of the previous one done by Qt after it, sets the next interval
+        refreshCost = (time.perf_counter() - refreshStart) * 1000 + self.cameraDisplay.paintTime
+        interval = self.displayScheduler.add_cost(refreshCost)
+        if interval != self.timerUpdate.interval():
+            self.timerUpdate.setInterval(interval)
 
-        # Resize the Qpixmap at the great size
-        widgetWidth, widgetHeight = self.widgetGeometry()
-        
-        # On retaille si besoin à la taille de la fenètre
-        self.cameraDisp = np.reshape(self.cameraArray, (AOIHeight, AOIWidth, -1))
-        self.cameraDisp = cv2.resize(self.cameraDisp, dsize=(self.frameWidth, self.frameHeight), interpolation=cv2.INTER_CUBIC)
-        
-        # Convert the frame into an image
-        image = QImage(self.cameraDisp, self.cameraDisp.shape[1], self.cameraDisp.shape[0], self.cameraDisp.shape[1], QImage.Format_Indexed8)
-        pmap = QPixmap(image)
+        if not self.firstFrameShown:
+            self.firstFrameShown = True
+
+            # Print into the command prompt
+            print(f"Startup : first frame displayed {time.perf_counter() - STARTUP_TIME:.2f} s after the start.")
+
+    def showFrame(self):
+        """
+        Method used to draw the current frame, fitted in the display or in the zoomed view.
+        It is also called when the view is zoomed or panned, to draw it again without waiting for a new frame.
+        """
+        if self.cameraFrame is None:
+            return
+
+        self.cameraDisplay.setFrameSize(self.cameraFrame.shape[1], self.cameraFrame.shape[0])
 
-        # display it in the cameraDisplay
-        self.cameraDisplay.setPixmap(pmap)
+        if self.cameraDisplay.zoom is None:
+            # Size of the frame in the display, keeping its aspect ratio
+            self.frameWidth, self.frameHeight = self.cameraDisplay.fitSize(self.cameraFrame.shape[1], self.cameraFrame.shape[0])
 
-        # "plot" it in the cameraDisplay
-        self.cameraDisplay.setPixmap(pmap)
+            # On retaille si besoin à la taille de la fenètre (area average to shrink, nearest neighbour to zoom),
+            # before the conversion to 8 bits so only the pixels of the display are converted
+            cameraScaled = self.displayScaler.scale(self.cameraFrame, self.frameWidth, self.frameHeight)
+
+            # Raw codes to 8 bits with the display LUT (window / level, gamma, log, auto-stretch), written directly
+            # into the lines of the image of the display
+            self.cameraDisp = self.displayLUT.apply(cameraScaled, out = self.cameraDisplay.getBuffer(self.frameWidth, self.frameHeight))
+        else:
+            # Zoomed view : only the visible pixels are picked from the pyramid, the rest of the view is black
+            self.frameWidth, self.frameHeight = self.cameraDisplay.width(), self.cameraDisplay.height()
+            tile, (rows, cols) = self.framePyramid.render(self.cameraDisplay.originX, self.cameraDisplay.originY,
+                                                          self.cameraDisplay.zoom, self.frameWidth, self.frameHeight)
+            self.cameraDisp = self.cameraDisplay.getBuffer(self.frameWidth, self.frameHeight)
+            self.cameraDisp[:] = 0
+            if tile.size > 0:
+                self.displayLUT.apply(tile, out = self.cameraDisp[rows, cols])
+
+        # The value under the cursor changes with the frame, then one repaint
+        self.updatePixelInfo()
+        self.cameraDisplay.update()
+
+    def updatePixelInfo(self):
+        """
+        Method used to show the raw value of the pixel under the cursor, and the zoom, over the display.
+        """
+        cursor = self.cameraDisplay.cursor
+        value = None if cursor is None else self.framePyramid.get_value(*cursor)
+        zoom = "" if self.cameraDisplay.zoom is None else f"x{self.cameraDisplay.zoom:.2f}  "
+
+        if value is None:
+            self.cameraDisplay.setOverlayText(zoom)
+        else:
+            self.cameraDisplay.setOverlayText(f"{zoom}X : {cursor[0]}  Y : {cursor[1]}  Value : {value}")
 
     def initListCamera(self):
         """
-        Method used to initialize the different cameras linked to the computer.
+        Method used to start the discovery of the cameras linked to the computer, without waiting for it.
+        fillListCamera is called, then camerasDiscovered is emitted, in the GUI thread once it is finished.
         """
-        self.nb_cam = camera.get_nb_of_cam()
+        self.cameraList = []
+        self.nb_cam = 0
+
+        # Queued, since the discovery ends in a background thread (or right now if it was already done)
+        self.discoveryFinished.connect(self.fillListCamera, Qt.QueuedConnection)
+        registry.start_discovery().add_done_callback(lambda discovery : self.discoveryFinished.emit())
+
+    def fillListCamera(self):
+        """
+        Method used to fill the list of the cameras once the discovery is finished.
+        """
+        self.cameraList = registry.get_cameras()
+        self.nb_cam = len(self.cameraList)
         self.cameraInfo.setText('Cam Nb = '+str(self.nb_cam))
-        if(self.nb_cam > 0):
-            self.cameraList = camera.get_cam_list() 
-            self.cameraListCombo.clear()
-            for i in range(self.nb_cam):
-                cam = self.cameraList[i]
-                self.cameraListCombo.addItem(f'{cam[2]} (SN : {cam[1]})')
+        self.cameraListCombo.clear()
+        for cam in self.cameraList:
+            self.cameraListCombo.addItem(f'{cam[3]} (SN : {cam[2]})')
+        self.camerasDiscovered.emit()
 
     def widgetGeometry(self):
         """
@@ -153,20 +476,32 @@ class Camera_Widget(QWidget):
         widgetHeight = geometry.height()
         return widgetWidth, widgetHeight
 
-    def connectCamera(self):
+    def connectCamera(self, cameraIndex = None):
         """
         Method used to connect the camera.
+
+        Args:
+            cameraIndex (int, optional): index of the camera in the list of the discovered cameras.
+                                         Defaults to None (camera selected in cameraListCombo).
         """
-        self.selectedCamera = self.cameraListCombo.currentIndex()
+        # Waits for the discovery if it is not finished yet
+        if self.cameraList == []:
+            self.cameraList = registry.get_cameras()
+
+        if cameraIndex is None:
+            cameraIndex = max(self.cameraListCombo.currentIndex(), 0)
+        self.selectedCamera = cameraIndex
+
+        selectedCamera = self.cameraList[self.selectedCamera]
+        self.type = selectedCamera[0]
+        self.cameraModule = registry.load(self.type)
         try :
-            self.camera = camera.uEyeCamera(self.selectedCamera)
-            self.type = 'ueye'
+            if self.type == 'basler':
+                self.camera = registry.open_camera(selectedCamera, grab_mode = self.baslerGrabMode)
+            else:
+                self.camera = registry.open_camera(selectedCamera)
         except :
-            try :
-                self.camera = camera.BaslerCamera()
-                self.type = 'basler'
-            except :
-                print("Error : No camera detected.")
+            print("Error : No camera detected.")
 
         self.max_width = int(self.camera.get_sensor_max_width())
         self.max_height = int(self.camera.get_sensor_max_height())
@@ -174,6 +509,8 @@ class Camera_Widget(QWidget):
         self.camera.set_exposure(100000)
         
         if self.type == 'ueye':
+            from pyueye import ueye
+
             if self.colormode == "MONO8":
                 self.m_nColorMode = ueye.IS_CM_MONO8
                 self.camera.set_colormode(self.m_nColorMode)
@@ -210,7 +547,7 @@ class Camera_Widget(QWidget):
                             print("MONO 8 unavailable.")
                             print("Camera unavailable.")
 
-        elif self.type == 'basler' :
+        elif self.type in ['basler', 'simulated', 'replay'] :
             if self.colormode == "MONO8":
                 self.m_nColorMode = 'Mono8'
                 print(f'self.m_nColorMode : {self.m_nColorMode}')
@@ -248,11 +585,13 @@ class Camera_Widget(QWidget):
                             print("MONO 8 unavailable.")
                             print("Camera unavailable.")  
 
+        # Python int for every backend (the uEye driver gives a ueye.INT), read here once per colormode
         if self.type == 'ueye' :
-            self.nBitsPerPixel = self.camera.nBitsPerPixel
-        elif self.type == 'basler' :
-            self.nBitsPerPixel = self.camera.nBitsPerPixel
+            self.nBitsPerPixel = int(self.camera.nBitsPerPixel.value)
+        elif self.type in ['basler', 'simulated', 'replay'] :
+            self.nBitsPerPixel = int(self.camera.nBitsPerPixel)
             print(f'self.nBitsPerPixel : {self.nBitsPerPixel}')
+        self.displayLUT.set_bit_depth(self.nBitsPerPixel)
 
         self.bytes_per_pixel = int(np.ceil(self.nBitsPerPixel / 8))
         print("nBitsPerPixel:\t", self.nBitsPerPixel)
@@ -262,6 +601,7 @@ class Camera_Widget(QWidget):
 
         self.camera.alloc()
         self.camera.capture_video()
+        self.startAcquisition()
 
         # There is a way to set the initial minimumValue of the exposure as near as possible from the original minimumValue of the
         # camera, for any camera
@@ -306,27 +646,116 @@ class Camera_Widget(QWidget):
         Args:
             event (_???_): ???
         """
+        self.disconnectCamera()
+        QApplication.quit()
+
+    def disconnectCamera(self):
+        """
+        Method used to stop the refresh, the acquisition thread and the camera.
+        """
+        self.timerUpdate.stop()
+        self.stopRecording()
+        self.stopAcquisition()
         if(self.camera != None):
             self.camera.stop_camera()
-        QApplication.quit()
+            self.camera = None
 
-    def getGraphValues(self, farness = 5):
+    def getGraphValues(self, farness = 5, frame = None):
         """
         Method used to return the value of 4 points near the center of the frame.
 
         Args:
             farness (int, optional): how far are the points from the center. Defaults to 5.
+            frame (np.ndarray, optional): frame to read, e.g. from getLatestFrameInfo(). Defaults to None (latest frame).
 
         Returns:
-            list: list of the value of the four points.
+            list: list of the value of the four points, None if no frame has been grabbed yet.
         """
-        height, width, _ = self.cameraFrame.shape
-        value1 = self.cameraFrame[width // 2 + farness][height // 2][0]
-        value2 = self.cameraFrame[width // 2 - farness][height // 2][0]
-        value3 = self.cameraFrame[width // 2][height // 2 + farness][0]
-        value4 = self.cameraFrame[width // 2][height // 2 - farness][0]
+        if frame is None:
+            frame = self.getLatestFrame()
+        if frame is None:
+            return None
+        height, width = frame.shape
+        value1 = frame[height // 2 + farness][width // 2]
+        value2 = frame[height // 2 - farness][width // 2]
+        value3 = frame[height // 2][width // 2 + farness]
+        value4 = frame[height // 2][width // 2 - farness]
         return [value1, value2, value3, value4]
 
+    def requestAOI(self, AOIX, AOIY, AOIWidth, AOIHeight):
+        """
+        Method used to ask for a new AOI. The requests are gathered during aoiDelay ms,
+        then only the last one is applied by applyPendingAOI.
+
+        Args:
+            AOIX (int): x coordinate of the top left corner of the AOI.
+            AOIY (int): y coordinate of the top left corner of the AOI.
+            AOIWidth (int): width of the AOI.
+            AOIHeight (int): height of the AOI.
+        """
+        # Same as a "forced" launchAOI : nothing to do if the AOI mode is off
+        if not self.aoiTrueFalse:
+            return
+
+        self.pendingAOI = (AOIX, AOIY, AOIWidth, AOIHeight)
+        self.aoiTimer.start()
+
+    def applyPendingAOI(self):
+        """
+        Method used to apply the last requested AOI in one reconfiguration.
+        Nothing is done if the adjusted AOI is the current one, and only the offsets are written
+        if the size did not change.
+        """
+        if self.pendingAOI is None or not self.aoiTrueFalse:
+            return
+
+        AOIX, AOIY, AOIWidth, AOIHeight = self.cameraModule.ajust_aoi(*self.pendingAOI)
+        self.pendingAOI = None
+
+        currentX, currentY, currentWidth, currentHeight = self.camera.get_aoi()
+        if (AOIX, AOIY, AOIWidth, AOIHeight) == (currentX, currentY, currentWidth, currentHeight):
+            return
+
+        if (AOIWidth, AOIHeight) == (currentWidth, currentHeight):
+            # The offset is written by the acquisition thread between two frames, never during a get_image()
+            acquisitionThread = self.acquisitionThread
+            if acquisitionThread is not None and acquisitionThread.is_alive():
+                acquisitionThread.submit(self.moveAOI, AOIX, AOIY, AOIWidth, AOIHeight)
+            else:
+                self.moveAOI(AOIX, AOIY, AOIWidth, AOIHeight)
+            return
+
+        self.launchAOI(AOIX, AOIY, AOIWidth, AOIHeight, type = "forced")
+
+    def moveAOI(self, AOIX, AOIY, AOIWidth, AOIHeight):
+        """
+        Method used to move the AOI without changing its size, run by the acquisition thread.
+        If the camera refuses, the acquisition is restarted with the new AOI by the GUI (aoiOffsetFailed).
+
+        Args:
+            AOIX (int): x coordinate of the top left corner of the AOI.
+            AOIY (int): y coordinate of the top left corner of the AOI.
+            AOIWidth (int): width of the AOI.
+            AOIHeight (int): height of the AOI.
+        """
+        try:
+            self.camera.set_aoi_offset(AOIX, AOIY)
+        except Exception:
+            print("AOI : the offset can't be changed during the acquisition, restarting it.")
+            self.aoiOffsetFailed.emit(AOIX, AOIY, AOIWidth, AOIHeight)
+
+    def forceAOI(self, AOIX, AOIY, AOIWidth, AOIHeight):
+        """
+        Method used to apply an AOI by restarting the acquisition.
+
+        Args:
+            AOIX (int): x coordinate of the top left corner of the AOI.
+            AOIY (int): y coordinate of the top left corner of the AOI.
+            AOIWidth (int): width of the AOI.
+            AOIHeight (int): height of the AOI.
+        """
+        self.launchAOI(AOIX, AOIY, AOIWidth, AOIHeight, type = "forced")
+
     def launchAOI(self, AOIX, AOIY, AOIWidth, AOIHeight, type = None):
         """
         Method used to launch the AOI.
@@ -338,8 +767,14 @@ class Camera_Widget(QWidget):
         else:
             # Do Forced / Do Unforced / Undo AOI Mode
 
-            # "Pause" refresh
+            # "Pause" refresh, and forget the AOI requests not applied yet
             self.timerUpdate.stop()
+            self.aoiTimer.stop()
+            self.pendingAOI = None
+
+            # A recording keeps the geometry of its first frame
+            self.stopRecording()
+            self.stopAcquisition()
 
             # Stop video and un_alloc memory # Merci M Villemejane
             self.camera.stop_video()
@@ -367,9 +802,10 @@ class Camera_Widget(QWidget):
             # Re-alloc memory and re-run video
             self.camera.alloc()
             self.camera.capture_video()
+            self.startAcquisition()
 
             # Restart the refresh
-            self.timerUpdate.setInterval(int(self.camera.get_frame_rate()))
+            self.timerUpdate.setInterval(self.displayScheduler.get_interval())
             self.timerUpdate.start()
 
     def setColor(self, color):
@@ -390,6 +826,257 @@ class Camera_Widget(QWidget):
 
 #-----------------------------------------------------------------------------------------------
 
+class Frame_Display_Widget(QWidget):
+    """
+    Widget painting an 8 bits frame, centered. The QImage is kept from one frame to the next over a numpy buffer,
+    whose lines are padded to a multiple of 4 bytes as Qt needs, and is only created again when the size changes.
+
+    The frame is fitted in the widget until the wheel zooms in around the cursor. The zoomed view is panned
+    by dragging it, and a double click fits the frame again. The pixels of the view are drawn by the owner
+    of the widget, from originX, originY and zoom, when viewChanged is emitted.
+
+    Args:
+        QWidget (class): QWidget can be put in another widget and / or window.
+    """
+
+    # Emitted when the zoom or the position of the view changes
+    viewChanged = pyqtSignal()
+
+    # Emitted when the pixel of the frame under the cursor changes
+    cursorMoved = pyqtSignal()
+
+    def __init__(self, maxZoom = 32):
+        """
+        Initialisation of the display.
+
+        Args:
+            maxZoom (float, optional): maximum number of screen pixels per frame pixel. Defaults to 32.
+        """
+        super().__init__()
+        self.setMouseTracking(True)
+
+        # The buffer must live as long as the image, which does not copy it
+        self.buffer = None
+        self.image = None
+
+        # Duration of the last painting in ms, for the display scheduler
+        self.paintTime = 0
+
+        # View : None to fit the frame, otherwise screen pixels per frame pixel and frame coordinates of the top left corner
+        self.maxZoom = maxZoom
+        self.zoom = None
+        self.originX = 0.0
+        self.originY = 0.0
+        self.frameSize = None
+        self.dragStart = None
+
+        # Frame pixel under the cursor (x, y), and text painted over the frame
+        self.cursor = None
+        self.overlayText = ""
+
+    def sizeHint(self):
+        """
+        Method used by the layouts to get the preferred size of the display.
+
+        Returns:
+            QSize: 640 x 480.
+        """
+        return QSize(640, 480)
+
+    def fitSize(self, frameWidth, frameHeight):
+        """
+        Method used to get the largest size of a frame inside the widget, keeping its aspect ratio.
+
+        Args:
+            frameWidth (int): width of the frame.
+            frameHeight (int): height of the frame.
+
+        Returns:
+            int: width and height of the frame in the display.
+        """
+        scale = min(self.width() / frameWidth, self.height() / frameHeight)
+        return max(int(frameWidth * scale), 1), max(int(frameHeight * scale), 1)
+
+    def setFrameSize(self, frameWidth, frameHeight):
+        """
+        Method used to give the size of the frame shown, to convert the screen coordinates.
+        The view is fitted again if the size changes (AOI).
+
+        Args:
+            frameWidth (int): width of the frame.
+            frameHeight (int): height of the frame.
+        """
+        if self.frameSize is not None and self.frameSize != (frameWidth, frameHeight):
+            self.zoom = None
+        self.frameSize = (frameWidth, frameHeight)
+
+    def getView(self):
+        """
+        Method used to get the view, also when the frame is fitted.
+
+        Returns:
+            float, float, float: frame coordinates of the top left corner of the widget, and screen pixels per frame pixel.
+        """
+        if self.zoom is not None:
+            return self.originX, self.originY, self.zoom
+
+        frameWidth, frameHeight = self.frameSize
+        width, height = self.fitSize(frameWidth, frameHeight)
+        zoom = width / frameWidth
+        return -((self.width() - width) // 2) / zoom, -((self.height() - height) // 2) / zoom, zoom
+
+    def setView(self, originX, originY, zoom):
+        """
+        Method used to zoom and pan the view. The frame is fitted again if the zoom goes below the fitted one.
+
+        Args:
+            originX (float): x coordinate in the frame of the left side of the widget.
+            originY (float): y coordinate in the frame of the top side of the widget.
+            zoom (float): screen pixels per frame pixel.
+        """
+        frameWidth, frameHeight = self.frameSize
+        width, height = self.fitSize(frameWidth, frameHeight)
+        if zoom <= width / frameWidth:
+            self.zoom = None
+        else:
+            # The center of the widget stays on the frame
+            self.zoom = min(zoom, self.maxZoom)
+            halfWidth, halfHeight = self.width() / self.zoom / 2, self.height() / self.zoom / 2
+            self.originX = min(max(originX, -halfWidth), frameWidth - halfWidth)
+            self.originY = min(max(originY, -halfHeight), frameHeight - halfHeight)
+        self.viewChanged.emit()
+
+    def resetView(self):
+        """
+        Method used to fit the frame in the widget again.
+        """
+        self.zoom = None
+        self.viewChanged.emit()
+
+    def setOverlayText(self, text):
+        """
+        Method used to set the text painted over the frame, at the next repaint.
+
+        Args:
+            text (str): text, "" for none.
+        """
+        if text != self.overlayText:
+            self.overlayText = text
+            self.update()
+
+    def wheelEvent(self, event):
+        """
+        Method used by Qt when the wheel turns, to zoom around the cursor.
+
+        Args:
+            event (QWheelEvent): wheel event.
+        """
+        if self.frameSize is None:
+            return
+        originX, originY, zoom = self.getView()
+        position = event.pos()
+        newZoom = zoom * 2 ** (event.angleDelta().y() / 240)
+
+        # The frame pixel under the cursor stays under it
+        self.setView(originX + position.x() / zoom - position.x() / newZoom,
+                     originY + position.y() / zoom - position.y() / newZoom, newZoom)
+
+    def mousePressEvent(self, event):
+        """
+        Method used by Qt when a button is pressed, to start panning the zoomed view.
+
+        Args:
+            event (QMouseEvent): mouse event.
+        """
+        if event.button() == Qt.LeftButton and self.zoom is not None:
+            self.dragStart = (event.pos(), self.originX, self.originY)
+
+    def mouseMoveEvent(self, event):
+        """
+        Method used by Qt when the cursor moves, to pan the zoomed view and to follow the pixel under the cursor.
+
+        Args:
+            event (QMouseEvent): mouse event.
+        """
+        if self.frameSize is None:
+            return
+
+        if self.dragStart is not None and self.zoom is not None:
+            start, originX, originY = self.dragStart
+            self.setView(originX - (event.pos().x() - start.x()) / self.zoom,
+                         originY - (event.pos().y() - start.y()) / self.zoom, self.zoom)
+
+        originX, originY, zoom = self.getView()
+        cursor = (math.floor(originX + event.pos().x() / zoom), math.floor(originY + event.pos().y() / zoom))
+        if cursor != self.cursor:
+            self.cursor = cursor
+            self.cursorMoved.emit()
+
+    def mouseReleaseEvent(self, event):
+        """
+        Method used by Qt when a button is released, to stop panning.
+
+        Args:
+            event (QMouseEvent): mouse event.
+        """
+        self.dragStart = None
+
+    def mouseDoubleClickEvent(self, event):
+        """
+        Method used by Qt on a double click, to fit the frame again.
+
+        Args:
+            event (QMouseEvent): mouse event.
+        """
+        self.resetView()
+
+    def leaveEvent(self, event):
+        """
+        Method used by Qt when the cursor leaves the widget.
+
+        Args:
+            event (QEvent): leave event.
+        """
+        self.cursor = None
+        self.cursorMoved.emit()
+
+    def getBuffer(self, width, height):
+        """
+        Method used to get the pixels of the image to fill, before calling update().
+
+        Args:
+            width (int): width of the image.
+            height (int): height of the image.
+
+        Returns:
+            np.ndarray: uint8 view (height, width) on the lines of the image.
+        """
+        if self.image is None or (self.image.width(), self.image.height()) != (width, height):
+            bytesPerLine = (width + 3) // 4 * 4
+            self.buffer = np.zeros((height, bytesPerLine), dtype = np.uint8)
+            self.image = QImage(self.buffer.data, width, height, bytesPerLine, QImage.Format_Grayscale8)
+        return self.buffer[:, :width]
+
+    def paintEvent(self, event):
+        """
+        Method used by Qt to paint the image, centered in the widget.
+
+        Args:
+            event (QPaintEvent): paint event.
+        """
+        if self.image is None:
+            return
+        start = time.perf_counter()
+        painter = QPainter(self)
+        painter.drawImage((self.width() - self.image.width()) // 2, (self.height() - self.image.height()) // 2, self.image)
+        if self.overlayText != "":
+            painter.setPen(Qt.yellow)
+            painter.drawText(self.rect().adjusted(6, 6, -6, -6), Qt.AlignLeft | Qt.AlignBottom, self.overlayText)
+        painter.end()
+        self.paintTime = (time.perf_counter() - start) * 1000
+
+#-----------------------------------------------------------------------------------------------
+
 class Setting_Widget_Float(QWidget):
     """
     Widget designed to select a value in a list.
@@ -484,11 +1171,14 @@ class MyWindow(QMainWindow):
         self.setWindowTitle("Camera Window")
         self.setGeometry(100, 100, 400, 300)
 
-        widget = Camera_Widget(colormode = "MONO12")
-        widget.connectCamera()
-        widget.launchVideo()
+        self.widget = Camera_Widget(colormode = "MONO12")
+        self.widget.camerasDiscovered.connect(self.startCamera)
+
+        self.setCentralWidget(self.widget)
 
-        self.setCentralWidget(widget)
+    def startCamera(self):
+        self.widget.connectCamera()
+        self.widget.launchVideo()
 
 #-----------------------------------------------------------------------------------------------
 
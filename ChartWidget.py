@@ -34,12 +34,19 @@ class Chart_Widget(QWidget):
         self.endStopTime = 0
         self.startTime = 0
 
+        # Camera timestamp of the beginning of the measures, set by the first dated point,
+        # with the last timestamp and frame ID given by the camera
+        self.timestampOrigin = None
+        self.lastTimestamp = None
+        self.lastFrameId = None
+
         # Initialisate lists
         self.ordinateAxis1 = []
         self.ordinateAxis2 = []
         self.ordinateAxis3 = []
         self.ordinateAxis4 = []
         self.abscissaAxis = []
+        self.frameIds = []
 
         # Setting the timer
         self.timerUpdate = timer #ms
@@ -64,18 +71,29 @@ class Chart_Widget(QWidget):
         self.graph_widget.setYRange(0, 260)
         self.graph_widget.setXRange(0, 10)
 
-    def addOrdinatesPoints(self, ordinates, numberOfPoints):
+    def addOrdinatesPoints(self, ordinates, numberOfPoints, timestamp = None, frameId = None):
         """
         Method used to add points to our chart.
 
         Args:
             ordinates (list): List of ordinates that will be plot witht the time.
+            numberOfPoints (int): 1 or 4 points.
+            timestamp (float, optional): timestamp of the frame given by the camera, in seconds.
+                                         Defaults to None (time of the call).
+            frameId (int, optional): frame ID given by the camera. Defaults to None (not given by the camera).
         """
+        # The same frame is not added twice, only known if the camera gives a frame ID
+        if frameId is not None:
+            if frameId == self.lastFrameId:
+                return
+            self.lastFrameId = frameId
+
         # Call the class' time method to set the new abscissa
-        newAbscissa = self.time()
+        newAbscissa = self.time(timestamp)
 
         # Add the new abscissa and ordinates
         self.abscissaAxis.append(newAbscissa)
+        self.frameIds.append(frameId)
 
         if numberOfPoints == 1:
             self.ordinateAxis1.append(ordinates[0])
@@ -128,14 +146,29 @@ class Chart_Widget(QWidget):
             return maximum + 0.5
         return maximum
 
-    def time(self):
+    def time(self, timestamp = None):
         """
         Method used to set the time compared to the beginning of the measures.
+        With the timestamp of the camera, the time between two points does not depend on the GUI timer.
+        The pauses are still measured with the clock of the computer.
+
+        Args:
+            timestamp (float, optional): timestamp of the frame given by the camera, in seconds. Defaults to None.
 
         Returns:
             float: time compared to the beginning of the measures.
         """
-        return time.time() - self.startTime - self.totalStopTime
+        if timestamp is None:
+            return time.time() - self.startTime - self.totalStopTime
+
+        # A timestamp going backwards comes from another camera session (reconnection, restart), it is dated again
+        if self.lastTimestamp is not None and timestamp < self.lastTimestamp:
+            self.timestampOrigin = None
+        self.lastTimestamp = timestamp
+
+        if self.timestampOrigin is None:
+            self.timestampOrigin = timestamp - (time.time() - self.startTime)
+        return timestamp - self.timestampOrigin - self.totalStopTime
 
     def startMethod(self):
         """
@@ -169,14 +202,15 @@ class Chart_Widget(QWidget):
     def saveMethod(self):
         """
         Method used to save our ordinates and abscissas in a file called "IntensitiesOverTime.txt" under the following form :
-            Time(s) pixel_1_intensity   pixel_2_intensity   pixel_3_intensity   pixel_4_intensity
+            Time(s) Frame_ID    pixel_1_intensity   pixel_2_intensity   pixel_3_intensity   pixel_4_intensity
 
         """
-        # Combine the data lists into a single list for easier handling
-        abcissas = self.abscissaAxis
+        # Combine the data lists into a single list for easier handling, the time with the precision of the camera clock
+        abcissas = [f"{abscissa:.6f}" for abscissa in self.abscissaAxis]
+        frameIds = ["" if frameId is None else frameId for frameId in self.frameIds]
         ordinates = [self.ordinateAxis1, self.ordinateAxis2, self.ordinateAxis3, self.ordinateAxis4]
         if self.ordinateAxis2 != []:
-            abcissasOrdinates = [abcissas] + ordinates
+            abcissasOrdinates = [abcissas, frameIds] + ordinates
 
             # Transpose the combined data to align the columns properly
             transposedAbcissasOrdinates = list(zip(*abcissasOrdinates))
@@ -186,7 +220,7 @@ class Chart_Widget(QWidget):
 
             # Write the formatted data to the .txt file
             with open("IntensitiesOverTimeFourPoints.txt", 'w') as file:
-                header = "Time(s)\tpixel_1_intensity\tpixel_2_intensity\tpixel_3_intensity\tpixel_4_intensity"
+                header = "Time(s)\tFrame_ID\tpixel_1_intensity\tpixel_2_intensity\tpixel_3_intensity\tpixel_4_intensity"
                 file.write(header + '\n')
                 file.writelines('\n'.join(formattedAbscissasOrdinates))
             
@@ -194,7 +228,7 @@ class Chart_Widget(QWidget):
             print("Acquisiton : saved.")
 
         else:
-            abcissasOrdinates = [abcissas] + [self.ordinateAxis1]
+            abcissasOrdinates = [abcissas, frameIds] + [self.ordinateAxis1]
 
             # Transpose the combined data to align the columns properly
             transposedAbcissasOrdinates = list(zip(*abcissasOrdinates))
@@ -204,7 +238,7 @@ class Chart_Widget(QWidget):
 
             # Write the formatted data to the .txt file
             with open("IntensitiesOverTimeOnePoint.txt", 'w') as file:
-                header = "Time(s)\tpixel_1_intensity"
+                header = "Time(s)\tFrame_ID\tpixel_1_intensity"
                 file.write(header + '\n')
                 file.writelines('\n'.join(formattedAbscissasOrdinates))
             
@@ -220,6 +254,9 @@ class Chart_Widget(QWidget):
         self.beginningStopTime = 0
         self.endStopTime = 0
         self.startTime = 0
+        self.timestampOrigin = None
+        self.lastTimestamp = None
+        self.lastFrameId = None
 
         if self.timerUpdate.isActive():
             self.startTime = time.time()
@@ -230,6 +267,7 @@ class Chart_Widget(QWidget):
         self.ordinateAxis3 = []
         self.ordinateAxis4 = []
         self.abscissaAxis = []
+        self.frameIds = []
 
         # Clear the chart and re-initialisate it
         self.graph_widget.clear()
@@ -1,9 +1,12 @@
 # Libraries
-from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout
+from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout, QComboBox, QPushButton
+from PyQt5.QtCore import pyqtSignal
 import sys
 import pyqtgraph as pg
 import numpy as np
 
+from cameraHistogram import HistogramEngine, TemporalHistogram, RunningHistogram, find_first_last_index
+
 class Histogram_Widget(QWidget):
     """
     Widget used to show histograms of array or list of lists.
@@ -12,6 +15,23 @@ class Histogram_Widget(QWidget):
         QWidget (class): QWidget can be put in another widget and / or window.
     """
 
+    # Choices of the pixels counted in "frame" mode : [text, sample budget, sampling]
+    samplingChoices = [["Every pixel", None, "strided"],
+                       ["Grid - 1 M pixels", 1000000, "strided"],
+                       ["Grid - 100 k pixels", 100000, "strided"],
+                       ["Random - 100 k pixels", 100000, "random"],
+                       ["Random - 10 k pixels", 10000, "random"]]
+
+    # Choices of the accumulation of the frames in "frame" mode : [text, mode, number of frames, decay]
+    temporalChoices = [["Single frame", None, None, None],
+                       ["Last 10 frames", "window", 10, None],
+                       ["Last 100 frames", "window", 100, None],
+                       ["Decay 0.9 / frame", "decay", None, 0.9],
+                       ["Decay 0.99 / frame", "decay", None, 0.99]]
+
+    # Emitted with the TemporalHistogram to feed with every frame (None for a single frame)
+    temporalHistogramChanged = pyqtSignal(object)
+
     def __init__(self, histogramTitle, FrameOrLists, timer):
         """
         Initialisation of our histogram.
@@ -33,6 +53,21 @@ class Histogram_Widget(QWidget):
 
         self.colors = ['red', 'blue', 'green', 'orange']
 
+        # While paused (or hidden), update only keeps its last data
+        self.renderingPaused = False
+        self.pendingUpdate = None
+
+        # Vectorised counting, into a counts array kept from one update to the next
+        self.histogramEngine = HistogramEngine(4097)
+
+        # Histogram accumulated over the frames, fed from the frame ring by its own thread (see temporalHistogramChanged)
+        self.temporalHistogram = None
+        self.temporalCounts = np.zeros(4097, dtype = np.float64)
+
+        # "lists" mode : histogram, mean and std of each list, updated with its new values only
+        self.runningHistograms = [RunningHistogram(4097) for color in self.colors]
+        self.runningLists = [None] * len(self.colors)
+
         # Calling sub-initialisation's method
         self.UiComponents()
 
@@ -72,10 +107,25 @@ class Histogram_Widget(QWidget):
         self.plotChart.setLabel('left', 'Frequency', color = "black")  # Set Y-axis label
         self.plotChart.setLabel('bottom', 'test', color = "black")  # Set X-axis label
        
-        self.plotChart.addLegend()
-
-        # Create horizontal list i.e x-axis
-        self.abscissas = range(4097) # 10^bits + 1 / bits = 12
+        self.legend = self.plotChart.addLegend()
+
+        # Edges of the bins i.e x-axis, bin i is centered on the value i
+        self.edges = np.arange(4097 + 1) - 0.5 # 10^bits + 1 / bits = 12
+
+        # Curves kept from one update to the next, only their data changes (one per pixel in "lists" mode)
+        self.curves = []
+        for i, color in enumerate(self.colors):
+            brush = pg.mkColor('blue' if self.FrameOrLists == "frame" else color)
+            brush.setAlpha(160)
+            curve = pg.PlotDataItem(stepMode = "center", fillLevel = 0, brush = brush, pen = None)
+            curve.setVisible(i == 0 and self.FrameOrLists == "frame")
+            self.plotChart.addItem(curve)
+            self.curves.append(curve)
+        self.numberOfCurves = 1 if self.FrameOrLists == "frame" else 0
+
+        # Labels of the mean(s) and std(s), and their texts to only change them when needed
+        self.labels = [self.text_label_1, self.text_label_2, self.text_label_3, self.text_label_4]
+        self.labelTexts = [label.text for label in self.labels]
 
         # Creating a grid layout
         layoutMain = QGridLayout()
@@ -84,111 +134,254 @@ class Histogram_Widget(QWidget):
         self.setLayout(layoutMain)
 
         # Plot window goes on right side, spanning 3 rows
-        layoutMain.addWidget(self.plotChart, 0, 0, 1, 1) #row = 0, column = 0, rowSpan = 1, columnSpan = 1
+        layoutMain.addWidget(self.plotChart, 0, 0, 1, 3) #row = 0, column = 0, rowSpan = 1, columnSpan = 3
+
+        if self.FrameOrLists == "frame":
+            # Pixels counted in each frame, every pixel or a sample for the large sensors
+            self.samplingCombo = QComboBox()
+            for text, sampleBudget, sampling in self.samplingChoices:
+                self.samplingCombo.addItem(text)
+            self.samplingCombo.currentIndexChanged.connect(self.changeSampling)
+            layoutMain.addWidget(self.samplingCombo, 1, 0, 1, 1) #row = 1, column = 0, rowSpan = 1, columnSpan = 1
+
+            # Accumulation of the frames, and its reset
+            self.temporalCombo = QComboBox()
+            for text, mode, nbFrames, decay in self.temporalChoices:
+                self.temporalCombo.addItem(text)
+            self.temporalCombo.currentIndexChanged.connect(self.changeAccumulation)
+            layoutMain.addWidget(self.temporalCombo, 1, 1, 1, 1) #row = 1, column = 1, rowSpan = 1, columnSpan = 1
+
+            self.resetButton = QPushButton("Reset")
+            self.resetButton.clicked.connect(self.resetAccumulation)
+            layoutMain.addWidget(self.resetButton, 1, 2, 1, 1) #row = 1, column = 2, rowSpan = 1, columnSpan = 1
 
     def calculateHistogram(self, values):
         """
-        Method used to calculate an histogram from 0 to 256 (include) from a list.
+        Method used to calculate an histogram from 0 to 4096 (include) from a frame or a list.
 
         Args:
-            values (list): list coonverted inot a histogram.
+            values (np.ndarray or list): frame or list converted into a histogram.
 
         Returns:
-            list: histogram converted from the list.
+            np.ndarray: histogram converted from the values, overwritten by the next call.
+        """
+        return self.histogramEngine.compute(values)
+
+    def changeSampling(self, index):
         """
-        histogram = [0] * 4097  # Index 0 to 2^12+1
+        Method used to choose the pixels counted in each frame.
 
-        for value in values:
-            if 0 <= value <= 4096:
-                histogram[value] += 1
+        Args:
+            index (int): index of the choice in samplingChoices.
+        """
+        text, sampleBudget, sampling = self.samplingChoices[index]
+        self.setSampling(sampleBudget, sampling)
 
-        return histogram
+    def setSampling(self, sampleBudget = None, sampling = "strided"):
+        """
+        Method used to count a sample of each frame (see cameraHistogram), or every pixel.
+
+        Args:
+            sampleBudget (int, optional): maximum number of pixels counted per frame. Defaults to None (every pixel).
+            sampling (str, optional): "strided" (regular grid) or "random". Defaults to "strided".
+        """
+        self.histogramEngine.set_sampling(sampleBudget, sampling)
+        if self.temporalHistogram is not None:
+            self.temporalHistogram.set_sampling(sampleBudget, sampling)
+
+    def changeAccumulation(self, index):
+        """
+        Method used to choose how the frames are accumulated.
+
+        Args:
+            index (int): index of the choice in temporalChoices.
+        """
+        text, mode, nbFrames, decay = self.temporalChoices[index]
+        self.setAccumulation(mode, nbFrames, decay)
+
+    def setAccumulation(self, mode = None, nbFrames = 100, decay = 0.95):
+        """
+        Method used to show the histogram of the last frame, or a histogram accumulated over the frames.
+        temporalHistogramChanged is emitted, so the owner of the acquisition can feed it with the frames of its ring.
+
+        Args:
+            mode (str, optional): None for the last frame, "window" or "decay" (see TemporalHistogram). Defaults to None.
+            nbFrames (int, optional): number of frames of the window. Defaults to 100.
+            decay (float, optional): factor applied to the counts at each frame in "decay" mode. Defaults to 0.95.
+        """
+        if mode is None:
+            self.temporalHistogram = None
+        else:
+            if self.temporalHistogram is None:
+                self.temporalHistogram = TemporalHistogram(4097)
+                self.temporalHistogram.set_sampling(self.histogramEngine.sample_budget, self.histogramEngine.sampling)
+            self.temporalHistogram.set_mode(mode, nbFrames if nbFrames is not None else 100, decay if decay is not None else 0.95)
+        self.temporalHistogramChanged.emit(self.temporalHistogram)
+
+    def resetAccumulation(self):
+        """
+        Method used to empty the accumulated histogram.
+        """
+        if self.temporalHistogram is not None:
+            self.temporalHistogram.reset()
 
     def update(self, data, numberOfPoints = None):
         """
-        Update method for the histogram.
+        Update method for the histogram. The curves and the labels are kept and only their data changes.
+        While the rendering is paused (or the widget hidden), only the last data is kept and shown later.
+
+        In "lists" mode, the lists are expected to grow from one update to the next (lists of the chart) :
+        only their new values are counted. A list which is replaced or shorter is counted again from its start.
 
         Args:
             data ("np.darray" or "list of lists"): frame or lists that will be ploted into a histogram.
+            numberOfPoints (int, optional): number of lists shown in "lists" mode, 1 or 4. Defaults to None.
         """
-        # Erase the last histogram
-        self.plotChart.clear()
+        if self.isRenderingPaused():
+            self.pendingUpdate = (data, numberOfPoints)
+            return
+        self.pendingUpdate = None
+
+        # Plot method for the accumulated frames, the frames are already counted by the feeding thread
+        if self.FrameOrLists == "frame" and self.temporalHistogram is not None:
+            histogram, nbFrames = self.temporalHistogram.get_counts(out = self.temporalCounts)
+            mean, std = self.histogramEngine.get_mean_std(histogram)
+            mean, std = round(mean, 2), round(std, 2)
+
+            self.setCurveData(0, histogram)
+            self.setLabelText(0, f"<html>M&#772; = {mean} & &#963; = {std} ({nbFrames:.0f} frames)</html>")
 
         # Plot method for the frame
-        if self.FrameOrLists == "frame":
-            data = data.flatten()
+        elif self.FrameOrLists == "frame":
+            # The mean and the std come from the histogram, the frame is read once
+            histogram = self.calculateHistogram(data)
+            mean, std = self.histogramEngine.get_mean_std()
+            mean, std = round(mean, 2), round(std, 2)
+
+            # A sampled histogram is scaled to the number of pixels of the frame
+            self.setCurveData(0, histogram, self.histogramEngine.get_scale())
+
+            # Set the text of the label, with the standard errors of the sampling
+            meanError, stdError = self.histogramEngine.get_errors()
+            if meanError == 0:
+                self.setLabelText(0, f"<html>M&#772; = {mean} & &#963; = {std}</html>")
+            else:
+                self.setLabelText(0, f"<html>M&#772; = {mean} &#177; {meanError:.2f} & &#963; = {std} &#177; {stdError:.2f}</html>")
 
-            # Take the value of mean and std before changing it into an histogram
-            mean = round(np.mean(data), 2)
-            std = round(np.std(data), 2)
+        # Plot method for the list of lists
+        elif self.FrameOrLists == "lists":
+            data = data[:1] if numberOfPoints == 1 else data
+            self.setNumberOfCurves(len(data))
+
+            for i, datum in enumerate(data):
+                # Only the values added to the list since the last update are counted
+                runningHistogram = self.runningHistograms[i]
+                if datum is not self.runningLists[i] or len(datum) < runningHistogram.nb_values:
+                    runningHistogram.reset()
+                    self.runningLists[i] = datum
+                runningHistogram.add_values(datum[runningHistogram.nb_values:])
+
+                # Running mean and std of each pixel
+                mean, std = runningHistogram.get_mean_std()
+                mean, std = round(mean, 2), round(std, 2)
+                self.setCurveData(i, runningHistogram.counts)
+
+                # Set the text of the label
+                if len(data) == 1:
+                    self.setLabelText(i, f"<html>M&#772; = {mean} & &#963; = {std}</html>")
+                else:
+                    self.setLabelText(i, f"<html>M&#772;<sub>{i + 1}</sub> = {mean} & &#963;<sub>{i + 1}</sub> = {std}</html>")
+
+            for i in range(len(data), len(self.labels)):
+                self.setLabelText(i, "")
+
+    def setCurveData(self, index, histogram, scale = 1):
+        """
+        Method used to show a histogram with one of the curves, on its non empty bins only.
 
-            data = self.calculateHistogram(data)
-            firstIndex, lastIndex = self.findFirstLastIndex(data)
-            barGraph = pg.BarGraphItem(x = self.abscissas[firstIndex:lastIndex], height = data[firstIndex:lastIndex], width = 1, brush ='blue')
-            self.plotChart.addItem(barGraph)
+        Args:
+            index (int): index of the curve.
+            histogram (np.ndarray): counts of the histogram, can be overwritten after the call.
+            scale (float, optional): factor applied to the counts. Defaults to 1.
+        """
+        firstIndex, lastIndex = self.findFirstLastIndex(histogram)
+        if firstIndex == lastIndex:
+            self.curves[index].clear()
+        else:
+            # The product is a new array, the curve does not keep the counts of the engine
+            self.curves[index].setData(self.edges[firstIndex:lastIndex + 1], histogram[firstIndex:lastIndex] * scale)
+
+    def setNumberOfCurves(self, numberOfCurves):
+        """
+        Method used to show the first numberOfCurves curves, and their names in the legend, in "lists" mode.
+
+        Args:
+            numberOfCurves (int): number of curves shown.
+        """
+        if numberOfCurves == self.numberOfCurves:
+            return
+        for i, curve in enumerate(self.curves):
+            self.legend.removeItem(curve)
+            curve.setVisible(i < numberOfCurves)
+            if i < numberOfCurves:
+                self.legend.addItem(curve, "Pixel n°" + str(i + 1))
+        self.numberOfCurves = numberOfCurves
+
+    def setLabelText(self, index, text):
+        """
+        Method used to change the text of a label, only if it is different.
 
-            # Set the text of the label
-            self.text_label_1.setText(f"<html>M&#772; = {mean} & &#963; = {std}</html>")
+        Args:
+            index (int): index of the label.
+            text (str): HTML text of the label.
+        """
+        if text != self.labelTexts[index]:
+            self.labelTexts[index] = text
+            self.labels[index].setText(text)
 
+    def setRenderingPaused(self, paused):
+        """
+        Method used to pause the rendering, for example while another tab is shown.
+        The last data given during the pause is shown when it ends.
 
-        # Plot method for the list of lists
-        elif self.FrameOrLists == "lists":
-            if numberOfPoints == 1:
-                color = self.colors[0]
+        Args:
+            paused (bool): True to pause the rendering.
+        """
+        self.renderingPaused = paused
+        if not paused and self.pendingUpdate is not None and not self.isRenderingPaused():
+            self.update(*self.pendingUpdate)
 
-                # Take the value of mean and std before changing it into an histogram
-                mean = round(np.mean(data[0]), 2)
-                std = round(np.std(data[0]), 2)
+    def isRenderingPaused(self):
+        """
+        Method used to know if the histogram is drawn by update().
 
-                histogram = self.calculateHistogram(data[0])
-                firstIndex, lastIndex = self.findFirstLastIndex(histogram)
-                barGraph = pg.BarGraphItem(x = self.abscissas[firstIndex:lastIndex], height = histogram[firstIndex:lastIndex], width = 0.6, brush = color, name = "Pixel n°" + str(1))
-                self.plotChart.addItem(barGraph)
+        Returns:
+            bool: True if the rendering is paused, or if the widget is hidden or minimized.
+        """
+        return self.renderingPaused or not self.isVisible() or self.window().isMinimized()
 
-                # Set the text of the labels
-                self.text_label_1.setText(f"<html>M&#772; = {mean} & &#963; = {std}</html>")
-                self.text_label_2.setText("")
-                self.text_label_3.setText("")
-                self.text_label_4.setText("")
+    def showEvent(self, event):
+        """
+        Method used by Qt when the widget is shown, to draw the data given while it was hidden.
 
-            else:
-                for i, datum in enumerate(data):
-                    color = self.colors[i]
-                    mean1, mean2, mean3, mean4 = round(np.mean(data[0]), 2), round(np.mean(data[1]), 2), round(np.mean(data[2]), 2), round(np.mean(data[3]), 2)
-                    std1, std2, std3, std4 = round(np.std(data[0]), 2), round(np.std(data[1]), 2), round(np.std(data[2]), 2), round(np.std(data[3]), 2)
-                    
-                    histogram = self.calculateHistogram(datum)
-                    firstIndex, lastIndex = self.findFirstLastIndex(histogram)
-                    barGraph = pg.BarGraphItem(x = self.abscissas[firstIndex:lastIndex], height = histogram[firstIndex:lastIndex], width = 0.6, brush = color, name = "Pixel n°" + str(i + 1))
-                    self.plotChart.addItem(barGraph)
-
-                    # Set the text of the labels
-                    self.text_label_1.setText(f"<html>M&#772;<sub>1</sub> = {mean1} & &#963;<sub>1</sub> = {std1}</html>")
-                    self.text_label_2.setText(f"<html>M&#772;<sub>2</sub> = {mean2} & &#963;<sub>2</sub> = {std2}</html>")
-                    self.text_label_3.setText(f"<html>M&#772;<sub>3</sub> = {mean3} & &#963;<sub>3</sub> = {std3}</html>")
-                    self.text_label_4.setText(f"<html>M&#772;<sub>4</sub> = {mean4} & &#963;<sub>4</sub> = {std4}</html>")
+        Args:
+            event (QShowEvent): show event.
+        """
+        super().showEvent(event)
+        if self.pendingUpdate is not None and not self.isRenderingPaused():
+            self.update(*self.pendingUpdate)
 
     def findFirstLastIndex(self, list):
         """
         Method used to find the first and the last index between or the intersting values are <=> values != 0.
 
         Args:
-            list (list): list studied.
+            list (np.ndarray): histogram studied.
 
         Returns:
-            int: first and last interesting index.
+            int: first and last interesting index (+ 1, so it can be used in a slice).
         """
-        first_index = None
-        last_index = None
-        
-        for i in range(len(list)):
-            if list[i] != 0:
-                if first_index is None:
-                    first_index = i
-                last_index = i
-
-        # I add +1 here to prevent the +1 everywhere else, since it is a list index ...
-        return first_index, last_index + 1
+        return find_first_last_index(list)
 
     def startMethod(self):
         """
@@ -1,5 +1,6 @@
 # Libraries to import
 import sys
+import threading
 from PyQt5.QtWidgets import QApplication, QMainWindow, QGridLayout, QWidget, QPushButton, QAction
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import QTimer
@@ -63,40 +64,30 @@ class MainWidget(QWidget):
         layoutMain.addWidget(self.cameraHistogramWidget, 4, 5, 4, 2) # row = 4, column = 5, rowSpan = 4, columnSpan = 2
         layoutMain.addWidget(self.chartHistogramWidget, 4, 7, 4, 2) # row = 4, column = 7, rowSpan = 4, columnSpan = 2
 
-        
+
+        # The accumulated histogram is fed by the acquisition thread of the camera
+        self.cameraHistogramWidget.temporalHistogramChanged.connect(self.cameraWidget.setTemporalHistogram)
+
+        # The window is drawn while the cameras are discovered, the camera is connected afterwards
+        self.cameraWidget.camerasDiscovered.connect(self.initCamera)
+
+    def initCamera(self):
+        """
+        Method used to connect the camera and to setup the settings, once the cameras are discovered.
+        """
         self.cameraWidget.connectCamera()
         self.cameraWidget.launchVideo()
 
         self.initSettings()
 
-        # lambda function used to prevent the Nonetype error        
-        self.settingsWidget.AOISettingX.slider.valueChanged.connect(lambda : self.cameraWidget.launchAOI(
+        # The AOI sliders only request the AOI, the camera widget applies it once they stop moving
+        for AOISetting in [self.settingsWidget.AOISettingX, self.settingsWidget.AOISettingY,
+                           self.settingsWidget.AOISettingWidth, self.settingsWidget.AOISettingHeight]:
+            AOISetting.slider.valueChanged.connect(lambda : self.cameraWidget.requestAOI(
                                                             self.settingsWidget.AOIXGetValue(),
                                                             self.settingsWidget.AOIYGetValue(),
                                                             self.settingsWidget.AOIWidthGetValue(),
-                                                            self.settingsWidget.AOIHeightGetValue(),
-                                                            type = "forced"))
-        
-        self.settingsWidget.AOISettingY.slider.valueChanged.connect(lambda : self.cameraWidget.launchAOI(
-                                                            self.settingsWidget.AOIXGetValue(),
-                                                            self.settingsWidget.AOIYGetValue(),
-                                                            self.settingsWidget.AOIWidthGetValue(),
-                                                            self.settingsWidget.AOIHeightGetValue(),
-                                                            type = "forced"))
-        
-        self.settingsWidget.AOISettingWidth.slider.valueChanged.connect(lambda : self.cameraWidget.launchAOI(
-                                                            self.settingsWidget.AOIXGetValue(),
-                                                            self.settingsWidget.AOIYGetValue(),
-                                                            self.settingsWidget.AOIWidthGetValue(),
-                                                            self.settingsWidget.AOIHeightGetValue(),
-                                                            type = "forced"))
-        
-        self.settingsWidget.AOISettingHeight.slider.valueChanged.connect(lambda : self.cameraWidget.launchAOI(
-                                                            self.settingsWidget.AOIXGetValue(),
-                                                            self.settingsWidget.AOIYGetValue(),
-                                                            self.settingsWidget.AOIWidthGetValue(),
-                                                            self.settingsWidget.AOIHeightGetValue(),
-                                                            type = "forced"))
+                                                            self.settingsWidget.AOIHeightGetValue()))
 
     def initSettings(self):
         """
@@ -125,7 +116,7 @@ class MainWidget(QWidget):
 
             self.sensorSettingsWidget.exposureTime.setValue(self.sensorSettingsWidget.exposureTime.floatListToSelect[len(self.sensorSettingsWidget.exposureTime.floatListToSelect)//2])
 
-        elif self.cameraWidget.type == 'basler' : 
+        elif self.cameraWidget.type in ['basler', 'simulated', 'replay'] : 
             self.sensorSettingsWidget.exposureTime.floatListToSelect = self.cameraWidget.generateExpositionRangeList(1000)
             self.sensorSettingsWidget.exposureTime.slider.setRange(0, len(self.sensorSettingsWidget.exposureTime.floatListToSelect)//50 - 1)
 
@@ -149,7 +140,7 @@ class MainWidget(QWidget):
         # Initialisation of the BlackLevel setting
         if self.cameraWidget.type == 'ueye' :
             blackLevelMin, blackLevelMax = 0, 256
-        elif self.cameraWidget.type == 'basler' :
+        elif self.cameraWidget.type in ['basler', 'simulated', 'replay'] :
             blackLevelMin, blackLevelMax = self.cameraWidget.camera.get_black_level_range()
 
         self.sensorSettingsWidget.blackLevel.slider.setMinimum(int(blackLevelMin))
@@ -159,6 +150,32 @@ class MainWidget(QWidget):
         self.sensorSettingsWidget.blackLevel.slider.valueChanged.connect(
             lambda : self.cameraWidget.camera.set_black_level(self.sensorSettingsWidget.blackLevel.getValue()))
 
+        # Initialisation of the display settings, on the range of the raw codes
+        maximumCode = 2 ** self.cameraWidget.nBitsPerPixel - 1
+        self.sensorSettingsWidget.displayLevel.slider.setMaximum(maximumCode)
+        self.sensorSettingsWidget.displayLevel.setValue((maximumCode + 1) // 2)
+        self.sensorSettingsWidget.displayWidth.slider.setMaximum(maximumCode + 1)
+        self.sensorSettingsWidget.displayWidth.setValue(maximumCode + 1)
+
+        self.sensorSettingsWidget.displayMode.currentIndexChanged.connect(self.updateDisplayLUT)
+        for displaySetting in [self.sensorSettingsWidget.displayLevel, self.sensorSettingsWidget.displayWidth,
+                               self.sensorSettingsWidget.displayGamma]:
+            displaySetting.slider.valueChanged.connect(self.updateDisplayLUT)
+
+    def updateDisplayLUT(self):
+        """
+        Method used to send the display settings to the display LUT of the camera widget.
+        """
+        displayLUT = self.cameraWidget.displayLUT
+        mode = self.sensorSettingsWidget.displayMode.currentText()
+
+        displayLUT.set_auto_stretch(mode == "Auto-stretch")
+        if mode != "Auto-stretch":
+            displayLUT.set_window_level(self.sensorSettingsWidget.displayLevel.getValue(),
+                                        self.sensorSettingsWidget.displayWidth.getValue())
+        displayLUT.set_mode({"Gamma": "gamma", "Log": "log"}.get(mode, "linear"),
+                            gamma = self.sensorSettingsWidget.displayGamma.getValue() / 10)
+
 #-------------------------------------------------------------------------------------------------------
 
 class MainWindow(QMainWindow):
@@ -176,6 +193,8 @@ class MainWindow(QMainWindow):
 
         # Variables
         self.oneOrFour = 4
+        self.burstFrames = 100
+        self.burstStack = None
 
         # Define Window title
         self.setWindowTitle("TP : Étude d'un capteur CMOS industriel")
@@ -212,6 +231,13 @@ class MainWindow(QMainWindow):
         oneOrFourButton = QPushButton("I / IV")
         oneOrFourButton.clicked.connect(lambda : self.changeOneOrFour())
 
+        self.burstButton = QPushButton("Burst")
+        self.burstButton.clicked.connect(lambda : self.startBurst())
+        self.mainWidget.cameraWidget.burstFinished.connect(self.analyseBurst)
+
+        self.recordButton = QPushButton("Record")
+        self.recordButton.clicked.connect(lambda : self.changeRecording())
+
         self.AOIButton = QPushButton("AOI")
         self.AOIButton.clicked.connect(lambda : self.mainWidget.cameraWidget.launchAOI(
                                                             self.mainWidget.settingsWidget.AOIXGetValue(),
@@ -224,7 +250,7 @@ class MainWindow(QMainWindow):
                            "border-color: black; padding: 6px; font: bold 12px; color: white;"
                            "text-align: center; border-style: solid;")
 
-        for button in [quitButton, AOISettingsButton, self.AOIButton, startButton, stopButton, saveButton, clearButton, oneOrFourButton]:
+        for button in [quitButton, AOISettingsButton, self.AOIButton, startButton, stopButton, saveButton, clearButton, oneOrFourButton, self.burstButton, self.recordButton]:
             button.setStyleSheet("background-color: #7fadff; color: black;")
 
         toolbarMainWindow.addWidget(quitButton)
@@ -249,26 +275,41 @@ class MainWindow(QMainWindow):
         separator2.setSeparator(True)
         toolbarMainWindow.addAction(separator2)
         toolbarMainWindow.addWidget(oneOrFourButton)
+        toolbarMainWindow.addWidget(self.burstButton)
+        toolbarMainWindow.addWidget(self.recordButton)
 
         # Launching the update methods
         self.mainWidget.timer.timeout.connect(self.updateCameraHistogram)
         self.mainWidget.timer.timeout.connect(self.updateChart)
         self.mainWidget.timer.timeout.connect(self.updateChartHistogram)
 
+        # Counters of the pipeline, shown in the status bar
+        self.statusTimer = QTimer()
+        self.statusTimer.setInterval(500)
+        self.statusTimer.timeout.connect(self.updateStatusBar)
+        self.statusTimer.start()
+
     def updateCameraHistogram(self):
         """
         Update the camera's histogram with the new values.
         """
-        # Get frame
-        cameraFrame = self.mainWidget.cameraWidget.cameraFrame
+        # Get the latest frame of the acquisition ring
+        cameraFrame = self.mainWidget.cameraWidget.getLatestFrame()
+        if cameraFrame is None:
+            return
 
         # Plot it
         self.mainWidget.cameraHistogramWidget.update(cameraFrame)
+        self.mainWidget.cameraWidget.pipelineStats.count_analysed()
 
     def updateChartHistogram(self):
         """
         Update the chart's histogram with the new values.
         """
+        # Nothing to plot before the first point of the chart (the camera may still be connecting)
+        if self.mainWidget.chartWidget.abscissaAxis == []:
+            return
+
         # Get values
         ordinates = [self.mainWidget.chartWidget.ordinateAxis1,
                 self.mainWidget.chartWidget.ordinateAxis2,
@@ -282,11 +323,101 @@ class MainWindow(QMainWindow):
         """
         Update the chart with the new values.
         """
-        # Generate a data point
-        newOrdinates = self.mainWidget.cameraWidget.getGraphValues()
+        # Generate a data point, dated by the camera
+        cameraFrame, frameId, timestamp = self.mainWidget.cameraWidget.getLatestFrameInfo()
+        if cameraFrame is None:
+            return
+        newOrdinates = self.mainWidget.cameraWidget.getGraphValues(frame = cameraFrame)
 
         # Call the add_data_point method to add the new data point to the graph
-        self.mainWidget.chartWidget.addOrdinatesPoints(ordinates = newOrdinates, numberOfPoints = self.oneOrFour)
+        self.mainWidget.chartWidget.addOrdinatesPoints(ordinates = newOrdinates, numberOfPoints = self.oneOrFour,
+                                                       timestamp = timestamp, frameId = frameId)
+
+    def startBurst(self):
+        """
+        Method used to start a burst. The button stays disabled until the burst is finished.
+        """
+        if self.mainWidget.cameraWidget.startBurst(self.burstFrames) is not None:
+            self.burstButton.setEnabled(False)
+
+    def analyseBurst(self, burst):
+        """
+        Method used to keep the stack of a finished burst and to print its temporal noise.
+        The noise is computed by a worker thread, so the GUI is not frozen by a large stack.
+
+        Args:
+            burst (BurstCapture): finished burst.
+        """
+        self.burstStack = burst.stack
+        self.burstButton.setEnabled(self.mainWidget.cameraWidget.isAcquiring())
+        threading.Thread(target = self.printBurstReport, args = (burst,), daemon = True).start()
+
+    def printBurstReport(self, burst):
+        """
+        Method used by the worker thread of analyseBurst to print the report of a burst.
+
+        Args:
+            burst (BurstCapture): finished burst.
+        """
+        report = burst.get_report()
+
+        # Temporal noise : standard deviation of each pixel along the burst, averaged over the frame
+        temporalNoise = burst.get_temporal_noise()
+
+        # Print into the command prompt
+        print(f"Burst : {report['frames']} frames at {report['fps']:.1f} fps, {report['dropped']} dropped, "
+              f"temporal noise = {temporalNoise:.2f} DN.")
+
+    def updateStatusBar(self):
+        """
+        Update the status bar with the counters of the pipeline.
+        """
+        stats = self.mainWidget.cameraWidget.getPipelineStats()
+        scheduler = self.mainWidget.cameraWidget.displayScheduler
+
+        # A burst needs a running acquisition, and only one runs at a time
+        self.burstButton.setEnabled(self.mainWidget.cameraWidget.isAcquiring() and
+                                    not self.mainWidget.cameraWidget.isBurstRunning())
+
+        # A recording needs a running acquisition, but can always be stopped
+        recorder = self.mainWidget.cameraWidget.recorder
+        self.recordButton.setEnabled(self.mainWidget.cameraWidget.isAcquiring() or recorder is not None)
+
+        # Frames skipped by the driver pool, only shown when the backend has one
+        poolText = ""
+        if stats['pool_skipped'] > 0 or stats['pool_busy'] > 0:
+            poolText = f"Pool skipped : {stats['pool_skipped']} (busy {stats['pool_busy']})  |  "
+
+        # Frames sent into the bursts, not counted as delivered
+        burstText = ""
+        if stats['burst'] > 0:
+            burstText = f"Burst : {stats['burst']}  |  "
+
+        # Last error of the acquisition thread, kept until the acquisition is restarted
+        errorText = ""
+        if self.mainWidget.cameraWidget.errorMessage is not None:
+            errorText = f"Error : {self.mainWidget.cameraWidget.errorMessage}  |  "
+        if recorder is not None and recorder.error is not None:
+            errorText += f"Recording failed : {recorder.error}  |  "
+
+        self.statusBar().showMessage(f"{errorText}Delivered : {stats['delivered']} ({stats['fps']:.1f} fps)  |  {burstText}"
+                                     f"Dropped : {stats['dropped']}  |  {poolText}Skipped : {stats['skipped']}  |  "
+                                     f"Displayed : {stats['displayed']} ({stats['display_fps']:.1f} fps, "
+                                     f"{'throttled' if scheduler.is_throttled() else 'max'} {scheduler.get_rate():.0f})  |  "
+                                     f"Analysed : {stats['analysed']}  |  "
+                                     f"Latency : {stats['latency']:.1f} ms (mean {stats['latency_mean']:.1f}, max {stats['latency_max']:.1f})")
+
+    def changeRecording(self):
+        """
+        Method used to start or stop the raw recording of the frames.
+        """
+        if self.mainWidget.cameraWidget.recorder is None:
+            if self.mainWidget.cameraWidget.startRecording() is None:
+                return
+            self.recordButton.setText("Stop recording")
+        else:
+            self.mainWidget.cameraWidget.stopRecording()
+            self.recordButton.setText("Record")
 
     def changeOneOrFour(self):
         """
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# Libraries to import
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QGridLayout, QLabel
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
+import sys
+
+from cameraBackends import registry
+from CameraWidget import Camera_Widget
+from ChartWidget import Chart_Widget
+from HistogramWidget import Histogram_Widget
+
+#-------------------------------------------------------------------------------------------------------
+
+class Multi_Camera_Widget(QWidget):
+    """
+    Widget used to show several cameras side by side, each one with its display, histogram and chart.
+    Every camera has its own acquisition thread and frame ring, so the acquisitions run at the same time.
+
+    Args:
+        QWidget (class): QWidget can be put in another widget and / or window.
+    """
+
+    # Emitted when the discovery of the cameras is finished (from a background thread)
+    discoveryFinished = pyqtSignal()
+
+    def __init__(self, colormode = "MONO8", synchronized = False, displayInterval = 50, measurementInterval = 1000, maxCameras = 3):
+        """
+        Initialisation of the widget.
+
+        Args:
+            colormode (str, optional): colormode of every camera. Defaults to "MONO8".
+            synchronized (bool, optional): True to refresh every panel in the same timer tick,
+                                           False to let each panel run its own timers. Defaults to False.
+            displayInterval (int, optional): minimum time between two refreshes of the displays in ms. Defaults to 50.
+            measurementInterval (int, optional): time between two points of the histograms and charts in ms. Defaults to 1000.
+            maxCameras (int, optional): maximum number of cameras shown. Defaults to 3.
+        """
+        super().__init__()
+        self.setStyleSheet("background: #f2f2f2;")
+
+        self.colormode = colormode
+        self.synchronized = synchronized
+        self.displayInterval = displayInterval
+        self.measurementInterval = measurementInterval
+        self.maxCameras = maxCameras
+
+        # One panel per camera : [cameraWidget, histogramWidget, chartWidget, displayTimer, measurementTimer]
+        self.panels = []
+
+        # Shared timers of the synchronized mode
+        self.displayTimer = QTimer()
+        self.displayTimer.setInterval(self.displayInterval)
+        self.displayTimer.timeout.connect(self.refreshDisplays)
+
+        self.measurementTimer = QTimer()
+        self.measurementTimer.setInterval(self.measurementInterval)
+
+        self.layoutMain = QGridLayout()
+        self.setLayout(self.layoutMain)
+        self.layoutMain.addWidget(QLabel("Searching for cameras..."), 0, 0, 1, 1)
+
+        # The panels are created once the cameras are known
+        self.discoveryFinished.connect(self.initPanels, Qt.QueuedConnection)
+        registry.start_discovery().add_done_callback(lambda discovery : self.discoveryFinished.emit())
+
+    def initPanels(self):
+        """
+        Method used to create and connect one panel per discovered camera.
+        """
+        # Remove the waiting label
+        self.layoutMain.itemAt(0).widget().deleteLater()
+
+        cameras = registry.get_cameras()[:self.maxCameras]
+        for index, cam in enumerate(cameras):
+            cameraWidget = Camera_Widget(colormode = self.colormode, displayRate = 1000 / self.displayInterval)
+            cameraWidget.connectCamera(index)
+
+            if self.synchronized:
+                measurementTimer = self.measurementTimer
+            else:
+                measurementTimer = QTimer()
+                measurementTimer.setInterval(self.measurementInterval)
+
+                # The display of each camera has its own timer, run by its display scheduler
+                cameraWidget.launchVideo()
+
+            histogramWidget = Histogram_Widget(histogramTitle = f"{cam[3]} (SN : {cam[2]})", FrameOrLists = "frame", timer = measurementTimer)
+            histogramWidget.temporalHistogramChanged.connect(cameraWidget.setTemporalHistogram)
+            chartWidget = Chart_Widget(timer = measurementTimer)
+            panel = [cameraWidget, histogramWidget, chartWidget]
+
+            if not self.synchronized:
+                measurementTimer.timeout.connect(lambda panel = panel : self.updatePanel(panel))
+
+            self.layoutMain.addWidget(cameraWidget, 0, index, 1, 1) # row = 0, column = index, rowSpan = 1, columnSpan = 1
+            self.layoutMain.addWidget(histogramWidget, 1, index, 1, 1) # row = 1, column = index, rowSpan = 1, columnSpan = 1
+            self.layoutMain.addWidget(chartWidget, 2, index, 1, 1) # row = 2, column = index, rowSpan = 1, columnSpan = 1
+            self.panels.append(panel)
+
+            chartWidget.startMethod()
+
+        if self.synchronized:
+            self.measurementTimer.timeout.connect(self.updatePanels)
+            self.displayTimer.start()
+
+    def refreshDisplays(self):
+        """
+        Method used in synchronized mode to refresh every display in the same tick.
+        The shared timer follows the slowest display scheduler.
+        """
+        for cameraWidget, histogramWidget, chartWidget in self.panels:
+            cameraWidget.refreshGraph()
+
+        interval = max([self.displayInterval] + [panel[0].displayScheduler.get_interval() for panel in self.panels])
+        if interval != self.displayTimer.interval():
+            self.displayTimer.setInterval(interval)
+
+    def updatePanels(self):
+        """
+        Method used in synchronized mode to add a point to every histogram and chart in the same tick.
+        """
+        for panel in self.panels:
+            self.updatePanel(panel)
+
+    def updatePanel(self, panel):
+        """
+        Method used to update the histogram and the chart of one camera with its latest frame.
+
+        Args:
+            panel (list): [cameraWidget, histogramWidget, chartWidget] of the camera.
+        """
+        cameraWidget, histogramWidget, chartWidget = panel
+
+        cameraFrame, frameId, timestamp = cameraWidget.getLatestFrameInfo()
+        if cameraFrame is None:
+            return
+        histogramWidget.update(cameraFrame)
+        cameraWidget.pipelineStats.count_analysed()
+        chartWidget.addOrdinatesPoints(ordinates = cameraWidget.getGraphValues(frame = cameraFrame), numberOfPoints = 4,
+                                       timestamp = timestamp, frameId = frameId)
+
+    def closeEvent(self, event):
+        """
+        Method used to stop every camera when the widget is closed.
+
+        Args:
+            event (QCloseEvent): close event.
+        """
+        self.displayTimer.stop()
+        self.measurementTimer.stop()
+        for cameraWidget, histogramWidget, chartWidget in self.panels:
+            chartWidget.timerUpdate.stop()
+            cameraWidget.disconnectCamera()
+
+#-------------------------------------------------------------------------------------------------------
+
+class MultiCameraWindow(QMainWindow):
+    """
+    Window comparing the cameras of the bench live.
+
+    Args:
+        QMainWindow (class): QMainWindow can contain several widgets.
+    """
+    def __init__(self, synchronized = False):
+        """
+        Initialisation of the window.
+
+        Args:
+            synchronized (bool, optional): True to refresh every panel in the same timer tick. Defaults to False.
+        """
+        super().__init__()
+
+        self.setWindowTitle("Cameras comparison")
+        self.setGeometry(50, 50, 1600, 1200)
+
+        self.multiCameraWidget = Multi_Camera_Widget(synchronized = synchronized)
+        self.setCentralWidget(self.multiCameraWidget)
+
+    def closeEvent(self, event):
+        """
+        Method used to stop the cameras when the window is closed.
+
+        Args:
+            event (QCloseEvent): close event.
+        """
+        self.multiCameraWidget.closeEvent(event)
+
+#-------------------------------------------------------------------------------------------------------
+
+# Launching as main for tests
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+
+    window = MultiCameraWindow(synchronized = "--synchronized" in sys.argv)
+    window.show()
+
+    sys.exit(app.exec_())
@@ -1,5 +1,5 @@
 # Libraries to import
-from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget, QApplication, QGroupBox, QSlider, QGridLayout, QLineEdit
+from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget, QApplication, QGroupBox, QSlider, QGridLayout, QLineEdit, QComboBox
 from PyQt5.QtCore import Qt
 import sys
 import math
@@ -41,8 +41,26 @@ class Sensor_Settings_Widget(QWidget):
 
         group_box.setLayout(layout)
 
+        # Display settings : how the raw codes are shown, the frames themselves are not changed
+        display_group_box = QGroupBox("Display Settings")
+        display_layout = QVBoxLayout()
+
+        self.displayMode = QComboBox()
+        self.displayMode.addItems(["Linear", "Gamma", "Log", "Auto-stretch"])
+        self.displayMode.setStyleSheet("background-color: white; padding: 4px; color: black; border-style: solid; border-width: 1px;")
+        self.displayLevel = Setting_Widget_Int(settingLabel = " Level ", maximumValue = 255, initialisationValue = 128)
+        self.displayWidth = Setting_Widget_Int(settingLabel = " Width ", minimumValue = 1, maximumValue = 256, initialisationValue = 256)
+        self.displayGamma = Setting_Widget_Int(settingLabel = " Gamma x10 ", minimumValue = 1, maximumValue = 50, initialisationValue = 10)
+
+        display_layout.addWidget(self.displayMode)
+        display_layout.addWidget(self.displayLevel)
+        display_layout.addWidget(self.displayWidth)
+        display_layout.addWidget(self.displayGamma)
+        display_group_box.setLayout(display_layout)
+
         main_layout = QGridLayout()
         main_layout.addWidget(group_box, 0, 0, 1, 1) # row = 0, column = 0, rowSpan = 1, columnSpan = 0 <=> QHBoxLayout or V
+        main_layout.addWidget(display_group_box, 0, 1, 1, 1) # row = 0, column = 1, rowSpan = 1, columnSpan = 1
         
         self.setLayout(main_layout)
 
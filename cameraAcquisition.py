@@ -0,0 +1,600 @@
+# -*- coding: utf-8 -*-
+"""
+Acquisition layer placed between the camera drivers (cameraBasler / cameraUeye) and the widgets.
+
+An AcquisitionThread owns the camera object and grabs frames as fast as the sensor delivers them,
+copying each one into the next slot of a preallocated FrameRingBuffer. The display, the histogram
+and the chart only read the latest published slot, at their own pace, without ever blocking the grab.
+
+Every frame carries the frame ID and the timestamp (in ns) given by the camera, so the consumers
+can date their measurements with the clock of the sensor instead of the time of the GUI timers.
+
+PipelineStats counts the frames at each stage (delivered by the camera, dropped before reaching the
+application, displayed, analysed) and the latency between the arrival of a frame and its display.
+
+A BurstCapture can be given to the thread to store N consecutive frames into a preallocated
+(N, height, width) stack, at the rate of the sensor, and a FrameRecorder (cameraRecorder) to
+stream every frame to the disk.
+
+The camera object belongs to the acquisition thread while it runs : a change of a setting which can't
+wait for the end of the acquisition (e.g. moving the AOI) is given to AcquisitionThread.submit() and run
+between two frames, never during a get_image().
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import threading
+import queue
+import time
+import numpy as np
+
+class Acquisition_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Acquisition_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+#-------------------------------------------------------------------------------------------------------
+
+class FrameRingBuffer():
+    """
+    Preallocated ring of N frames with a single writer and any number of readers.
+
+    The writer fills the slot following the last published one, then publishes it by incrementing
+    write_count. Publishing is a single attribute assignment, so readers never take a lock : they
+    read write_count, then the slot it points to.
+
+    A view returned by get_latest() is only safe while the writer has not come back to its slot.
+    A reader keeping a frame longer than a few frame periods (display, histograms, chart) copies it
+    with copy_latest(), which checks after the copy that the slot was not reused during it.
+    """
+
+    def __init__(self, nb_buffers, height, width, dtype = np.uint8):
+        """
+        Initialisation of the ring.
+
+        Args:
+            nb_buffers (int): number of frames kept in the ring (at least 2).
+            height (int): height of a frame in pixels.
+            width (int): width of a frame in pixels.
+            dtype (np.dtype, optional): dtype of a pixel. Defaults to np.uint8.
+        """
+        if nb_buffers < 2:
+            raise Acquisition_ERROR("FrameRingBuffer needs at least 2 buffers")
+
+        self.nb_buffers = nb_buffers
+        self.height = height
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.frames = np.zeros((nb_buffers, height, width), dtype = self.dtype)
+        self.frame_ids = np.zeros(nb_buffers, dtype = np.int64)
+        self.timestamps = np.zeros(nb_buffers, dtype = np.int64)
+        self.arrival_times = np.zeros(nb_buffers, dtype = np.int64)
+
+        # Number of frames published since the creation of the ring
+        self.write_count = 0
+
+    def get_write_slot(self):
+        """
+        Method used by the writer to get the slot of the next frame. It is not visible to the readers
+        until publish() is called.
+
+        Returns:
+            np.ndarray: view on the slot to fill.
+        """
+        return self.frames[self.write_count % self.nb_buffers]
+
+    def publish(self, frame_id = 0, timestamp = 0):
+        """
+        Method used by the writer to make the slot returned by get_write_slot() the latest frame.
+
+        Args:
+            frame_id (int, optional): frame ID given by the camera. Defaults to 0.
+            timestamp (int, optional): timestamp of the camera in ns. Defaults to 0.
+        """
+        index = self.write_count % self.nb_buffers
+        self.frame_ids[index] = frame_id
+        self.timestamps[index] = timestamp
+        self.arrival_times[index] = time.perf_counter_ns()
+        self.write_count += 1
+
+    def get_latest(self):
+        """
+        Method used by the readers to get the latest published frame.
+
+        Returns:
+            np.ndarray, int: view on the latest frame (None if no frame yet) and its frame count.
+        """
+        count = self.write_count
+        if count == 0:
+            return None, 0
+        return self.frames[(count - 1) % self.nb_buffers], count
+
+    def get_info(self, count):
+        """
+        Method used by the readers to get the frame ID and the timestamp of a published frame.
+
+        Args:
+            count (int): frame count returned by get_latest().
+
+        Returns:
+            int, int: frame ID and timestamp in ns.
+        """
+        index = (count - 1) % self.nb_buffers
+        return int(self.frame_ids[index]), int(self.timestamps[index])
+
+    def get_arrival_time(self, count):
+        """
+        Method used by the readers to get the time at which a frame was published.
+
+        Args:
+            count (int): frame count returned by get_latest().
+
+        Returns:
+            int: time.perf_counter_ns() when the frame was published.
+        """
+        return int(self.arrival_times[(count - 1) % self.nb_buffers])
+
+    def is_valid(self, count):
+        """
+        Method used to know if the frame number count is still untouched by the writer.
+        A reader keeping a view longer than nb_buffers - 1 frame periods must check it.
+
+        Args:
+            count (int): frame count returned by get_latest().
+
+        Returns:
+            bool: True if the slot has not been reused yet.
+        """
+        return self.write_count - count < self.nb_buffers - 1
+
+    def copy_latest(self, out, retries = 3):
+        """
+        Method used by the readers to copy the latest published frame, without tearing : the copy is
+        made again from the new latest frame if the writer reused the slot during the copy.
+
+        Args:
+            out (np.ndarray): array (height, width) of the dtype of the ring receiving the frame.
+            retries (int, optional): maximum number of copies. Defaults to 3.
+
+        Returns:
+            np.ndarray, int, tuple: out (None if no frame or if every copy was overwritten), frame count,
+                                    and (frame ID, timestamp in ns, arrival time in ns) of the frame.
+        """
+        count = 0
+        for attempt in range(retries):
+            count = self.write_count
+            if count == 0:
+                return None, 0, (0, 0, 0)
+
+            index = (count - 1) % self.nb_buffers
+            np.copyto(out, self.frames[index])
+            info = (int(self.frame_ids[index]), int(self.timestamps[index]), int(self.arrival_times[index]))
+            if self.is_valid(count):
+                return out, count, info
+        return None, count, (0, 0, 0)
+
+#-------------------------------------------------------------------------------------------------------
+
+class PipelineStats():
+    """
+    Counters of the frames at each stage of the pipeline. Each counter is only written by one thread :
+    the acquisition thread counts the delivered, burst and dropped frames, the GUI counts the displayed and analysed ones.
+    """
+
+    def __init__(self):
+        """
+        Initialisation of the counters.
+        """
+        self.reset()
+
+    def reset(self):
+        """
+        Method used to reset every counter.
+        """
+        self.nb_delivered = 0
+        self.nb_burst = 0
+        self.nb_dropped = 0
+        self.nb_displayed = 0
+        self.nb_analysed = 0
+        self.nb_pool_skipped = 0
+        self.nb_pool_busy = 0
+        self.last_frame_id = None
+        self.latency_sum = 0
+        self.latency_max = 0
+        self.latency_last = 0
+        self.start_time = time.perf_counter()
+
+    def new_sequence(self):
+        """
+        Method used when the acquisition restarts, so the frame ID gap of the restart is not counted as dropped frames.
+        """
+        self.last_frame_id = None
+
+    def count_delivered(self, frame_id = 0):
+        """
+        Method used by the acquisition thread for each frame received from the camera.
+        The frames lost before (by the sensor, the transfer or the driver) are counted from the frame ID gaps.
+
+        Args:
+            frame_id (int, optional): frame ID given by the camera, 0 if unknown. Defaults to 0.
+        """
+        self.nb_delivered += 1
+        self.count_frame_id(frame_id)
+
+    def count_burst(self, frame_id = 0):
+        """
+        Method used by the acquisition thread for each frame sent into a burst stack instead of the ring.
+        These frames are never displayed, so they are not counted as delivered (nor skipped).
+
+        Args:
+            frame_id (int, optional): frame ID given by the camera, 0 if unknown. Defaults to 0.
+        """
+        self.nb_burst += 1
+        self.count_frame_id(frame_id)
+
+    def count_frame_id(self, frame_id):
+        """
+        Method used to count the frames dropped before a received frame, from the frame ID gap.
+
+        Args:
+            frame_id (int): frame ID given by the camera, 0 if unknown.
+        """
+        if self.last_frame_id is not None and frame_id > self.last_frame_id:
+            self.nb_dropped += frame_id - self.last_frame_id - 1
+        self.last_frame_id = frame_id
+
+    def count_displayed(self, arrival_time):
+        """
+        Method used by the display once a frame is shown.
+
+        Args:
+            arrival_time (int): time.perf_counter_ns() when the frame arrived from the camera.
+        """
+        self.nb_displayed += 1
+        self.latency_last = (time.perf_counter_ns() - arrival_time) * 1e-6
+        self.latency_sum += self.latency_last
+        self.latency_max = max(self.latency_max, self.latency_last)
+
+    def count_analysed(self):
+        """
+        Method used by the measurements (histograms, chart) once a frame is analysed.
+        """
+        self.nb_analysed += 1
+
+    def set_pool_counts(self, nb_skipped, nb_busy):
+        """
+        Method used to report the counters of the frame pool of the driver (Basler "callback" mode).
+
+        Args:
+            nb_skipped (int): frames of the pool overwritten before the acquisition thread read them.
+            nb_busy (int): frames written into another slot because the next one was still being read.
+        """
+        self.nb_pool_skipped = nb_skipped
+        self.nb_pool_busy = nb_busy
+
+    def get_stats(self):
+        """
+        Method used to get the counters, e.g. for the performance regression checks.
+
+        Returns:
+            dict: frames delivered to the ring, sent into a burst, dropped (lost before the application), skipped
+                  (delivered but never shown),
+                  displayed and analysed, frames skipped and busy slots of the driver pool, delivered and displayed
+                  frame rates, last, mean and maximum latency between the arrival and the display of a frame in ms.
+        """
+        elapsed = time.perf_counter() - self.start_time
+        return {'delivered': self.nb_delivered, 'burst': self.nb_burst, 'dropped': self.nb_dropped,
+                'skipped': max(self.nb_delivered - self.nb_displayed, 0),
+                'displayed': self.nb_displayed, 'analysed': self.nb_analysed,
+                'pool_skipped': self.nb_pool_skipped, 'pool_busy': self.nb_pool_busy,
+                'fps': self.nb_delivered / elapsed, 'display_fps': self.nb_displayed / elapsed,
+                'latency': self.latency_last,
+                'latency_mean': self.latency_sum / self.nb_displayed if self.nb_displayed > 0 else 0,
+                'latency_max': self.latency_max}
+
+#-------------------------------------------------------------------------------------------------------
+
+class BurstCapture():
+    """
+    Contiguous stack of N frames filled by an AcquisitionThread, with the frame ID, the timestamp of the camera
+    and the time of arrival of each frame.
+    """
+
+    def __init__(self, nb_frames, height, width, dtype = np.uint8, callback = None):
+        """
+        Initialisation of the burst.
+
+        Args:
+            nb_frames (int): number of frames of the burst.
+            height (int): height of a frame in pixels.
+            width (int): width of a frame in pixels.
+            dtype (np.dtype, optional): dtype of a pixel. Defaults to np.uint8.
+            callback (function, optional): function called with the burst, from the acquisition thread,
+                                           once the stack is full. Defaults to None.
+        """
+        self.nb_frames = nb_frames
+        self.stack = np.empty((nb_frames, height, width), dtype = dtype)
+
+        # Every page is written now, so the memory is not mapped during the burst
+        self.stack.fill(0)
+
+        self.frame_ids = np.zeros(nb_frames, dtype = np.int64)
+        self.timestamps = np.zeros(nb_frames, dtype = np.int64)
+        self.arrival_times = np.zeros(nb_frames, dtype = np.float64)
+        self.count = 0
+        self.callback = callback
+        self.done = threading.Event()
+
+    def add_frame(self, frame, frame_id = 0, timestamp = 0):
+        """
+        Method used by the acquisition thread to add a frame to the stack.
+
+        Args:
+            frame (np.ndarray): frame (height, width).
+            frame_id (int, optional): frame ID given by the camera. Defaults to 0.
+            timestamp (int, optional): timestamp of the camera in ns. Defaults to 0.
+
+        Returns:
+            bool: True once the stack is full.
+        """
+        np.copyto(self.stack[self.count], frame)
+        self.frame_ids[self.count] = frame_id
+        self.timestamps[self.count] = timestamp
+        self.arrival_times[self.count] = time.perf_counter()
+        self.count += 1
+
+        if self.count < self.nb_frames:
+            return False
+
+        self.done.set()
+        if self.callback is not None:
+            self.callback(self)
+        return True
+
+    def wait(self, timeout = None):
+        """
+        Method used to wait for the end of the burst.
+
+        Args:
+            timeout (float, optional): maximum waiting time in seconds. Defaults to None (no limit).
+
+        Returns:
+            bool: True if the burst is finished.
+        """
+        return self.done.wait(timeout)
+
+    def get_effective_fps(self):
+        """
+        Method used to get the frame rate of the burst, from the timestamps of the camera if it gives them.
+
+        Returns:
+            float: number of frames per second between the first and the last frame, 0 if less than 2 frames.
+        """
+        if self.count < 2:
+            return 0
+        duration = (self.timestamps[self.count - 1] - self.timestamps[0]) * 1e-9
+        if duration <= 0:
+            duration = self.arrival_times[self.count - 1] - self.arrival_times[0]
+        return float((self.count - 1) / duration)
+
+    def get_dropped_frames(self):
+        """
+        Method used to count the frames lost during the burst, from the gaps between the frame IDs.
+        If the camera gives no frame ID, it is estimated from the gaps between the times of arrival
+        (the median interval is taken as the frame period).
+
+        Returns:
+            int: number of dropped frames.
+        """
+        if self.count < 2:
+            return 0
+        steps = np.diff(self.frame_ids[:self.count])
+        if np.all(steps > 0):
+            return int(np.sum(steps - 1))
+
+        if self.count < 3:
+            return 0
+        intervals = np.diff(self.arrival_times[:self.count])
+        period = np.median(intervals)
+        return int(np.sum(np.maximum(np.round(intervals / period) - 1, 0)))
+
+    def get_report(self):
+        """
+        Method used to sum up the burst.
+
+        Returns:
+            dict: number of frames, effective frame rate and dropped frames.
+        """
+        return {'frames': self.count, 'fps': self.get_effective_fps(), 'dropped': self.get_dropped_frames()}
+
+    def get_temporal_noise(self, max_bytes = 64 * 2**20):
+        """
+        Method used to get the temporal noise of the burst : standard deviation of each pixel along the burst,
+        averaged over the frame. The stack is read by blocks of rows, so no float copy of the whole stack is made.
+
+        Args:
+            max_bytes (int, optional): size of the float block computed at once. Defaults to 64 MB.
+
+        Returns:
+            float: temporal noise in DN, 0 if less than 2 frames.
+        """
+        if self.count < 2:
+            return 0.
+        stack = self.stack[:self.count]
+        height, width = stack.shape[1:]
+        rows = max(1, max_bytes // (self.count * width * 4))
+
+        total = 0.
+        for row in range(0, height, rows):
+            total += float(stack[:, row:row + rows].std(axis = 0, dtype = np.float32).sum(dtype = np.float64))
+        return total / (height * width)
+
+#-------------------------------------------------------------------------------------------------------
+
+class AcquisitionThread(threading.Thread):
+    """
+    Worker thread owning a camera object and filling a FrameRingBuffer.
+    The grab rate is set by camera.get_image(), which blocks until the sensor delivers a frame.
+    """
+
+    def __init__(self, camera, ring, bytes_per_pixel = 1, stats = None, max_failures = 20, on_error = None):
+        """
+        Initialisation of the worker.
+
+        Args:
+            camera (BaslerCamera or uEyeCamera): camera already allocated and capturing.
+            ring (FrameRingBuffer): ring in which the frames are copied.
+            bytes_per_pixel (int, optional): number of bytes used by one pixel. Defaults to 1.
+            stats (PipelineStats, optional): counters of the pipeline. Defaults to None.
+            max_failures (int, optional): number of consecutive failed grabs after which the camera is considered
+                                          lost and the loop stops. Defaults to 20.
+            on_error (function, optional): function called with a message, from the acquisition thread, when the
+                                           camera is lost or a command fails. Defaults to None.
+        """
+        super().__init__(daemon = True)
+        self.camera = camera
+        self.ring = ring
+        self.dtype = np.uint16 if bytes_per_pixel >= 2 else np.uint8
+        self.running = threading.Event()
+        self.burst = None
+        self.recorder = None
+        self.stats = stats
+
+        # Failed grabs in a row, and last error reported
+        self.max_failures = max_failures
+        self.on_error = on_error
+        self.nb_failures = 0
+        self.error = None
+
+        # Functions given by the other threads, run between two frames
+        self.commands = queue.Queue()
+
+    def run(self):
+        """
+        Grab loop, running until stop() is called.
+        """
+        self.running.set()
+        if self.stats is not None:
+            self.stats.new_sequence()
+
+        while self.running.is_set():
+            self.run_commands()
+            try:
+                rawArray = self.camera.get_image()
+            except Exception as error:
+                if self.grab_failed(error):
+                    break
+                continue
+            self.nb_failures = 0
+
+            if rawArray is None:
+                continue
+            frame_id, timestamp = self.camera.get_frame_info()
+
+            # The raw buffer can be padded at the end of each line (pitch), so we crop it to the AOI width
+            frame = rawArray.view(self.dtype).reshape(self.ring.height, -1)[:, :self.ring.width]
+
+            # During a burst the frames only go to the stack, the ring keeps the last frame before it
+            burst = self.burst
+            if burst is not None:
+                if self.stats is not None:
+                    self.stats.count_burst(frame_id)
+                if burst.add_frame(frame, frame_id, timestamp):
+                    self.burst = None
+                continue
+
+            if self.stats is not None:
+                self.stats.count_delivered(frame_id)
+
+            np.copyto(self.ring.get_write_slot(), frame)
+            self.ring.publish(frame_id, timestamp)
+
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.push(frame, frame_id, timestamp)
+
+    def start_burst(self, burst):
+        """
+        Method used to send the next frames into a burst stack instead of the ring.
+
+        Args:
+            burst (BurstCapture): burst to fill, at the size of the ring.
+        """
+        if self.burst is not None:
+            raise Acquisition_ERROR("a burst is already running")
+        self.burst = burst
+
+    def stop(self, timeout = 6):
+        """
+        Method used to stop the grab loop and wait for the thread to end.
+
+        Args:
+            timeout (float, optional): maximum time to wait in seconds. Defaults to 6.
+        """
+        self.running.clear()
+        if self.is_alive():
+            self.join(timeout)
+
+        # Commands given during the last frame, the camera is free now
+        if not self.is_alive():
+            self.run_commands()
+
+    def grab_failed(self, error):
+        """
+        Method used after a failed grab. The loop waits longer after each failure in a row, so a camera
+        unplugged or a dead driver does not keep a core busy, and stops after max_failures failures.
+
+        Args:
+            error (Exception): error raised by camera.get_image().
+
+        Returns:
+            bool: True if the loop is stopped.
+        """
+        self.nb_failures += 1
+        if self.nb_failures == 1:
+            print(f"Acquisition : frame lost ({error}).")
+
+        if self.nb_failures >= self.max_failures:
+            self.running.clear()
+            self.report_error(f"camera lost after {self.nb_failures} failed grabs ({error})")
+            return True
+
+        time.sleep(min(0.001 * 2 ** self.nb_failures, 0.5))
+        return False
+
+    def report_error(self, message):
+        """
+        Method used to print an error and to give it to on_error.
+
+        Args:
+            message (str): description of the error.
+        """
+        self.error = message
+        print(f"Acquisition : {message}.")
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def submit(self, function, *args):
+        """
+        Method used by another thread to run a function on the camera between two frames.
+
+        Args:
+            function (function): function to run in the acquisition thread, its errors are caught and reported.
+            args: arguments of the function.
+        """
+        self.commands.put((function, args))
+
+    def run_commands(self):
+        """
+        Method used to run the functions given by submit(), in their order.
+        """
+        while True:
+            try:
+                function, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                function(*args)
+            except Exception as error:
+                self.report_error(f"command failed ({error})")
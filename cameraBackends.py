@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of the camera backends (cameraUeye, cameraBasler, cameraSimulated, cameraReplay).
+
+The SDKs are only imported when a backend is needed, and the cameras of every backend are enumerated
+once, in parallel, in background threads. The result is kept for the whole session, so the GUI can be
+drawn while the discovery runs, and later widgets get the list immediately.
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import time
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Time of the first import, used to report the time between the start of the application and the first frame
+STARTUP_TIME = time.perf_counter()
+
+# Backend name : (module, camera class)
+BACKENDS = {
+    'ueye': ('cameraUeye', 'uEyeCamera'),
+    'basler': ('cameraBasler', 'BaslerCamera'),
+    'simulated': ('cameraSimulated', 'SimulatedCamera'),
+    'replay': ('cameraReplay', 'ReplayCamera'),
+}
+
+# Backends with real devices, the simulated camera is only used if none of them finds a camera
+HARDWARE_BACKENDS = ['ueye', 'basler']
+
+# Backends only listing the sources given by the user (see cameraReplay.REPLAY_SOURCES)
+FILE_BACKENDS = ['replay']
+
+# Backends opening the device from the serial number found by the discovery, instead of enumerating again
+SERIAL_BACKENDS = ['basler']
+
+class Backend_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Backend_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+#-------------------------------------------------------------------------------------------------------
+
+class CameraRegistry():
+    """
+    Lazy import of the backends and session cache of the detected cameras.
+    """
+
+    def __init__(self):
+        """
+        Initialisation of the registry.
+        """
+        self.modules = {}
+        self.discovery = None
+        self.discoveryTime = None
+
+    def load(self, backend):
+        """
+        Method used to import the module of a backend, the first time only.
+
+        Args:
+            backend (str): name of the backend ("ueye", "basler", "simulated" or "replay").
+
+        Returns:
+            module: module of the backend, None if its SDK is not installed.
+        """
+        if backend not in self.modules:
+            try:
+                self.modules[backend] = importlib.import_module(BACKENDS[backend][0])
+            except ImportError:
+                self.modules[backend] = None
+        return self.modules[backend]
+
+    def enumerate(self, backend):
+        """
+        Method used to list the cameras of one backend.
+
+        Args:
+            backend (str): name of the backend.
+
+        Returns:
+            list: list build like that [[backend, cam_id, cam_ser_no, cam_name], ... ], empty if the SDK
+                  is missing or fails.
+        """
+        module = self.load(backend)
+        if module is None:
+            return []
+        try:
+            return [[backend] + cam for cam in module.get_cam_list()]
+        except Exception:
+            return []
+
+    def start_discovery(self):
+        """
+        Method used to start the enumeration of every hardware backend in parallel. It is only done once per session.
+
+        Returns:
+            concurrent.futures.Future: future of the list of the cameras.
+        """
+        if self.discovery is None:
+            executor = ThreadPoolExecutor(max_workers = 1)
+            self.discovery = executor.submit(self.discover)
+            executor.shutdown(wait = False)
+        return self.discovery
+
+    def discover(self):
+        """
+        Method used to enumerate the hardware backends in parallel, then the recordings to replay,
+        falling back to the simulated camera.
+
+        Returns:
+            list: list build like that [[backend, cam_id, cam_ser_no, cam_name], ... ].
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers = len(HARDWARE_BACKENDS)) as executor:
+            results = executor.map(self.enumerate, HARDWARE_BACKENDS)
+            cameras = [cam for backendCameras in results for cam in backendCameras]
+        for backend in FILE_BACKENDS:
+            cameras += self.enumerate(backend)
+
+        if cameras == []:
+            cameras = self.enumerate('simulated')
+        self.discoveryTime = time.perf_counter() - start
+
+        # Print into the command prompt
+        print(f"Discovery : {len(cameras)} camera(s) found in {self.discoveryTime:.2f} s.")
+        return cameras
+
+    def get_cameras(self, timeout = None):
+        """
+        Method used to get the detected cameras, waiting for the discovery if it is not finished.
+
+        Args:
+            timeout (float, optional): maximum waiting time in seconds. Defaults to None (no limit).
+
+        Returns:
+            list: list build like that [[backend, cam_id, cam_ser_no, cam_name], ... ].
+        """
+        return self.start_discovery().result(timeout)
+
+    def open_camera(self, camera, **options):
+        """
+        Method used to create the camera object of a detected camera. The backends of SERIAL_BACKENDS
+        get the serial number of the discovery, so the device is not enumerated a second time.
+
+        Args:
+            camera (list): [backend, cam_id, cam_ser_no, cam_name], as returned by get_cameras().
+            options: other arguments given to the camera class, e.g. grab_mode for a Basler camera.
+
+        Returns:
+            BaslerCamera, uEyeCamera, SimulatedCamera or ReplayCamera: camera object.
+        """
+        backend, cam_id = camera[0], camera[1]
+        module = self.load(backend)
+        if module is None:
+            raise Backend_ERROR(f"{backend} SDK unavailable")
+        if backend in SERIAL_BACKENDS:
+            options.setdefault('ser_no', camera[2])
+        return getattr(module, BACKENDS[backend][1])(cam_id, **options)
+
+#-------------------------------------------------------------------------------------------------------
+
+# Registry shared by every widget of the session
+registry = CameraRegistry()
@@ -2,6 +2,11 @@
 
 #-------------------------------------------------------------------------------------------------------
 from pypylon import pylon
+import threading
+import time
+import numpy as np
+
+from cameraParameters import CameraParameterCache
 
 class Basler_ERROR(Exception):
     def __init__(self, ERROR_mode = "Basler_ERROR"):
@@ -28,27 +33,279 @@ def get_cam_list():
 
     :return: list build like that [[cam1_id, cam1_ser_no, cam1_name], ... ]
     """
-    nb_cam = get_nb_of_cam()
-    if nb_cam > 0:
-        tl_factory = pylon.TlFactory.GetInstance()
-        devices = tl_factory.EnumerateDevices()
-        cameraList = []
-        for id, device in enumerate(devices):
-            FriendlyName = device.GetFriendlyName().split(' ')
-            FullModelName, SerNo = FriendlyName[1], int(FriendlyName[2].strip("()"))
-            cameraList.append([id, SerNo, FullModelName])
-        return cameraList
-    else:
-        return []
+    # The transport layers are enumerated only once
+    tl_factory = pylon.TlFactory.GetInstance()
+    devices = tl_factory.EnumerateDevices()
+    cameraList = []
+    for id, device in enumerate(devices):
+        FriendlyName = device.GetFriendlyName().split(' ')
+        FullModelName, SerNo = FriendlyName[1], int(FriendlyName[2].strip("()"))
+        cameraList.append([id, SerNo, FullModelName])
+    return cameraList
+
+#-------------------------------------------------------------------------------------------------------
+
+class BaslerFramePool(pylon.ImageEventHandler):
+    """
+    Image event handler copying each grabbed frame into a pool of preallocated numpy buffers.
+    OnImageGrabbed is called by the pylon grab loop thread, the frames are read with wait_next_frame().
+
+    The slot returned by wait_next_frame() belongs to the reader until its next call (or release()) :
+    the grab loop never writes into it, it writes into the next free slot and counts the busy one.
+    """
+
+    def __init__(self, nb_buffers, height, width, dtype):
+        """
+        Initialisation of the pool.
+
+        Args:
+            nb_buffers (int): number of frames in the pool.
+            height (int): height of a frame in pixels.
+            width (int): width of a frame in pixels.
+            dtype (np.dtype): dtype of a pixel.
+        """
+        super().__init__()
+        self.nb_buffers = nb_buffers
+        self.frames = np.zeros((nb_buffers, height, width), dtype = dtype)
+        self.frame_ids = np.zeros(nb_buffers, dtype = np.int64)
+        self.timestamps = np.zeros(nb_buffers, dtype = np.uint64)
+
+        self.write_count = 0
+        self.read_count = 0
+        self.nb_failed = 0
+        self.nb_skipped = 0
+        self.nb_busy = 0
+
+        # Slot of the latest frame, slot to write next and slot owned by the reader (-1 if none)
+        self.latest_index = -1
+        self.next_index = 0
+        self.read_index = -1
+        self.condition = threading.Condition()
+
+    def OnImageGrabbed(self, camera, grab_result):
+        """
+        Method called by pylon for every grabbed frame.
+
+        Args:
+            camera (pylon.InstantCamera): camera that grabbed the frame.
+            grab_result (pylon.GrabResult): result of the grab, released by pylon after this call.
+        """
+        if not grab_result.GrabSucceeded():
+            self.nb_failed += 1
+            return
+
+        # The slot owned by the reader is skipped, the reader owns one slot at most
+        with self.condition:
+            index = self.next_index
+            if index == self.read_index:
+                index = (index + 1) % self.nb_buffers
+                self.nb_busy += 1
+
+        # View on the pylon buffer (no allocation), copied once into our own slot
+        with grab_result.GetArrayZeroCopy() as array:
+            np.copyto(self.frames[index], array)
+        self.frame_ids[index] = grab_result.BlockID
+        self.timestamps[index] = grab_result.TimeStamp
+
+        with self.condition:
+            self.latest_index = index
+            self.next_index = (index + 1) % self.nb_buffers
+            self.write_count += 1
+            self.condition.notify_all()
+
+    def wait_next_frame(self, timeout = 5):
+        """
+        Method used to wait for a frame that has not been read yet.
+
+        Args:
+            timeout (float, optional): maximum waiting time in seconds. Defaults to 5.
+
+        Returns:
+            np.ndarray, int, int: latest frame (view on the pool, owned by the reader until the next call),
+                                  its frame ID and its timestamp in camera ticks. (None, None, None) on timeout.
+        """
+        with self.condition:
+            # The previous slot is given back to the grab loop, even on timeout
+            self.read_index = -1
+            if not self.condition.wait_for(lambda : self.write_count > self.read_count, timeout):
+                return None, None, None
+            count = self.write_count
+            index = self.latest_index
+            self.read_index = index
+
+        self.nb_skipped += count - self.read_count - 1
+        self.read_count = count
+        return self.frames[index], int(self.frame_ids[index]), int(self.timestamps[index])
+
+    def release(self):
+        """
+        Method used by the reader to give back the slot of the last frame returned by wait_next_frame().
+        """
+        with self.condition:
+            self.read_index = -1
+
+    def get_stats(self):
+        """
+        Method used to get the counters of the pool.
+
+        Returns:
+            int, int: frames never read (overwritten by newer ones) and frames written into another slot
+                      because the next one was still owned by the reader.
+        """
+        return self.nb_skipped, self.nb_busy
+
+#-------------------------------------------------------------------------------------------------------
+
+class BaslerSession():
+    """
+    Session keeping the device open for the whole life of the camera object.
+    The GenICam nodes are looked up once, then every read and write goes through the cached node handle.
+    """
+
+    def __init__(self, h_cam):
+        """
+        Initialisation of the session.
+
+        Args:
+            h_cam (pylon.InstantCamera): camera attached to a device.
+        """
+        self.h_cam = h_cam
+        self.nodes = {}
+
+        # Statistics of the parameter accesses
+        self.nb_calls = 0
+        self.total_time = 0
+
+    def open(self):
+        """
+        Method used to open the device, only if it is not open yet.
+        """
+        if not self.h_cam.IsOpen():
+            self.h_cam.Open()
+
+    def close(self):
+        """
+        Method used to close the device. The node handles are not valid anymore after that.
+        """
+        self.nodes = {}
+        if self.h_cam.IsOpen():
+            self.h_cam.Close()
+
+    def node(self, name):
+        """
+        Method used to get the handle of a GenICam node, looked up in the node map the first time only.
+
+        Args:
+            name (str): name of the node, e.g. "ExposureTime".
+
+        Returns:
+            GenICam node: handle of the node.
+        """
+        node = self.nodes.get(name)
+        if node is None:
+            self.open()
+            node = self.h_cam.GetNodeMap().GetNode(name)
+            self.nodes[name] = node
+        return node
+
+    def get_value(self, name):
+        """
+        Method used to read the value of a node.
+
+        Args:
+            name (str): name of the node.
+
+        Returns:
+            value of the node.
+        """
+        start = time.perf_counter()
+        value = self.node(name).GetValue()
+        self.count_call(start)
+        return value
+
+    def set_value(self, name, value):
+        """
+        Method used to write the value of a node.
+
+        Args:
+            name (str): name of the node.
+            value: new value of the node.
+        """
+        start = time.perf_counter()
+        self.node(name).SetValue(value)
+        self.count_call(start)
+
+    def get_range(self, name):
+        """
+        Method used to read the minimum and maximum values of a node.
+
+        Args:
+            name (str): name of the node.
+
+        Returns:
+            minimum and maximum values of the node.
+        """
+        start = time.perf_counter()
+        node = self.node(name)
+        minimum, maximum = node.GetMin(), node.GetMax()
+        self.count_call(start)
+        return minimum, maximum
+
+    def count_call(self, start):
+        """
+        Method used to add a parameter access to the statistics.
+
+        Args:
+            start (float): time.perf_counter() value at the beginning of the access.
+        """
+        self.nb_calls += 1
+        self.total_time += time.perf_counter() - start
+
+    def get_mean_latency(self):
+        """
+        Method used to get the mean duration of a parameter access.
+
+        Returns:
+            float: mean duration of a parameter access in seconds, 0 if there was no access.
+        """
+        if self.nb_calls == 0:
+            return 0
+        return self.total_time / self.nb_calls
 
 #-------------------------------------------------------------------------------------------------------
 
 class BaslerCamera():
-    def __init__(self, cam_id = 0):
+    def __init__(self, cam_id = 0, grab_mode = "retrieve", nb_buffers = 8, ser_no = None):
+        """
+        Initialisation of the camera.
+
+        Args:
+            cam_id (int, optional): index of the camera. Defaults to 0.
+            grab_mode (str, optional): "retrieve" to call RetrieveResult in get_image(), "callback" to let
+                                       the pylon grab loop fill a BaslerFramePool. Defaults to "retrieve".
+            nb_buffers (int, optional): number of frames in the pool of the "callback" mode. Defaults to 8.
+            ser_no (int, optional): serial number of the camera, as enumerated by get_cam_list(). The device
+                                    is then created directly from it, without enumerating the transport layers
+                                    again. Defaults to None (the device is found from cam_id).
+        """
         self.cam_id = cam_id
+        self.grab_mode = grab_mode
+        self.nb_buffers = nb_buffers
+        self.frame_pool = None
         tl_factory = pylon.TlFactory.GetInstance()
         self.h_cam = pylon.InstantCamera()
-        self.h_cam.Attach(tl_factory.CreateFirstDevice())
+        if ser_no is not None:
+            device_info = pylon.DeviceInfo()
+            device_info.SetSerialNumber(str(ser_no))
+        else:
+            # Fallback without the registry : the transport layers are enumerated to find cam_id
+            devices = tl_factory.EnumerateDevices()
+            if cam_id >= len(devices):
+                raise Basler_ERROR("no device for cam_id")
+            device_info = devices[cam_id]
+        self.h_cam.Attach(tl_factory.CreateDevice(device_info))
+        self.session = BaslerSession(self.h_cam)
+        self.cache = CameraParameterCache()
         self.converter = pylon.ImageFormatConverter()
         self.nBitsPerPixel = int
         self.colormode = None
@@ -58,24 +315,28 @@ class BaslerCamera():
         self.height = int
         self.pitch = int
 
+        # Frame ID (BlockID) and timestamp in ns of the last frame returned by get_image()
+        self.frame_id = 0
+        self.timestamp = 0
+
         self.init()
         self.ser_no, self.id = self.get_cam_info()
         self.width_max, self.height_max, self.cam_name, self.cam_pixel = self.get_sensor_info()
 
     def init(self):
-        self.h_cam.Open()
+        # The device is opened once here and stays open until stop_camera()
+        self.session.open()
         if self.h_cam.IsOpen():
             #self.h_cam.Gain.SetValue(2.5)
-            self.h_cam.Close()
             return True
         else:
-            self.h_cam.Close()
             raise Basler_ERROR("init BlasterCamera")
 
     def get_cam_info(self):
         ser_no, id = None, None
         try :
-            ser_no, id = get_cam_list()[self.cam_id][1], self.cam_id
+            # Read from the attached device, without enumerating the transport layers again
+            ser_no, id = int(self.h_cam.GetDeviceInfo().GetSerialNumber()), self.cam_id
         except : 
             raise Basler_ERROR("get_cam_info")
         
@@ -83,19 +344,10 @@ class BaslerCamera():
     
     def get_sensor_info(self):
         try :
-            if self.h_cam.IsOpen():
-                max_height = self.h_cam.Height.GetMax()
-                max_width = self.h_cam.Width.GetMax()
-                name = get_cam_list()[self.cam_id][2]
-                pixel = max_height * max_width
-
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-                max_height = self.h_cam.Height.GetMax()
-                max_width = self.h_cam.Width.GetMax()
-                name = get_cam_list()[self.cam_id][2]
-                pixel = max_height * max_width
-                self.h_cam.Close()
+            max_height = self.session.get_range("Height")[1]
+            max_width = self.session.get_range("Width")[1]
+            name = self.h_cam.GetDeviceInfo().GetModelName()
+            pixel = max_height * max_width
     
         except :
             raise Basler_ERROR("get_sensor_info")
@@ -104,14 +356,7 @@ class BaslerCamera():
     
     def get_sensor_max_width(self):
         try :
-            if self.h_cam.IsOpen():
-                nMaxWidth = self.h_cam.Width.GetMax()
-
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-                nMaxWidth = self.h_cam.Width.GetMax()
-                self.h_cam.Close()
-
+            nMaxWidth = self.session.get_range("Width")[1]
         except :
             raise Basler_ERROR("get_sensor_max_width")
         
@@ -119,13 +364,7 @@ class BaslerCamera():
 
     def get_sensor_max_height(self):
         try :
-            if self.h_cam.IsOpen():
-                nMaxHeight = self.h_cam.Height.GetMax()
-
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-                nMaxHeight = self.h_cam.Height.GetMax()
-                self.h_cam.Close()
+            nMaxHeight = self.session.get_range("Height")[1]
         except :
             raise Basler_ERROR("get_sensor_max_height")
         
@@ -140,22 +379,31 @@ class BaslerCamera():
         
     def capture_video(self):
         try : 
-            if not self.h_cam.IsOpen():
-                self.h_cam.Open()
+            self.session.open()
             
             if not self.h_cam.IsGrabbing():
-                self.h_cam.StartGrabbing(pylon.GrabStrategy_LatestImageOnly)
+                if self.grab_mode == "callback":
+                    offset_x, offset_y, width, height = self.get_aoi()
+                    dtype = np.uint16 if self.get_bit_depth() > 8 else np.uint8
+                    self.frame_pool = BaslerFramePool(self.nb_buffers, height, width, dtype)
+
+                    self.h_cam.RegisterImageEventHandler(self.frame_pool, pylon.RegistrationMode_ReplaceAll, pylon.Cleanup_None)
+                    self.h_cam.StartGrabbing(pylon.GrabStrategy_OneByOne, pylon.GrabLoop_ProvidedByInstantCamera)
+                else:
+                    self.h_cam.StartGrabbing(pylon.GrabStrategy_LatestImageOnly)
             
         except :
             raise Basler_ERROR("capture_video")
         
     def stop_video(self):
+        # Only the grab is stopped, the device stays open for the parameter accesses
         try : 
             if self.h_cam.IsGrabbing():
                 self.h_cam.StopGrabbing()
 
-            if self.h_cam.IsOpen():
-                self.h_cam.Close()
+            if self.frame_pool is not None:
+                self.h_cam.DeregisterImageEventHandler(self.frame_pool)
+                self.frame_pool = None
         except :
             raise Basler_ERROR("stop_video")
 
@@ -170,6 +418,7 @@ class BaslerCamera():
             if self.h_cam.IsOpen():
                 self.stop_video()
                 self.un_alloc()
+            self.session.close()
         except :
             raise Basler_ERROR("stop_camera")
         
@@ -178,97 +427,137 @@ class BaslerCamera():
 
     def get_image(self):
         try :
-            if self.h_cam.IsOpen() and self.h_cam.IsGrabbing():
-                grab_result = self.h_cam.RetrieveResult(5000, pylon.TimeoutHandling_ThrowException)
-
-                if grab_result.GrabSucceeded():
-                    # Get the image data as a numpy array
-                    self.array = grab_result.Array
-
-                    grab_result.Release()
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
+            if self.frame_pool is not None and self.h_cam.IsGrabbing():
+                # Callback mode : the frame is already in the pool, we only wait for it
+                frame, frame_id, timestamp = self.frame_pool.wait_next_frame()
+                if frame is not None:
+                    self.frame_id = frame_id
+                    self.timestamp = int(timestamp * self.get_timestamp_period())
+                return frame
 
+            if self.h_cam.IsGrabbing():
+                grab_result = self.h_cam.RetrieveResult(5000, pylon.TimeoutHandling_ThrowException)
+            else:
+                self.session.open()
                 grab_result = self.h_cam.GrabOne(5000)
 
-                if grab_result.GrabSucceeded():
-                    # Get the image data as a numpy array
-                    self.array = grab_result.Array
+            if grab_result.GrabSucceeded():
+                # Get the image data as a numpy array
+                self.array = grab_result.Array
+                self.frame_id = grab_result.BlockID
+                self.timestamp = int(grab_result.TimeStamp * self.get_timestamp_period())
 
-                    grab_result.Release()
-                    
-                self.h_cam.Close()
+            grab_result.Release()
 
             return self.array
         
         except :
             raise Basler_ERROR("get_image")
 
+    def get_pool_stats(self):
+        """
+        Method used to get the counters of the frame pool of the "callback" mode.
+
+        Returns:
+            int, int: frames skipped by the reader and frames written around a busy slot, (0, 0) without pool.
+        """
+        frame_pool = self.frame_pool
+        if frame_pool is None:
+            return 0, 0
+        return frame_pool.get_stats()
+
+    def get_frame_info(self):
+        """
+        Method used to get the frame ID and the timestamp of the last frame returned by get_image().
+
+        Returns:
+            int, int: frame ID (BlockID) and timestamp of the camera in ns.
+        """
+        return self.frame_id, self.timestamp
+
+    def get_timestamp_period(self):
+        """
+        Method used to get the duration of a tick of the camera timestamp.
+        GigE cameras count at GevTimestampTickFrequency, USB3 cameras count in ns.
+
+        Returns:
+            float: duration of a tick in ns.
+        """
+        return self.cache.get("timestamp_period", self.read_timestamp_period)
+
+    def read_timestamp_period(self):
+        try :
+            return 1e9 / self.session.get_value("GevTimestampTickFrequency")
+
+        except :
+            return 1
+
+    def refresh_parameters(self):
+        """
+        Method used to empty the parameter cache, the next getters will read the device again.
+        """
+        self.cache.invalidate()
+
     def get_aoi(self):
         try :
-            if self.h_cam.IsOpen():
-                
-                width = self.h_cam.Width.GetValue()
-                height = self.h_cam.Height.GetValue()
-                offset_x = self.h_cam.OffsetX.GetValue()
-                offset_y = self.h_cam.OffsetY.GetValue()
-
-                return offset_x, offset_y, width, height
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                width = self.h_cam.Width.GetValue()
-                height = self.h_cam.Height.GetValue()
-                offset_x = self.h_cam.OffsetX.GetValue()
-                offset_y = self.h_cam.OffsetY.GetValue()
-
-                self.h_cam.Close()
-                
-                return offset_x, offset_y, width, height
+            return self.cache.get("aoi", self.read_aoi)
 
         except :
             raise Basler_ERROR("get_aoi")
+
+    def read_aoi(self):
+        width = self.session.get_value("Width")
+        height = self.session.get_value("Height")
+        offset_x = self.session.get_value("OffsetX")
+        offset_y = self.session.get_value("OffsetY")
+
+        return offset_x, offset_y, width, height
         
     def set_aoi(self, x, y, w, h):
 
         x0, y0, w0, h0 = ajust_aoi(x, y, w, h)
 
         try :
-            if self.h_cam.IsOpen():
-                
-                self.h_cam.Width.SetValue(w0)
-                self.h_cam.Height.SetValue(h0)
-                self.h_cam.OffsetX.SetValue(x0)
-                self.h_cam.OffsetY.SetValue(y0)
+            # Offsets first set to 0, so the new size never goes out of the sensor with the old offsets
+            self.session.set_value("OffsetX", 0)
+            self.session.set_value("OffsetY", 0)
+            self.session.set_value("Width", w0)
+            self.session.set_value("Height", h0)
+            self.session.set_value("OffsetX", x0)
+            self.session.set_value("OffsetY", y0)
+            self.cache.update("aoi", (x0, y0, w0, h0))
 
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
+        except :
+            raise Basler_ERROR("set_aoi")
 
-                self.h_cam.Width.SetValue(w0)
-                self.h_cam.Height.SetValue(h0)
-                self.h_cam.OffsetX.SetValue(x0)
-                self.h_cam.OffsetY.SetValue(y0)
+    def set_aoi_offset(self, x, y):
+        """
+        Method used to move the AOI without changing its size. The offsets can be written during the
+        acquisition, so the grab does not need to be restarted.
 
-                self.h_cam.Close()
+        Args:
+            x (int): x coordinate of the top left corner of the AOI.
+            y (int): y coordinate of the top left corner of the AOI.
 
-        except :
-            raise Basler_ERROR("set_aoi")
+        Raises:
+            Basler_ERROR: Error.
+        """
+        offset_x, offset_y, width, height = self.get_aoi()
+        x0, y0, w0, h0 = ajust_aoi(x, y, width, height)
 
-    def get_colormode(self):
         try :
-            if self.h_cam.IsOpen():
-                pixelFormat =  self.h_cam.PixelFormat.GetValue()
+            self.session.set_value("OffsetX", x0)
+            self.session.set_value("OffsetY", y0)
+            self.cache.update("aoi", (x0, y0, width, height))
 
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                pixelFormat =  self.h_cam.PixelFormat.GetValue()
+        except :
+            # The camera may have accepted only one of the offsets
+            self.cache.invalidate("aoi")
+            raise Basler_ERROR("set_aoi_offset")
 
-                self.h_cam.Close()
-                
+    def get_colormode(self):
+        try :
+            pixelFormat = self.cache.get("colormode", lambda : self.session.get_value("PixelFormat"))
             return pixelFormat
 
         except :
@@ -276,20 +565,29 @@ class BaslerCamera():
 
     def set_colormode(self, mode):
         try :
-            if self.h_cam.IsOpen():
-                self.h_cam.PixelFormat = mode
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
+            self.session.set_value("PixelFormat", mode)
+            self.nBitsPerPixel = get_bits_per_pixel(mode)
+            self.cache.update("colormode", mode)
+            self.cache.update("bit_depth", self.nBitsPerPixel)
+
+        except :
+            raise Basler_ERROR("set_colormode")
 
-                self.h_cam.PixelFormat = mode
+    def get_bit_depth(self):
+        """
+        Method used to get the number of bits per pixel of the current pixel format.
 
-                self.h_cam.Close()
+        Raises:
+            Basler_ERROR: Error.
 
-            self.nBitsPerPixel = get_bits_per_pixel(mode)
+        Returns:
+            int: number of bits per pixel.
+        """
+        try :
+            return self.cache.get("bit_depth", lambda : get_bits_per_pixel(self.session.get_value("PixelFormat")))
 
         except :
-            raise Basler_ERROR("set_colormode")
+            raise Basler_ERROR("get_bit_depth")
 
     def get_exposure(self):
         """
@@ -302,16 +600,7 @@ class BaslerCamera():
             int: exposure time in seconds.
         """
         try :
-            if self.h_cam.IsOpen():
-                exposure = self.h_cam.ExposureTime.GetValue()
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                exposure = self.h_cam.ExposureTime.GetValue()
-
-                self.h_cam.Close()
+            exposure = self.cache.get("exposure", lambda : self.session.get_value("ExposureTime"))
             return exposure
 
         except :
@@ -328,18 +617,7 @@ class BaslerCamera():
             ints: minimum and maximum values of exposure in seconds.
         """
         try :
-            if self.h_cam.IsOpen():
-                exposureMin = self.h_cam.ExposureTime.GetMin()
-                exposureMax = self.h_cam.ExposureTime.GetMax()
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                exposureMin = self.h_cam.ExposureTime.GetMin()
-                exposureMax = self.h_cam.ExposureTime.GetMax()
-
-                self.h_cam.Close()
+            exposureMin, exposureMax = self.session.get_range("ExposureTime")
             return exposureMin, exposureMax
 
         except :
@@ -356,17 +634,11 @@ class BaslerCamera():
             Basler_ERROR: Error.
         """
         try :
-            if self.h_cam.IsOpen():
-                self.h_cam.ExposureTime.SetValue(exposure)
-                self.h_cam.Gain.SetValue(2.5)
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                self.h_cam.ExposureTime.SetValue(exposure)
-                self.h_cam.Gain.SetValue(2.5)
+            self.session.set_value("ExposureTime", exposure)
+            self.session.set_value("Gain", 2.5)
 
-                self.h_cam.Close()
+            # The camera rounds the exposure, and the resulting frame rate can change
+            self.cache.invalidate("exposure", "frame_rate")
 
         except :
             raise Basler_ERROR("set_exposure")
@@ -382,16 +654,7 @@ class BaslerCamera():
             int: frame rate in seconds.
         """
         try :
-            if self.h_cam.IsOpen():
-                frameRate = self.h_cam.AcquisitionFrameRate.GetValue()
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                frameRate = self.h_cam.AcquisitionFrameRate.GetValue()
-
-                self.h_cam.Close()
+            frameRate = self.cache.get("frame_rate", lambda : self.session.get_value("AcquisitionFrameRate"))
             return frameRate
 
         except :
@@ -408,18 +671,7 @@ class BaslerCamera():
             ints: minimum and maximum values of the frame rate.
         """
         try :
-            if self.h_cam.IsOpen():
-                frameRateMin = self.h_cam.AcquisitionFrameRate.GetMin()
-                frameRateMax = self.h_cam.AcquisitionFrameRate.GetMax()
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                frameRateMin = self.h_cam.AcquisitionFrameRate.GetMin()
-                frameRateMax = self.h_cam.AcquisitionFrameRate.GetMax()
-
-                self.h_cam.Close()
+            frameRateMin, frameRateMax = self.session.get_range("AcquisitionFrameRate")
             return [frameRateMin, frameRateMax, None]
 
         except :
@@ -436,16 +688,8 @@ class BaslerCamera():
             Basler_ERROR: Error.
         """
         try :
-            if self.h_cam.IsOpen():
-                self.h_cam.AcquisitionFrameRate.SetValue(fps)
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                self.h_cam.AcquisitionFrameRate.SetValue(fps)
-
-                self.h_cam.Close()
+            self.session.set_value("AcquisitionFrameRate", fps)
+            self.cache.invalidate("frame_rate")
 
         except :
             raise Basler_ERROR("set_frame_rate")
@@ -464,16 +708,7 @@ class BaslerCamera():
             int: blacklevel.
         """
         try :
-            if self.h_cam.IsOpen():
-                BlackLevel = self.h_cam.BlackLevel.GetValue()
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                BlackLevel = self.h_cam.BlackLevel.GetValue()
-
-                self.h_cam.Close()
+            BlackLevel = self.cache.get("black_level", lambda : self.session.get_value("BlackLevel"))
             return BlackLevel
 
         except :
@@ -490,18 +725,7 @@ class BaslerCamera():
             ints: minimum and maximum values of the blackLevel.
         """
         try :
-            if self.h_cam.IsOpen():
-                BlackLevelMin = self.h_cam.BlackLevel.GetMin()
-                BlackLevelMax = self.h_cam.BlackLevel.GetMax()
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                BlackLevelMin = self.h_cam.BlackLevel.GetMin()
-                BlackLevelMax = self.h_cam.BlackLevel.GetMax()
-
-                self.h_cam.Close()
+            BlackLevelMin, BlackLevelMax = self.session.get_range("BlackLevel")
             return BlackLevelMin, BlackLevelMax
 
         except :
@@ -518,16 +742,8 @@ class BaslerCamera():
             Basler_ERROR: Error.
         """
         try :
-            if self.h_cam.IsOpen():
-                self.h_cam.BlackLevel.SetValue(value)
-
-                
-            elif not self.h_cam.IsOpen():
-                self.h_cam.Open()
-
-                self.h_cam.BlackLevel.SetValue(value)
-
-                self.h_cam.Close()
+            self.session.set_value("BlackLevel", value)
+            self.cache.update("black_level", value)
 
         except :
             raise Basler_ERROR("set_black_level")
@@ -590,6 +806,7 @@ def get_bits_per_pixel(color_mode):
 
     return {
         'Mono8': 8,
+        'Mono10': 10,
         'Mono12': 12,
     }[color_mode]
 
@@ -620,3 +837,4 @@ if __name__ == "__main__":
     print(f"Test - get_black_level : {BaslerTest.get_black_level()}")
     print(f"Test - get_black_level_range : {BaslerTest.get_black_level_range()}")
     print(f"Test - set_black_level : {BaslerTest.set_black_level(0)}")
+    print(f"Test - session mean latency (s) : {BaslerTest.session.get_mean_latency()} over {BaslerTest.session.nb_calls} calls")
@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+"""
+Display path of the camera widget, between the frame ring (cameraAcquisition) and the screen.
+
+Every stage writes into buffers kept from one frame to the next, and only reallocated when the size
+of the frame or of the widget changes, so the display does not allocate memory per frame.
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import numpy as np
+import cv2
+
+class Display_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Display_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+#-------------------------------------------------------------------------------------------------------
+
+def get_buffer(buffer, shape, dtype):
+    """
+    Function used to reuse a buffer if it has the right shape and dtype, or to allocate a new one.
+
+    Args:
+        buffer (np.ndarray): previous buffer, can be None.
+        shape (tuple): shape (height, width) needed.
+        dtype (np.dtype): dtype needed.
+
+    Returns:
+        np.ndarray: buffer of the right shape and dtype.
+    """
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        return np.empty(shape, dtype = dtype)
+    return buffer
+
+#-------------------------------------------------------------------------------------------------------
+
+class DisplayScaler():
+    """
+    Scaler of the frames to the size of the display.
+
+    A frame larger than twice the display is first halved with an area average as many times as needed
+    (cv2 has a fast path for the exact factor 2), which avoids the aliasing of the decimation.
+    The last step, with a factor between 0.5 and 2, is a nearest neighbour interpolation, which keeps
+    the raw values when zooming in. Nothing is done if the frame already has the size of the display.
+    """
+
+    def __init__(self):
+        """
+        Initialisation of the scaler.
+        """
+        # Buffers of the successive halvings, and of the final size
+        self.levels = []
+        self.buffer = None
+
+    def scale(self, frame, width, height):
+        """
+        Method used to scale a frame to the size of the display.
+
+        Args:
+            frame (np.ndarray): frame (height, width), uint8 or uint16.
+            width (int): width of the display in pixels.
+            height (int): height of the display in pixels.
+
+        Returns:
+            np.ndarray: scaled frame (height, width). It is the frame itself if the size is the same,
+                        otherwise a buffer of the scaler, overwritten by the next call.
+        """
+        if frame.shape == (height, width):
+            return frame
+
+        source = frame
+        level = 0
+        while source.shape[0] >= 2 * height and source.shape[1] >= 2 * width:
+            halfHeight, halfWidth = source.shape[0] // 2, source.shape[1] // 2
+            if level == len(self.levels):
+                self.levels.append(None)
+            self.levels[level] = get_buffer(self.levels[level], (halfHeight, halfWidth), frame.dtype)
+            cv2.resize(source[:2 * halfHeight, :2 * halfWidth], (halfWidth, halfHeight), dst = self.levels[level],
+                       interpolation = cv2.INTER_AREA)
+            source = self.levels[level]
+            level += 1
+
+        if source.shape == (height, width):
+            return source
+
+        self.buffer = get_buffer(self.buffer, (height, width), frame.dtype)
+        cv2.resize(source, (width, height), dst = self.buffer, interpolation = cv2.INTER_NEAREST)
+        return self.buffer
+
+#-------------------------------------------------------------------------------------------------------
+
+class FramePyramid():
+    """
+    Multi-resolution pyramid of a frame, for a zoomed and panned view at full resolution.
+
+    Level 0 is the frame itself, each next level halves the previous one with an area average.
+    The levels are only computed when a view needs them, once per frame : a view zoomed in only
+    reads level 0, a view zoomed out reads the coarsest level still finer than the screen.
+    Only the pixels of the visible part are then picked (nearest neighbour), so the cost depends
+    on the size of the screen and not on the size of the sensor.
+    """
+
+    def __init__(self):
+        """
+        Initialisation of the pyramid, empty until set_frame().
+        """
+        self.levels = [None]
+        self.nb_built = 0
+
+        # Index of the source pixels of the last view, computed again when the view changes
+        self.view = None
+        self.rows = None
+        self.cols = None
+        self.slices = (slice(0, 0), slice(0, 0))
+
+        # Buffers of the picked lines, and of the picked pixels
+        self.lines = None
+        self.tile = None
+
+    def set_frame(self, frame):
+        """
+        Method used to give a new frame. Nothing is computed before a view needs it.
+
+        Args:
+            frame (np.ndarray): frame (height, width), uint8 or uint16. It is not copied.
+        """
+        self.levels[0] = frame
+        self.nb_built = 1
+
+    def get_level(self, level):
+        """
+        Method used to get a level of the pyramid, computing the missing levels before it.
+
+        Args:
+            level (int): level, 0 is the frame itself.
+
+        Returns:
+            np.ndarray: frame halved level times (height // 2**level, width // 2**level).
+        """
+        if self.nb_built == 0:
+            raise Display_ERROR("no frame in the pyramid")
+
+        while self.nb_built <= level:
+            source = self.levels[self.nb_built - 1]
+            halfHeight, halfWidth = source.shape[0] // 2, source.shape[1] // 2
+            if self.nb_built == len(self.levels):
+                self.levels.append(None)
+            self.levels[self.nb_built] = get_buffer(self.levels[self.nb_built], (halfHeight, halfWidth), source.dtype)
+            cv2.resize(source[:2 * halfHeight, :2 * halfWidth], (halfWidth, halfHeight), dst = self.levels[self.nb_built],
+                       interpolation = cv2.INTER_AREA)
+            self.nb_built += 1
+        return self.levels[level]
+
+    def render(self, x, y, zoom, width, height):
+        """
+        Method used to get the raw codes of a view of the frame.
+
+        Args:
+            x (float): x coordinate in the frame of the left side of the view.
+            y (float): y coordinate in the frame of the top side of the view.
+            zoom (float): number of screen pixels per frame pixel.
+            width (int): width of the view in screen pixels.
+            height (int): height of the view in screen pixels.
+
+        Returns:
+            np.ndarray, tuple: raw codes of the part of the view inside the frame, buffer of the pyramid
+                               overwritten by the next call, and slices (rows, columns) of this part in the view.
+        """
+        # Coarsest level with at least one of its pixels per screen pixel
+        frameHeight, frameWidth = self.levels[0].shape
+        level = 0
+        while zoom * 2 ** (level + 1) <= 1 and min(frameHeight, frameWidth) >> (level + 1) >= 1:
+            level += 1
+        source = self.get_level(level)
+
+        view = (x, y, zoom, width, height, level, source.shape)
+        if view != self.view:
+            self.view = view
+            scale = zoom * 2 ** level
+            rows = np.floor((y / 2 ** level) + (np.arange(height) + 0.5) / scale).astype(np.intp)
+            cols = np.floor((x / 2 ** level) + (np.arange(width) + 0.5) / scale).astype(np.intp)
+
+            # The visible part is one rectangle, the index grow with the screen coordinates
+            insideRows = np.flatnonzero((rows >= 0) & (rows < source.shape[0]))
+            insideCols = np.flatnonzero((cols >= 0) & (cols < source.shape[1]))
+            if len(insideRows) == 0 or len(insideCols) == 0:
+                self.slices = (slice(0, 0), slice(0, 0))
+            else:
+                self.slices = (slice(int(insideRows[0]), int(insideRows[-1]) + 1), slice(int(insideCols[0]), int(insideCols[-1]) + 1))
+            self.rows, self.cols = rows[self.slices[0]], cols[self.slices[1]]
+
+        self.lines = get_buffer(self.lines, (len(self.rows), source.shape[1]), source.dtype)
+        self.tile = get_buffer(self.tile, (len(self.rows), len(self.cols)), source.dtype)
+        np.take(source, self.rows, axis = 0, out = self.lines)
+        np.take(self.lines, self.cols, axis = 1, out = self.tile)
+        return self.tile, self.slices
+
+    def get_value(self, x, y):
+        """
+        Method used to get the raw code of a pixel of the frame.
+
+        Args:
+            x (int): x coordinate of the pixel in the frame.
+            y (int): y coordinate of the pixel in the frame.
+
+        Returns:
+            int: raw code of the pixel, None if it is outside of the frame.
+        """
+        frame = self.levels[0]
+        if frame is None or not (0 <= x < frame.shape[1] and 0 <= y < frame.shape[0]):
+            return None
+        return int(frame[y, x])
+
+#-------------------------------------------------------------------------------------------------------
+
+class DisplayLUT():
+    """
+    Lookup table from the raw codes (2**bit_depth entries, up to 65536) to the 8 bits values of the display.
+
+    The codes of the window [low, high] are spread over 0 - 255 with a linear, gamma or log curve, the codes
+    outside are saturated. In auto-stretch mode, the window follows two percentiles of each frame.
+    The table is only computed again when its parameters change, then each frame costs one vectorised take.
+
+    The default table (linear, full range, no auto-stretch) is exactly a right shift by (bit_depth - 8) :
+    apply() then shifts the frame into the uint8 buffer without the lookup, many times faster on the
+    MONO10 / MONO12 frames. The codes above the bit depth, never sent by the cameras, are not saturated there.
+    """
+
+    MODES = ["linear", "gamma", "log"]
+
+    def __init__(self, bit_depth = 8):
+        """
+        Initialisation of the LUT, linear on the full range.
+
+        Args:
+            bit_depth (int, optional): number of significant bits of a pixel. Defaults to 8.
+        """
+        self.bit_depth = None
+        self.mode = "linear"
+        self.gamma = 1.0
+        self.auto_stretch = False
+        self.percentiles = (0.5, 99.5)
+
+        self.lut = None
+        self.buffer = None
+        self.changed = True
+        self.set_bit_depth(bit_depth)
+
+    def set_bit_depth(self, bit_depth):
+        """
+        Method used to set the number of bits of the frames. The window is reset to the full range if it changes.
+
+        Args:
+            bit_depth (int): number of significant bits of a pixel.
+        """
+        if bit_depth == self.bit_depth:
+            return
+        if not 8 <= bit_depth <= 16:
+            raise Display_ERROR("bit depth out of 8 - 16")
+        self.bit_depth = bit_depth
+        self.low, self.high = 0, 2 ** bit_depth - 1
+        self.changed = True
+
+    def set_window(self, low, high):
+        """
+        Method used to set the raw codes shown in black and in white.
+
+        Args:
+            low (int): code shown in black (and below).
+            high (int): code shown in white (and above).
+        """
+        maximum = 2 ** self.bit_depth - 1
+        low = int(min(max(low, 0), maximum - 1))
+        high = int(min(max(high, low + 1), maximum))
+        if (low, high) != (self.low, self.high):
+            self.low, self.high = low, high
+            self.changed = True
+
+    def set_window_level(self, level, width):
+        """
+        Method used to set the window from its center and its width, like the medical viewers.
+
+        Args:
+            level (int): code in the middle of the window.
+            width (int): number of codes of the window.
+        """
+        self.set_window(level - width // 2, level + (width + 1) // 2)
+
+    def set_mode(self, mode, gamma = None):
+        """
+        Method used to set the curve of the LUT.
+
+        Args:
+            mode (str): "linear", "gamma" or "log".
+            gamma (float, optional): exponent of the "gamma" mode, above 1 to brighten the low signal. Defaults to None (unchanged).
+        """
+        if mode not in self.MODES:
+            raise Display_ERROR(f"unknown display mode {mode}")
+        if gamma is not None and gamma <= 0:
+            raise Display_ERROR("gamma must be positive")
+
+        if mode != self.mode or (gamma is not None and gamma != self.gamma):
+            self.mode = mode
+            self.gamma = self.gamma if gamma is None else gamma
+            self.changed = True
+
+    def set_auto_stretch(self, enabled, low_percentile = 0.5, high_percentile = 99.5):
+        """
+        Method used to let the window follow the percentiles of each frame.
+
+        Args:
+            enabled (bool): True to stretch automatically.
+            low_percentile (float, optional): percentile shown in black. Defaults to 0.5.
+            high_percentile (float, optional): percentile shown in white. Defaults to 99.5.
+        """
+        self.auto_stretch = enabled
+        self.percentiles = (low_percentile, high_percentile)
+
+    def build(self):
+        """
+        Method used to compute the table from its parameters.
+        """
+        if self.is_shift():
+            self.lut = (np.arange(2 ** self.bit_depth) >> (self.bit_depth - 8)).astype(np.uint8)
+            self.changed = False
+            return
+
+        codes = np.arange(2 ** self.bit_depth, dtype = np.float32)
+        position = np.clip((codes - self.low) / (self.high - self.low), 0, 1)
+
+        if self.mode == "gamma":
+            position **= 1 / self.gamma
+        elif self.mode == "log":
+            position = np.log1p(position * (self.high - self.low)) / np.log1p(self.high - self.low)
+
+        self.lut = (position * 255 + 0.5).astype(np.uint8)
+        self.changed = False
+
+    def is_shift(self):
+        """
+        Method used to know if the table is the default one, equal to a right shift by (bit_depth - 8).
+
+        Returns:
+            bool: True for the linear mode on the full range, without auto-stretch.
+        """
+        return (self.mode == "linear" and not self.auto_stretch
+                and (self.low, self.high) == (0, 2 ** self.bit_depth - 1))
+
+    def stretch(self, frame):
+        """
+        Method used to set the window on the percentiles of a frame, from its histogram.
+
+        Args:
+            frame (np.ndarray): frame (height, width), uint8 or uint16.
+        """
+        counts = np.bincount(frame.ravel(), minlength = 2 ** self.bit_depth)
+        cumulated = np.cumsum(counts)
+        low = np.searchsorted(cumulated, cumulated[-1] * self.percentiles[0] / 100)
+        high = np.searchsorted(cumulated, cumulated[-1] * self.percentiles[1] / 100)
+        self.set_window(low, high)
+
+    def apply(self, frame, out = None):
+        """
+        Method used to convert a frame to 8 bits for the display.
+
+        Args:
+            frame (np.ndarray): frame (height, width), uint8 or uint16.
+            out (np.ndarray, optional): uint8 array (height, width) receiving the result, it can be a view on
+                                        the lines of an image. Defaults to None (buffer of the LUT).
+
+        Returns:
+            np.ndarray: frame in uint8, out or the buffer of the LUT, overwritten by the next call.
+        """
+        if self.auto_stretch:
+            self.stretch(frame)
+        if self.changed:
+            self.build()
+
+        if out is None:
+            if self.buffer is None or self.buffer.shape != frame.shape:
+                self.buffer = np.empty(frame.shape, dtype = np.uint8)
+            out = self.buffer
+
+        if self.is_shift():
+            # Fast path of the default table, same values without the lookup
+            np.right_shift(frame, self.bit_depth - 8, out = out, casting = 'unsafe')
+        elif frame.dtype == np.uint8 and self.bit_depth == 8:
+            cv2.LUT(frame, self.lut, dst = out)
+        else:
+            # Codes above the bit depth are saturated
+            np.take(self.lut, frame, out = out, mode = 'clip')
+        return out
+
+#-------------------------------------------------------------------------------------------------------
+
+class DisplayScheduler():
+    """
+    Rate of the display, independent of the frame rate of the sensor.
+
+    The display is refreshed at most at max_rate (the refresh rate of the monitor, there is no point going
+    faster), and each refresh shows the newest frame of the ring, the others are skipped.
+    The cost of a refresh (scaling, LUT and painting) is measured and smoothed : when it takes more than
+    budget of the interval, the interval grows so the GUI thread stays free for the analysis and the events,
+    and it comes back to max_rate once the cost goes down. The acquisition thread is never slowed down.
+    """
+
+    def __init__(self, max_rate = 60, budget = 0.5, smoothing = 0.2):
+        """
+        Initialisation of the scheduler.
+
+        Args:
+            max_rate (float, optional): maximum number of refreshes per second. Defaults to 60.
+            budget (float, optional): maximum fraction of the time spent refreshing the display. Defaults to 0.5.
+            smoothing (float, optional): weight of the last cost in its moving average. Defaults to 0.2.
+        """
+        if not 0 < budget <= 1:
+            raise Display_ERROR("budget out of ]0, 1]")
+        self.budget = budget
+        self.smoothing = smoothing
+        self.cost = None
+        self.set_max_rate(max_rate)
+
+    def set_max_rate(self, max_rate):
+        """
+        Method used to set the maximum number of refreshes per second.
+
+        Args:
+            max_rate (float): maximum number of refreshes per second.
+        """
+        if max_rate <= 0:
+            raise Display_ERROR("display rate must be positive")
+        self.min_interval = 1000 / max_rate
+        self.interval = self.min_interval if self.cost is None else max(self.min_interval, self.cost / self.budget)
+
+    def add_cost(self, cost):
+        """
+        Method used to give the duration of a refresh, and to get the interval before the next one.
+
+        Args:
+            cost (float): duration of the refresh in ms.
+
+        Returns:
+            int: interval of the display timer in ms.
+        """
+        self.cost = cost if self.cost is None else self.cost + self.smoothing * (cost - self.cost)
+        self.interval = max(self.min_interval, self.cost / self.budget)
+        return self.get_interval()
+
+    def get_interval(self):
+        """
+        Method used to get the interval of the display timer.
+
+        Returns:
+            int: interval in ms, at least 1.
+        """
+        return max(int(round(self.interval)), 1)
+
+    def get_rate(self):
+        """
+        Method used to get the current refresh rate of the display.
+
+        Returns:
+            float: refreshes per second.
+        """
+        return 1000 / self.interval
+
+    def is_throttled(self):
+        """
+        Method used to know if the display is slowed down by the cost of the refreshes.
+
+        Returns:
+            bool: True if the interval is longer than the one of max_rate.
+        """
+        return self.interval > self.min_interval
+
+#-------------------------------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    # Load test : display path of a 5 MP frame into a 640 x 480 widget, one thread like a lab computer
+    import time
+    cv2.setNumThreads(1)
+
+    frame = (np.random.rand(2048, 2448) * 255).astype(np.uint8)
+    frame12 = (np.random.rand(2048, 2448) * 4095).astype(np.uint16)
+    scaler = DisplayScaler()
+    lut = DisplayLUT(12)
+    gammaLUT = DisplayLUT(12)
+    gammaLUT.set_mode("gamma", 2.2)
+    pyramid = FramePyramid()
+
+    def pyramid_view(zoom):
+        pyramid.set_frame(frame12)
+        return pyramid.render(1000.0, 800.0, zoom, 640, 480)
+
+    for name, function in [("cv2.resize INTER_CUBIC", lambda : cv2.resize(frame, dsize = (640, 480), interpolation = cv2.INTER_CUBIC)),
+                           ("DisplayScaler", lambda : scaler.scale(frame, 640, 480)),
+                           ("Mono12 float division", lambda : (frame12 / 2**4).astype(np.uint8)),
+                           ("Mono12 DisplayLUT (shift)", lambda : lut.apply(frame12)),
+                           ("Mono12 DisplayLUT gamma (take)", lambda : gammaLUT.apply(frame12)),
+                           ("Mono12 DisplayScaler + DisplayLUT", lambda : lut.apply(scaler.scale(frame12, 640, 480))),
+                           ("Mono12 FramePyramid view x4", lambda : pyramid_view(4.0)),
+                           ("Mono12 FramePyramid view x0.3", lambda : pyramid_view(0.3))]:
+        function()
+        start = time.perf_counter()
+        for i in range(100):
+            function()
+        print(f"Test - {name} : {(time.perf_counter() - start) * 10:.2f} ms per frame")
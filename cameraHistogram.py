@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+"""
+Histogram engine of the histogram widgets, without any Python loop over the pixels.
+
+A frame is counted in its own dtype (uint8 or uint16) by cv2.calcHist, which does not convert it to
+int64 first like np.bincount does (about 3 ms instead of 30 ms for 5 MP). cv2.calcHist counts in float32,
+exact up to 2**24 values, so larger arrays (e.g. a stack of frames) are counted by np.bincount, like the
+other values (lists of pixel values). The counts are written into an array kept from one call to the next,
+and the mean and the standard deviation are computed from the counts, without going over the pixels again.
+
+For very large sensors, the engine can count a sample of each frame instead of every pixel, so the cost
+depends on the sample budget and not on the size of the sensor. The sample is a regular grid ("strided")
+or a fixed random set of pixels ("random"), chosen once for a frame size and reused for every frame.
+The standard errors of the mean and of the standard deviation due to the sampling are given by get_errors().
+
+TemporalHistogram adds the histograms of the successive frames, over the last N frames or with an exponential
+decay. It is fed by its own thread, which copies the new frames of the FrameRingBuffer (the grab loop is never
+slowed down, the frames it can't keep up with are skipped and counted), and read by the widgets at their own
+rate, with a memory which does not grow with the time.
+
+RunningHistogram follows a growing series of values (one pixel over the time) : only the new values are
+counted, and the mean and the variance are updated with the Welford / Chan formulas, so each update costs
+the number of new values and not the length of the series.
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import math
+import threading
+import numpy as np
+import cv2
+
+# Number of values above which the float32 counts of cv2.calcHist are not exact anymore
+CALCHIST_MAX_VALUES = 2 ** 24
+
+class Histogram_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Histogram_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+#-------------------------------------------------------------------------------------------------------
+
+def find_first_last_index(counts):
+    """
+    Function used to find the range of the non empty bins of a histogram.
+
+    Args:
+        counts (np.ndarray): counts of the histogram.
+
+    Returns:
+        int, int: first non empty bin and last non empty bin + 1, (0, 0) if the histogram is empty.
+    """
+    nonZero = np.flatnonzero(counts)
+    if len(nonZero) == 0:
+        return 0, 0
+    return int(nonZero[0]), int(nonZero[-1]) + 1
+
+def get_mean_std(counts, codes = None):
+    """
+    Function used to compute the mean and the standard deviation of the values of a histogram.
+
+    Args:
+        counts (np.ndarray): counts of the histogram, bin i counting the value i.
+        codes (np.ndarray, optional): float64 values of the bins, np.arange(len(counts)). Defaults to None (computed).
+
+    Returns:
+        float, float: mean and standard deviation (population), 0 and 0 if the histogram is empty.
+    """
+    if codes is None:
+        codes = np.arange(len(counts), dtype = np.float64)
+    total = int(counts.sum())
+    if total == 0:
+        return 0.0, 0.0
+    mean = float(counts @ codes) / total
+    variance = float(counts @ (codes - mean) ** 2) / total
+    return mean, variance ** 0.5
+
+def check_sampling(sample_budget, sampling):
+    """
+    Function used to check the sampling parameters of a HistogramEngine.
+
+    Args:
+        sample_budget (int): maximum number of pixels counted per frame, None for every pixel.
+        sampling (str): "strided" or "random".
+    """
+    if sampling not in HistogramEngine.SAMPLINGS:
+        raise Histogram_ERROR(f"unknown sampling {sampling}")
+    if sample_budget is not None and sample_budget < 2:
+        raise Histogram_ERROR("sample budget must be at least 2")
+
+#-------------------------------------------------------------------------------------------------------
+
+class HistogramEngine():
+    """
+    Histogram of integer values from 0 to nb_bins - 1, the values outside are not counted.
+    """
+
+    SAMPLINGS = ["strided", "random"]
+
+    def __init__(self, nb_bins = 4097, sample_budget = None, sampling = "strided"):
+        """
+        Initialisation of the engine.
+
+        Args:
+            nb_bins (int, optional): number of bins, one per value. Defaults to 4097 (12 bits + 1).
+            sample_budget (int, optional): maximum number of pixels counted per frame. Defaults to None (every pixel).
+            sampling (str, optional): "strided" or "random" choice of the counted pixels. Defaults to "strided".
+        """
+        if not 1 <= nb_bins <= 65536 + 1:
+            raise Histogram_ERROR("number of bins out of 1 - 65537")
+        self.nb_bins = nb_bins
+        self.codes = np.arange(nb_bins, dtype = np.float64)
+
+        # Counts of the last call, and float32 output of cv2.calcHist
+        self.counts = np.zeros(nb_bins, dtype = np.int64)
+        self.hist = np.zeros((nb_bins, 1), dtype = np.float32)
+
+        # Number of values given and counted by the last call
+        self.nb_values = 0
+        self.nb_samples = 0
+
+        self.set_sampling(sample_budget, sampling)
+
+    def set_sampling(self, sample_budget = None, sampling = "strided"):
+        """
+        Method used to count a sample of each frame, or every pixel.
+
+        Args:
+            sample_budget (int, optional): maximum number of pixels counted per frame. Defaults to None (every pixel).
+            sampling (str, optional): "strided" (regular grid) or "random" (fixed random set). Defaults to "strided".
+        """
+        check_sampling(sample_budget, sampling)
+        self.sample_budget = sample_budget
+        self.sampling = sampling
+
+        # Sample of the frames, built again for the next frame
+        self.sample_key = None
+        self.stride = 1
+        self.indices = None
+        self.sample = None
+
+    def build_sample(self, shape, dtype):
+        """
+        Method used to choose the counted pixels of the frames of a given size.
+
+        Args:
+            shape (tuple): shape (height, width) of the frames.
+            dtype (np.dtype): dtype of the frames.
+        """
+        height, width = shape
+        if self.sampling == "strided":
+            self.stride = max(math.ceil(math.sqrt(height * width / self.sample_budget)), 1)
+            self.sample = np.empty((-(-height // self.stride), -(-width // self.stride)), dtype = dtype)
+        else:
+            # Sorted, so the pixels are read in the order of the memory
+            generator = np.random.default_rng(0)
+            nbSamples = min(self.sample_budget, height * width)
+            self.indices = np.sort(generator.choice(height * width, nbSamples, replace = False, shuffle = False))
+            self.sample = np.empty((1, nbSamples), dtype = dtype)
+        self.sample_key = (shape, dtype)
+
+    def compute(self, values):
+        """
+        Method used to count the values of a frame or of a list.
+
+        Args:
+            values (np.ndarray or list): frame (height, width) or values, of any shape. Only a frame is sampled.
+
+        Returns:
+            np.ndarray: counts (nb_bins) int64, array of the engine overwritten by the next call.
+                        In sampling mode, the counts are the ones of the sample, see get_scale().
+        """
+        values = np.asarray(values)
+        self.nb_values = values.size
+
+        if self.sample_budget is not None and values.ndim == 2 and values.size > self.sample_budget:
+            if self.sample_key != (values.shape, values.dtype):
+                self.build_sample(values.shape, values.dtype)
+            if self.sampling == "strided":
+                np.copyto(self.sample, values[::self.stride, ::self.stride])
+            else:
+                np.take(values.ravel(), self.indices, out = self.sample[0])
+            values = self.sample
+        self.nb_samples = values.size
+
+        if values.dtype in (np.uint8, np.uint16) and 0 < values.size < CALCHIST_MAX_VALUES:
+            # cv2 wants 2D images, a reshape of a contiguous frame does not copy it
+            image = values.reshape(values.shape[0], -1) if values.ndim >= 2 else values.reshape(1, -1)
+            cv2.calcHist([image], [0], None, [self.nb_bins], [0, self.nb_bins], hist = self.hist)
+            np.copyto(self.counts, self.hist[:, 0], casting = 'unsafe')
+        else:
+            values = values.ravel()
+            values = values[(values >= 0) & (values < self.nb_bins)].astype(np.intp)
+            self.counts[:] = np.bincount(values, minlength = self.nb_bins)
+        return self.counts
+
+    def get_mean_std(self, counts = None):
+        """
+        Method used to get the mean and the standard deviation from the counts.
+
+        Args:
+            counts (np.ndarray, optional): counts with nb_bins bins. Defaults to None (last call of compute).
+
+        Returns:
+            float, float: mean and standard deviation.
+        """
+        return get_mean_std(self.counts if counts is None else counts, self.codes)
+
+    def get_scale(self):
+        """
+        Method used to get the factor from the counts of the sample to the counts of the whole frame.
+
+        Returns:
+            float: number of values given / number of values counted by the last call, 1 without sampling.
+        """
+        return self.nb_values / self.nb_samples if self.nb_samples > 0 else 1.0
+
+    def get_errors(self):
+        """
+        Method used to get the standard errors of the mean and of the standard deviation due to the sampling,
+        with the correction of a finite population (the frame). The error of the standard deviation
+        assumes a normal distribution of the values, and both assume independent pixels.
+
+        Returns:
+            float, float: standard errors of the mean and of the standard deviation, 0 and 0 without sampling.
+        """
+        nbSamples, nbValues = self.nb_samples, self.nb_values
+        if nbSamples >= nbValues or nbSamples < 2:
+            return 0.0, 0.0
+        mean, std = self.get_mean_std()
+        correction = math.sqrt(1 - nbSamples / nbValues)
+        return std / math.sqrt(nbSamples) * correction, std / math.sqrt(2 * (nbSamples - 1)) * correction
+
+#-------------------------------------------------------------------------------------------------------
+
+class TemporalHistogram():
+    """
+    Histogram accumulated over the successive frames, thread safe.
+
+    In "window" mode, the counts are the sum of the histograms of the last nb_frames frames : the histogram
+    of each frame is kept in a ring (nb_frames, nb_bins), and the one leaving the window is subtracted.
+    In "decay" mode, the counts are multiplied by decay before adding each frame, so a frame counts
+    for decay**age and the histogram follows slow changes without any history.
+
+    The frames are counted outside of the lock, which is only held to merge the counts of a frame (a few
+    thousand bins) and by the readers. start_feeding() runs the thread taking the frames from a FrameRingBuffer.
+    """
+
+    MODES = ["window", "decay"]
+
+    def __init__(self, nb_bins = 4097, mode = "window", nb_frames = 100, decay = 0.95):
+        """
+        Initialisation of the histogram, empty.
+
+        Args:
+            nb_bins (int, optional): number of bins, one per value. Defaults to 4097 (12 bits + 1).
+            mode (str, optional): "window" or "decay". Defaults to "window".
+            nb_frames (int, optional): number of frames of the window. Defaults to 100.
+            decay (float, optional): factor applied to the counts at each frame in "decay" mode. Defaults to 0.95.
+        """
+        # The engine is only used by the thread adding the frames, the sampling is given to it through the lock
+        self.engine = HistogramEngine(nb_bins)
+        self.sample_settings = (None, "strided")
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.set_mode(mode, nb_frames, decay)
+
+        # Feeding thread
+        self.feeder = None
+        self.feeding = None
+
+    def set_mode(self, mode, nb_frames = 100, decay = 0.95):
+        """
+        Method used to choose how the frames are accumulated. The histogram is reset.
+
+        Args:
+            mode (str): "window" or "decay".
+            nb_frames (int, optional): number of frames of the window. Defaults to 100.
+            decay (float, optional): factor applied to the counts at each frame in "decay" mode. Defaults to 0.95.
+        """
+        if mode not in self.MODES:
+            raise Histogram_ERROR(f"unknown accumulation mode {mode}")
+        if mode == "window" and nb_frames < 1:
+            raise Histogram_ERROR("the window needs at least one frame")
+        if mode == "decay" and not 0 < decay < 1:
+            raise Histogram_ERROR("decay out of ]0, 1[")
+
+        with self.lock:
+            self.mode = mode
+            self.nb_frames = nb_frames
+            self.decay = decay
+            if mode == "window":
+                self.history = np.zeros((nb_frames, self.engine.nb_bins), dtype = np.int64)
+                self.counts = np.zeros(self.engine.nb_bins, dtype = np.int64)
+            else:
+                self.history = None
+                self.counts = np.zeros(self.engine.nb_bins, dtype = np.float64)
+            self.clear()
+
+    def set_sampling(self, sample_budget = None, sampling = "strided"):
+        """
+        Method used to count a sample of each frame, or every pixel (see HistogramEngine). The histogram is reset.
+
+        Args:
+            sample_budget (int, optional): maximum number of pixels counted per frame. Defaults to None (every pixel).
+            sampling (str, optional): "strided" or "random". Defaults to "strided".
+        """
+        check_sampling(sample_budget, sampling)
+        with self.lock:
+            self.sample_settings = (sample_budget, sampling)
+            self.clear()
+
+    def clear(self):
+        """
+        Method used to empty the histogram, the lock must be held. A frame being counted is not added.
+        """
+        self.generation += 1
+        self.counts[:] = 0
+        if self.history is not None:
+            self.history[:] = 0
+        self.index = 0
+        self.nb_added = 0
+        self.nb_skipped = 0
+        self.scale = 1.0
+
+    def reset(self):
+        """
+        Method used to empty the histogram.
+        """
+        with self.lock:
+            self.clear()
+
+    def add_frame(self, frame, nb_skipped = 0):
+        """
+        Method used to add the histogram of a frame, from one thread only (the feeding thread when it runs).
+
+        Args:
+            frame (np.ndarray): frame (height, width), uint8 or uint16, not modified during the call.
+            nb_skipped (int, optional): frames skipped before this one, added to nb_skipped with the counts. Defaults to 0.
+
+        Returns:
+            bool: False if the histogram was reset or changed while the frame was counted (frame not added).
+        """
+        with self.lock:
+            generation = self.generation
+            sampleSettings = self.sample_settings
+
+        # Counting, the long part, without the lock
+        if (self.engine.sample_budget, self.engine.sampling) != sampleSettings:
+            self.engine.set_sampling(*sampleSettings)
+        counts = self.engine.compute(frame)
+        scale = self.engine.get_scale()
+
+        with self.lock:
+            if generation != self.generation:
+                return False
+            if self.mode == "window":
+                slot = self.history[self.index]
+                self.counts -= slot
+                slot[:] = counts
+                self.counts += slot
+                self.index = (self.index + 1) % self.nb_frames
+            else:
+                self.counts *= self.decay
+                self.counts += counts
+            self.nb_added += 1
+            self.nb_skipped += nb_skipped
+            self.scale = scale
+        return True
+
+    def start_feeding(self, ring, interval = 0.002):
+        """
+        Method used to start the thread adding the new frames of a ring. The previous feeding is stopped.
+
+        Args:
+            ring (FrameRingBuffer): ring filled by the acquisition thread.
+            interval (float, optional): time between two checks of the ring in seconds. Defaults to 0.002.
+        """
+        self.stop_feeding()
+        self.feeding = threading.Event()
+        self.feeder = threading.Thread(target = self.feed_loop, args = (ring, interval, self.feeding), daemon = True)
+        self.feeder.start()
+
+    def stop_feeding(self, timeout = 2):
+        """
+        Method used to stop the feeding thread.
+
+        Args:
+            timeout (float, optional): maximum time to wait for the thread in seconds. Defaults to 2.
+        """
+        if self.feeder is None:
+            return
+        self.feeding.set()
+        self.feeder.join(timeout)
+        self.feeder = None
+        self.feeding = None
+
+    def feed_loop(self, ring, interval, stop):
+        """
+        Loop of the feeding thread : each new frame of the ring is copied (see FrameRingBuffer.copy_latest)
+        then added. The frames published while the previous one was counted are skipped and counted in nb_skipped.
+
+        Args:
+            ring (FrameRingBuffer): ring filled by the acquisition thread.
+            interval (float): time between two checks of the ring in seconds.
+            stop (threading.Event): set to end the loop.
+        """
+        frame = np.empty((ring.height, ring.width), dtype = ring.dtype)
+        lastCount = ring.write_count
+        while not stop.is_set():
+            if ring.write_count == lastCount:
+                stop.wait(interval)
+                continue
+
+            copy, count, info = ring.copy_latest(frame)
+            if copy is None:
+                continue
+            nbSkipped = count - lastCount - 1
+            lastCount = count
+            self.add_frame(frame, nbSkipped)
+
+    def get_counts(self, out = None):
+        """
+        Method used to get a copy of the accumulated counts.
+
+        Args:
+            out (np.ndarray, optional): float64 array (nb_bins) receiving the counts. Defaults to None (new array).
+
+        Returns:
+            np.ndarray, float: counts scaled to whole frames, and number of frames they hold
+                               (weighted sum of the frames in "decay" mode).
+        """
+        with self.lock:
+            if out is None:
+                out = np.empty(self.engine.nb_bins, dtype = np.float64)
+            np.multiply(self.counts, self.scale, out = out)
+            if self.mode == "window":
+                nbFrames = min(self.nb_added, self.nb_frames)
+            else:
+                nbFrames = (1 - self.decay ** self.nb_added) / (1 - self.decay)
+        return out, nbFrames
+
+#-------------------------------------------------------------------------------------------------------
+
+class RunningHistogram():
+    """
+    Histogram, mean and variance of a series of values, updated with the new values only.
+    """
+
+    def __init__(self, nb_bins = 4097):
+        """
+        Initialisation of the histogram, empty.
+
+        Args:
+            nb_bins (int, optional): number of bins, one per value. Defaults to 4097 (12 bits + 1).
+        """
+        self.nb_bins = nb_bins
+        self.counts = np.zeros(nb_bins, dtype = np.int64)
+        self.reset()
+
+    def reset(self):
+        """
+        Method used to empty the histogram.
+        """
+        self.counts[:] = 0
+        self.nb_values = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add_values(self, values):
+        """
+        Method used to add new values of the series.
+
+        Args:
+            values (np.ndarray or list): new values. The ones outside of the bins are only used for the mean and the variance.
+        """
+        values = np.asarray(values, dtype = np.float64).ravel()
+        nbNew = len(values)
+        if nbNew == 0:
+            return
+
+        # Histogram of the new values only
+        inside = values[(values >= 0) & (values < self.nb_bins)].astype(np.intp)
+        np.add.at(self.counts, inside, 1)
+
+        # Mean and sum of the squared deviations of the new values, merged with the previous ones (Chan et al.)
+        newMean = float(values.mean())
+        newM2 = float(((values - newMean) ** 2).sum())
+        total = self.nb_values + nbNew
+        delta = newMean - self.mean
+        self.mean += delta * nbNew / total
+        self.m2 += newM2 + delta ** 2 * self.nb_values * nbNew / total
+        self.nb_values = total
+
+    def get_mean_std(self):
+        """
+        Method used to get the mean and the standard deviation (population) of the series.
+
+        Returns:
+            float, float: mean and standard deviation, 0 and 0 if the series is empty.
+        """
+        if self.nb_values == 0:
+            return 0.0, 0.0
+        return self.mean, (self.m2 / self.nb_values) ** 0.5
+
+#-------------------------------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    # Load test : histogram of a 5 MP Mono12 frame, Python loop of the first widget against the engine
+    import time
+
+    frame = (np.random.rand(2048, 2448) * 4095).astype(np.uint16)
+    engine = HistogramEngine()
+
+    start = time.perf_counter()
+    histogram = [0] * 4097
+    for value in frame[:64].ravel():
+        histogram[value] += 1
+    print(f"Test - Python loop : {(time.perf_counter() - start) * 1000 * 2048 / 64:.0f} ms per frame (extrapolated)")
+
+    for name, function in [("np.mean + np.std", lambda : (np.mean(frame), np.std(frame))),
+                           ("HistogramEngine + mean / std", lambda : (engine.compute(frame), engine.get_mean_std()))]:
+        function()
+        start = time.perf_counter()
+        for i in range(20):
+            function()
+        print(f"Test - {name} : {(time.perf_counter() - start) * 50:.2f} ms per frame")
+
+    mean, std = engine.get_mean_std()
+    print(f"Test - mean {mean:.3f} / {np.mean(frame):.3f}, std {std:.3f} / {np.std(frame):.3f}")
+
+    # Sampling : the cost depends on the budget, not on the size of the sensor (20 MP here)
+    frame = (np.random.rand(4000, 5000) * 4095).astype(np.uint16)
+    for sampling in HistogramEngine.SAMPLINGS:
+        engine.set_sampling(100000, sampling)
+        engine.compute(frame)
+        start = time.perf_counter()
+        for i in range(20):
+            engine.compute(frame)
+            mean, std = engine.get_mean_std()
+        meanError, stdError = engine.get_errors()
+        print(f"Test - 20 MP {sampling} 100 k pixels : {(time.perf_counter() - start) * 50:.2f} ms per frame, "
+              f"mean {mean:.2f} +- {meanError:.2f} / {np.mean(frame):.2f}, std {std:.2f} +- {stdError:.2f} / {np.std(frame):.2f}")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Parameter cache shared by the camera drivers (cameraBasler / cameraUeye / cameraSimulated / cameraReplay).
+
+A value is read from the device the first time only. It is then updated when a setter succeeds,
+or read again after an explicit invalidation, so the frame loop never has to talk to the device
+to know the AOI or the bit depth.
+"""
+
+import threading
+
+#-------------------------------------------------------------------------------------------------------
+
+class CameraParameterCache():
+    """
+    Cache of camera parameters (AOI, bit depth, exposure, frame rate, black level...) with counters
+    of the cache hits and of the device round trips.
+
+    The cache is shared by the GUI and the acquisition thread, every access holds its lock. The device
+    itself is read outside the lock (a read function can get another cached parameter), and the value read
+    is only stored if no setter or invalidation happened during the read.
+    """
+
+    def __init__(self):
+        """
+        Initialisation of the cache.
+        """
+        self.values = {}
+        self.nb_hits = 0
+        self.nb_round_trips = 0
+
+        # Incremented by every update and invalidation, so a read older than them is not stored
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, name, read_function):
+        """
+        Method used to get a parameter, read from the device only if it is not in the cache.
+
+        Args:
+            name (str): name of the parameter, e.g. "aoi".
+            read_function (function): function reading the parameter from the device.
+
+        Returns:
+            value of the parameter.
+        """
+        with self.lock:
+            if name in self.values:
+                self.nb_hits += 1
+                return self.values[name]
+            generation = self.generation
+
+        value = read_function()
+        with self.lock:
+            self.nb_round_trips += 1
+            if self.generation == generation:
+                self.values[name] = value
+        return value
+
+    def update(self, name, value):
+        """
+        Method used by a setter, after its write succeeded, to store the new value of a parameter.
+        The write itself is counted as a device round trip.
+
+        Args:
+            name (str): name of the parameter.
+            value: value written into the device.
+        """
+        with self.lock:
+            self.nb_round_trips += 1
+            self.values[name] = value
+            self.generation += 1
+
+    def invalidate(self, *names):
+        """
+        Method used to force the next get of some parameters to read the device again.
+        Used when the device may have adjusted the written value, or when a parameter depends on another one.
+
+        Args:
+            names (str): names of the parameters, all the parameters if no name is given.
+        """
+        with self.lock:
+            if names == ():
+                self.values = {}
+            for name in names:
+                self.values.pop(name, None)
+            self.generation += 1
+
+    def get_stats(self):
+        """
+        Method used to get the counters of the cache.
+
+        Returns:
+            dict: number of cache hits and of device round trips.
+        """
+        with self.lock:
+            return {'hits': self.nb_hits, 'round_trips': self.nb_round_trips}
+
+    def reset_stats(self):
+        """
+        Method used to reset the counters of the cache.
+        """
+        with self.lock:
+            self.nb_hits = 0
+            self.nb_round_trips = 0
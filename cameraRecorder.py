@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Raw recorder of the frames of the acquisition thread.
+
+The frames are written at full bit depth into chunk files "<path>_0000.raw", "<path>_0001.raw"...
+Each chunk is memory-mapped and built like that :
+    - a header of HEADER_SIZE bytes : MAGIC, then a JSON dictionary (geometry, dtype, bit depth,
+      exposure, number of frames, capacity of the chunk) padded with spaces,
+    - the timestamps of the camera in ns (capacity int64 values),
+    - the frame IDs of the camera (capacity int64 values),
+    - the frames (capacity, height, width), starting on a multiple of HEADER_SIZE.
+
+The acquisition thread only copies a frame into a free buffer of a preallocated pool and queues its index.
+A writer thread copies the queued frames into the chunk. If the writer is late and the pool is empty,
+the frame is dropped and counted, the acquisition thread never waits for the disk.
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import glob
+import json
+import queue
+import threading
+import time
+import numpy as np
+
+MAGIC = b"CMOSRAW1"
+HEADER_SIZE = 4096
+
+class Recorder_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Recorder_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+#-------------------------------------------------------------------------------------------------------
+
+def get_chunk_layout(height, width, dtype, capacity):
+    """
+    Function used to get the offsets of the timestamps and of the frames in a chunk.
+
+    Args:
+        height (int): height of a frame in pixels.
+        width (int): width of a frame in pixels.
+        dtype (np.dtype): dtype of a pixel.
+        capacity (int): number of frames of the chunk.
+
+    Returns:
+        int, int, int, int: offset of the timestamps, of the frame IDs, of the frames and size of the file in bytes.
+    """
+    timestampsOffset = HEADER_SIZE
+    frameIdsOffset = timestampsOffset + 8 * capacity
+    framesOffset = -(-(frameIdsOffset + 8 * capacity) // HEADER_SIZE) * HEADER_SIZE
+    size = framesOffset + capacity * height * width * np.dtype(dtype).itemsize
+    return timestampsOffset, frameIdsOffset, framesOffset, size
+
+def get_json_value(value):
+    """
+    Function used to convert a value given by a camera driver (ctypes value like ueye.INT, numpy scalar)
+    into a value that can be written into the JSON header.
+
+    Args:
+        value: value to convert.
+
+    Returns:
+        int, float, bool, str or None: Python value.
+    """
+    value = getattr(value, "value", value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    return value
+
+def write_header(filename, header):
+    """
+    Function used to write the header of a chunk.
+
+    Args:
+        filename (str): name of the chunk file.
+        header (dict): header of the chunk.
+    """
+    text = MAGIC + json.dumps(header).encode("utf-8")
+    if len(text) > HEADER_SIZE:
+        raise Recorder_ERROR("header too long")
+    with open(filename, "r+b") as file:
+        file.write(text.ljust(HEADER_SIZE, b" "))
+
+def read_chunk(filename):
+    """
+    Function used to open a recorded chunk without loading it into memory.
+
+    Args:
+        filename (str): name of the chunk file.
+
+    Returns:
+        dict, np.ndarray, np.ndarray, np.ndarray: header, timestamps in ns (nb_frames), frame IDs (nb_frames)
+                                                  and frames (nb_frames, height, width), memory-mapped in read only mode.
+    """
+    with open(filename, "rb") as file:
+        text = file.read(HEADER_SIZE)
+    if not text.startswith(MAGIC):
+        raise Recorder_ERROR(f"{filename} is not a raw recording")
+    header = json.loads(text[len(MAGIC):].decode("utf-8"))
+
+    height, width, capacity, nbFrames = header['height'], header['width'], header['capacity'], header['nb_frames']
+    timestampsOffset, frameIdsOffset, framesOffset, size = get_chunk_layout(height, width, header['dtype'], capacity)
+    timestamps = np.memmap(filename, dtype = np.int64, mode = "r", offset = timestampsOffset, shape = (capacity,))
+    frameIds = np.memmap(filename, dtype = np.int64, mode = "r", offset = frameIdsOffset, shape = (capacity,))
+    frames = np.memmap(filename, dtype = header['dtype'], mode = "r", offset = framesOffset, shape = (capacity, height, width))
+    return header, timestamps[:nbFrames], frameIds[:nbFrames], frames[:nbFrames]
+
+def list_chunks(path):
+    """
+    Function used to list the chunks of a recording.
+
+    Args:
+        path (str): path of the recording, without the chunk number.
+
+    Returns:
+        list: names of the chunk files, in the recording order.
+    """
+    return sorted(glob.glob(f"{path}_[0-9][0-9][0-9][0-9].raw"))
+
+#-------------------------------------------------------------------------------------------------------
+
+class FrameRecorder():
+    """
+    Recorder streaming frames into memory-mapped chunk files from a writer thread.
+    """
+
+    def __init__(self, path, height, width, dtype = np.uint8, bit_depth = 8, exposure = None,
+                 chunk_frames = 256, queue_size = 32, info = None):
+        """
+        Initialisation of the recorder. The writer thread is started by start().
+
+        Args:
+            path (str): path of the recording, the chunk number and ".raw" are added.
+            height (int): height of a frame in pixels.
+            width (int): width of a frame in pixels.
+            dtype (np.dtype, optional): dtype of a pixel. Defaults to np.uint8.
+            bit_depth (int, optional): number of significant bits per pixel. Defaults to 8.
+            exposure (float, optional): exposure time, in the unit of the camera driver. Defaults to None.
+            chunk_frames (int, optional): number of frames per chunk file. Defaults to 256.
+            queue_size (int, optional): number of frames waiting for the writer before dropping. Defaults to 32.
+            info (dict, optional): other values written into the header (e.g. backend, camera). Defaults to None.
+        """
+        self.path = path
+        self.height = height
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.chunk_frames = chunk_frames
+        # The header is written by the writer thread, its values are converted now so json.dumps can't fail there
+        exposure = get_json_value(exposure)
+        self.header = {'height': int(height), 'width': int(width), 'dtype': self.dtype.str,
+                       'bit_depth': int(get_json_value(bit_depth)),
+                       'exposure': float(exposure) if exposure is not None else None,
+                       'capacity': int(chunk_frames), 'nb_frames': 0, 'timestamp_unit': 'ns'}
+        if info is not None:
+            self.header.update({key: get_json_value(value) for key, value in info.items()})
+
+        # Pool of buffers between the acquisition thread and the writer thread
+        self.pool = np.zeros((queue_size, height, width), dtype = self.dtype)
+        self.pool_frame_ids = np.zeros(queue_size, dtype = np.int64)
+        self.pool_timestamps = np.zeros(queue_size, dtype = np.int64)
+        self.free = queue.SimpleQueue()
+        for index in range(queue_size):
+            self.free.put(index)
+        self.filled = queue.SimpleQueue()
+
+        # Current chunk
+        self.chunk_index = -1
+        self.chunk_name = None
+        self.chunk_timestamps = None
+        self.chunk_frame_ids = None
+        self.chunk_frames_map = None
+        self.chunk_count = 0
+
+        # Statistics
+        self.nb_pushed = 0
+        self.nb_written = 0
+        self.nb_dropped = 0
+        self.nb_lost = 0
+        self.max_queued = 0
+        self.write_time = 0
+        self.start_time = None
+
+        # Error of the writer thread, the frames are not written anymore once it is set
+        self.error = None
+
+        self.writer = threading.Thread(target = self.write_loop, daemon = True)
+
+    def start(self):
+        """
+        Method used to start the writer thread.
+        """
+        self.start_time = time.perf_counter()
+        self.writer.start()
+
+    def push(self, frame, frame_id = 0, timestamp = None):
+        """
+        Method used by the acquisition thread to queue a frame. It never blocks : the frame is dropped
+        if the writer has not freed a buffer.
+
+        Args:
+            frame (np.ndarray): frame (height, width).
+            frame_id (int, optional): frame ID given by the camera. Defaults to 0.
+            timestamp (int, optional): timestamp of the camera in ns. Defaults to time.perf_counter_ns().
+
+        Returns:
+            bool: True if the frame is queued, False if it is dropped.
+        """
+        self.nb_pushed += 1
+        if self.error is not None:
+            self.nb_dropped += 1
+            return False
+        try:
+            index = self.free.get_nowait()
+        except queue.Empty:
+            self.nb_dropped += 1
+            return False
+
+        np.copyto(self.pool[index], frame)
+        self.pool_frame_ids[index] = frame_id
+        self.pool_timestamps[index] = time.perf_counter_ns() if timestamp is None else timestamp
+        self.filled.put(index)
+        self.max_queued = max(self.max_queued, self.filled.qsize())
+        return True
+
+    def write_loop(self):
+        """
+        Loop of the writer thread, running until stop() queues None.
+        After an error (disk full, file not writable...), the queued frames are counted as lost and their buffers
+        are given back, and the chunks already written keep a valid header.
+        """
+        while True:
+            index = self.filled.get()
+            if index is None:
+                break
+
+            if self.error is None:
+                try:
+                    self.write_frame(index)
+                except Exception as error:
+                    self.set_error(error)
+            if self.error is not None:
+                self.nb_lost += 1
+            self.free.put(index)
+
+        try:
+            self.close_chunk()
+        except Exception as error:
+            self.set_error(error)
+
+    def write_frame(self, index):
+        """
+        Method used by the writer thread to copy a buffer of the pool into the current chunk.
+
+        Args:
+            index (int): index of the buffer in the pool.
+        """
+        start = time.perf_counter()
+        if self.chunk_frames_map is None or self.chunk_count == self.chunk_frames:
+            self.open_chunk()
+        self.chunk_frames_map[self.chunk_count] = self.pool[index]
+        self.chunk_timestamps[self.chunk_count] = self.pool_timestamps[index]
+        self.chunk_frame_ids[self.chunk_count] = self.pool_frame_ids[index]
+        self.chunk_count += 1
+        self.nb_written += 1
+        self.write_time += time.perf_counter() - start
+
+    def set_error(self, error):
+        """
+        Method used by the writer thread to keep its first error and to print it.
+
+        Args:
+            error (Exception): error raised while writing.
+        """
+        if self.error is None:
+            self.error = str(error)
+            print(f"Recording : writer stopped ({error}).")
+
+    def open_chunk(self):
+        """
+        Method used to close the current chunk and to create the next one.
+        """
+        self.close_chunk()
+        self.chunk_name = f"{self.path}_{self.chunk_index + 1:04d}.raw"
+        self.chunk_count = 0
+
+        timestampsOffset, frameIdsOffset, framesOffset, size = get_chunk_layout(self.height, self.width, self.dtype, self.chunk_frames)
+        with open(self.chunk_name, "wb") as file:
+            file.truncate(size)
+        self.chunk_index += 1
+        write_header(self.chunk_name, self.header)
+
+        self.chunk_timestamps = np.memmap(self.chunk_name, dtype = np.int64, mode = "r+",
+                                          offset = timestampsOffset, shape = (self.chunk_frames,))
+        self.chunk_frame_ids = np.memmap(self.chunk_name, dtype = np.int64, mode = "r+",
+                                         offset = frameIdsOffset, shape = (self.chunk_frames,))
+        self.chunk_frames_map = np.memmap(self.chunk_name, dtype = self.dtype, mode = "r+",
+                                          offset = framesOffset, shape = (self.chunk_frames, self.height, self.width))
+
+    def close_chunk(self):
+        """
+        Method used to flush the current chunk and to write its number of frames into its header.
+        """
+        if self.chunk_frames_map is None:
+            return
+
+        chunks = [self.chunk_frames_map, self.chunk_timestamps, self.chunk_frame_ids]
+        self.chunk_frames_map = None
+        self.chunk_timestamps = None
+        self.chunk_frame_ids = None
+        for chunk in chunks:
+            chunk.flush()
+
+        self.header['nb_frames'] = self.chunk_count
+        write_header(self.chunk_name, self.header)
+
+    def stop(self, timeout = 30):
+        """
+        Method used to write the queued frames, close the last chunk and stop the writer thread.
+
+        Args:
+            timeout (float, optional): maximum time to wait for the writer in seconds. Defaults to 30.
+
+        Returns:
+            dict: statistics of the recording, see get_stats().
+        """
+        self.filled.put(None)
+        if self.writer.is_alive():
+            self.writer.join(timeout)
+        return self.get_stats()
+
+    def get_stats(self):
+        """
+        Method used to get the statistics of the recording.
+
+        Returns:
+            dict: number of frames pushed, written, dropped and lost after an error, maximum number of frames waiting
+                  for the writer, number of chunks, write rate in MB/s, fraction of the time the writer was busy
+                  and error of the writer (None if there was none).
+        """
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0
+        megaBytes = self.nb_written * self.pool[0].nbytes / 1e6
+        return {'pushed': self.nb_pushed, 'written': self.nb_written, 'dropped': self.nb_dropped, 'lost': self.nb_lost,
+                'max_queued': self.max_queued, 'chunks': self.chunk_index + 1,
+                'rate': megaBytes / elapsed if elapsed > 0 else 0,
+                'busy': self.write_time / elapsed if elapsed > 0 else 0, 'error': self.error}
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Replay camera, with the same interface as BaslerCamera, uEyeCamera and SimulatedCamera.
+
+It plays recorded frames through the live pipeline (acquisition thread, display, histograms, chart),
+to benchmark the processing on real data or to go through a lab session again offline.
+A source can be :
+    - a raw recording of cameraRecorder, given by its path without the chunk number,
+    - a .npy file containing one frame (height, width) or a stack (N, height, width),
+    - a directory of .npy files, played in alphabetical order.
+The files are memory-mapped, so a long recording is never loaded in memory.
+
+The replay runs at the original timing of the recording ("original"), at the frame rate set by
+set_frame_rate ("fixed"), or as fast as the pipeline takes the frames ("fast"). Whatever the mode,
+get_frame_info() gives the frame IDs and the timestamps of the recording (shifted at each loop, so they
+keep increasing); only a .npy source, which has none, gets a counter and the time of the replay.
+
+The sources are listed from the REPLAY_SOURCES list, filled by add_source() or by the environment
+variable CMOS_REPLAY (paths separated by os.pathsep).
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import os
+import glob
+import time
+import numpy as np
+
+from cameraParameters import CameraParameterCache
+from cameraRecorder import list_chunks, read_chunk
+
+# Paths of the recordings listed as cameras
+REPLAY_SOURCES = [path for path in os.environ.get("CMOS_REPLAY", "").split(os.pathsep) if path != ""]
+
+class Replay_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Replay_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+def add_source(path):
+    """
+    Add a recording to the list of the replay cameras
+
+    :param path: raw recording path (without the chunk number), .npy file or directory of .npy files
+    :return: index of the replay camera
+    """
+    REPLAY_SOURCES.append(path)
+    return len(REPLAY_SOURCES) - 1
+
+def get_nb_of_cam():
+    """
+    Return the number of camera connected
+
+    :return: Number of replay camera
+    """
+    return len(REPLAY_SOURCES)
+
+def get_cam_list():
+    """
+    Return the list containing the ID, serial number and name of all cameras connected
+
+    :return: list build like that [[cam1_id, cam1_ser_no, cam1_name], ... ]
+    """
+    return [[cam_id, f'REPLAY{cam_id + 1:04d}', os.path.basename(os.path.normpath(path))]
+            for cam_id, path in enumerate(REPLAY_SOURCES)]
+
+def load_source(path):
+    """
+    Open the segments of a recording, memory-mapped
+
+    :param path: raw recording path (without the chunk number), .npy file or directory of .npy files
+    :return: list of segments [timestamps in ns, frame IDs (both None if unknown), frames (N, height, width)], header
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.npy")))
+    elif path.endswith(".npy"):
+        files = [path]
+    else:
+        files = []
+
+    segments, header = [], {}
+    for filename in files:
+        frames = np.load(filename, mmap_mode = "r")
+        if frames.ndim == 2:
+            frames = frames[np.newaxis]
+
+        # The pipeline only handles the pixel formats of the cameras (Mono8, Mono10 to Mono16)
+        if frames.ndim != 3 or frames.dtype not in [np.uint8, np.uint16]:
+            raise Replay_ERROR(f"{filename} : frames of {frames.dtype} {frames.shape}, uint8 or uint16 (height, width) expected")
+        if segments != [] and frames.shape[1:] + (frames.dtype,) != segments[0][2].shape[1:] + (segments[0][2].dtype,):
+            raise Replay_ERROR(f"{filename} : size or dtype different from the first file")
+        segments.append([None, None, frames])
+
+    if files == []:
+        for filename in list_chunks(path):
+            header, timestamps, frameIds, frames = read_chunk(filename)
+            segments.append([timestamps, frameIds, frames])
+
+    segments = [segment for segment in segments if len(segment[2]) > 0]
+    if segments == []:
+        raise Replay_ERROR(f"no frame found in {path}")
+    return segments, header
+
+#-------------------------------------------------------------------------------------------------------
+
+class ReplayCamera():
+    def __init__(self, cam_id = 0, mode = "original", loop = True):
+        """
+        Initialisation of the replay camera.
+
+        Args:
+            cam_id (int or str, optional): index of the source in REPLAY_SOURCES, or path of a recording. Defaults to 0.
+            mode (str, optional): "original", "fixed" or "fast" timing. Defaults to "original".
+            loop (bool, optional): True to play the recording again once finished. Defaults to True.
+        """
+        if mode not in ["original", "fixed", "fast"]:
+            raise Replay_ERROR(f"unknown replay mode {mode}")
+
+        self.cam_id = cam_id
+        self.path = REPLAY_SOURCES[cam_id] if isinstance(cam_id, int) else cam_id
+        self.mode = mode
+        self.loop = loop
+
+        self.segments, header = load_source(self.path)
+        self.nb_frames = sum(len(frames) for timestamps, frameIds, frames in self.segments)
+        self.height_max, self.width_max = self.segments[0][2].shape[1:]
+        self.dtype = self.segments[0][2].dtype
+
+        # Bit depth and exposure of the recording, a .npy file has no header and uses the whole dtype
+        if 'bit_depth' in header:
+            self.nBitsPerPixel = int(header['bit_depth'])
+        else:
+            self.nBitsPerPixel = 8 * self.dtype.itemsize
+        self.colormode = f'Mono{self.nBitsPerPixel}'
+        self.exposure = header.get('exposure', 0)
+        self.frame_rate = self.get_original_frame_rate()
+        self.black_level = 0
+        self.aoi = (0, 0, self.width_max, self.height_max)
+
+        # Position in the recording
+        self.is_capturing = False
+        self.segment_index = 0
+        self.frame_index = 0
+        self.nb_loops = 0
+        self.next_frame_time = 0
+        self.previous_timestamp = None
+        self.frame_id = 0
+        self.timestamp = 0
+
+        # Shift of the recorded frame IDs and timestamps at each loop
+        self.frame_id_span, self.timestamp_span = self.get_loop_spans()
+
+        self.cache = CameraParameterCache()
+
+        self.ser_no, self.id = f'REPLAY{self.cam_id + 1:04d}' if isinstance(cam_id, int) else 'REPLAY', cam_id
+        self.cam_name, self.cam_pixel = os.path.basename(os.path.normpath(self.path)), self.width_max * self.height_max
+
+    def get_original_frame_rate(self):
+        """
+        Method used to get the frame rate of the recording, from its timestamps.
+
+        Returns:
+            float: median frame rate in fps, 10 if the recording has no timestamps.
+        """
+        timestamps = self.segments[0][0]
+        if timestamps is None or len(timestamps) < 2:
+            return 10
+        return float(1e9 / np.median(np.diff(timestamps)))
+
+    def get_loop_spans(self):
+        """
+        Method used to get how much the recorded frame IDs and timestamps are shifted at each loop,
+        one frame after the end of the recording.
+
+        Returns:
+            int, int: frame IDs and timestamps in ns spanned by the recording, (0, 0) without timestamps.
+        """
+        firstTimestamps, firstFrameIds, firstFrames = self.segments[0]
+        lastTimestamps, lastFrameIds, lastFrames = self.segments[-1]
+        if firstTimestamps is None:
+            return 0, 0
+
+        frameIdSpan = int(lastFrameIds[-1]) - int(firstFrameIds[0]) + 1
+        timestampSpan = int(lastTimestamps[-1]) - int(firstTimestamps[0]) + int(1e9 / self.frame_rate)
+        return frameIdSpan, timestampSpan
+
+    def init(self):
+        return True
+
+    def get_cam_info(self):
+        return self.ser_no, self.id
+
+    def get_sensor_info(self):
+        return self.width_max, self.height_max, self.cam_name, self.cam_pixel
+
+    def get_sensor_max_width(self):
+        return self.width_max
+
+    def get_sensor_max_height(self):
+        return self.height_max
+
+    def set_display_mode(self, mode = None):
+        pass
+
+    def capture_video(self):
+        self.is_capturing = True
+        self.next_frame_time = time.perf_counter()
+        self.previous_timestamp = None
+
+    def stop_video(self):
+        self.is_capturing = False
+
+    def alloc(self):
+        pass
+
+    def un_alloc(self):
+        pass
+
+    def stop_camera(self):
+        self.stop_video()
+
+    def get_mem_info(self):
+        pass
+
+    def rewind(self):
+        """
+        Method used to play the recording again from its first frame.
+        """
+        self.segment_index = 0
+        self.frame_index = 0
+        self.previous_timestamp = None
+
+    def get_image(self):
+        """
+        Method used to get the next frame of the recording, waiting for it in the "original" and "fixed" modes.
+
+        Returns:
+            np.ndarray: frame (height, width) cropped to the AOI (view on the memory-mapped file),
+                        None once the recording is finished if loop is False.
+        """
+        if self.segment_index == len(self.segments):
+            if not self.loop:
+                time.sleep(1 / self.frame_rate)
+                return None
+            self.rewind()
+            self.nb_loops += 1
+
+        timestamps, frameIds, frames = self.segments[self.segment_index]
+        frame = frames[self.frame_index]
+
+        # Frame ID and timestamp of the recording, a counter and the time of the replay for a .npy file
+        if timestamps is not None:
+            self.frame_id = int(frameIds[self.frame_index]) + self.nb_loops * self.frame_id_span
+            self.timestamp = int(timestamps[self.frame_index]) + self.nb_loops * self.timestamp_span
+        else:
+            self.frame_id += 1
+            self.timestamp = time.perf_counter_ns()
+
+        if self.is_capturing and self.mode != "fast":
+            period = 1 / self.frame_rate
+            if self.mode == "original" and timestamps is not None:
+                timestamp = timestamps[self.frame_index]
+                if self.previous_timestamp is not None and timestamp > self.previous_timestamp:
+                    period = (timestamp - self.previous_timestamp) * 1e-9
+                self.previous_timestamp = timestamp
+
+            now = time.perf_counter()
+            if self.next_frame_time > now:
+                time.sleep(self.next_frame_time - now)
+            self.next_frame_time = max(self.next_frame_time, now) + period
+
+        self.frame_index += 1
+        if self.frame_index == len(frames):
+            self.segment_index += 1
+            self.frame_index = 0
+
+        offset_x, offset_y, width, height = self.aoi
+        return frame[offset_y:offset_y + height, offset_x:offset_x + width]
+
+    def get_frame_info(self):
+        """
+        Method used to get the frame ID and the timestamp of the last frame returned by get_image().
+
+        Returns:
+            int, int: frame ID and timestamp in ns of the recording, counter and time.perf_counter_ns()
+                      for a .npy source.
+        """
+        return self.frame_id, self.timestamp
+
+    def refresh_parameters(self):
+        self.cache.invalidate()
+
+    def get_aoi(self):
+        return self.cache.get("aoi", lambda : self.aoi)
+
+    def set_aoi(self, x, y, w, h):
+        """
+        Method used to set the AOI, cropped in the recorded frames.
+
+        Args:
+            x (int): x coordinate of the top left corner of the AOI.
+            y (int): y coordinate of the top left corner of the AOI.
+            w (int): width of the AOI.
+            h (int): height of the AOI.
+        """
+        self.aoi = ajust_aoi(x, y, w, h, self.width_max, self.height_max)
+        self.cache.update("aoi", self.aoi)
+
+    def set_aoi_offset(self, x, y):
+        """
+        Method used to move the AOI without changing its size.
+
+        Args:
+            x (int): x coordinate of the top left corner of the AOI.
+            y (int): y coordinate of the top left corner of the AOI.
+        """
+        offset_x, offset_y, width, height = self.aoi
+        self.set_aoi(x, y, width, height)
+
+    def get_colormode(self):
+        return self.colormode
+
+    def set_colormode(self, mode):
+        # The bit depth is the one of the recording
+        pass
+
+    def get_bit_depth(self):
+        return self.nBitsPerPixel
+
+    def get_exposure(self):
+        return self.exposure
+
+    def get_exposure_range(self):
+        return self.exposure, self.exposure + 1
+
+    def set_exposure(self, exposure):
+        # The exposure is the one of the recording
+        pass
+
+    def get_frame_rate(self):
+        return self.frame_rate
+
+    def get_frame_time_range(self):
+        return [1 / 1000, 1, None]
+
+    def set_frame_rate(self, fps):
+        """
+        Method used to set the frame rate of the "fixed" mode, and of the "original" mode
+        when the recording has no timestamps.
+
+        Args:
+            fps (float): frame rate in fps.
+
+        Returns:
+            float: frame rate set.
+        """
+        self.frame_rate = min(max(fps, 1), 1000)
+        return self.frame_rate
+
+    def get_pixel_clock(self):
+        pass
+
+    def get_black_level(self):
+        return self.black_level
+
+    def get_black_level_range(self):
+        return 0, 0
+
+    def set_black_level(self, value):
+        pass
+
+#-------------------------------------------------------------------------------------------------------
+
+def ajust_aoi(x, y, width, height, max_width = None, max_height = None):
+    """
+    Ajust the AOI parameters to the closest (smaller) possible size :
+        - width with 4 pixels step (for the display), at least 16 pixels
+        - height at least 16 pixels
+    The AOI is then moved to stay inside the recorded frames, if their size is given.
+
+    :param x: x coordinate (width) of the top left corner of the AOI
+    :param y: y coordinate (height) of the top left corner of the AOI
+    :param width: width of the AOI
+    :param height: height of the AOI
+    :param max_width: width of the recorded frames
+    :param max_height: height of the recorded frames
+    :return: same AOI parameter adjusted to the closest (smaller) possible size
+    """
+    width0 = max(width, 16)
+    height0 = max(height, 16)
+    if max_width is not None:
+        width0 = min(width0, max_width)
+    if max_height is not None:
+        height0 = min(height0, max_height)
+    width0 = width0 - width0 % 4
+
+    x0 = max(x, 0) if max_width is None else min(max(x, 0), max_width - width0)
+    y0 = max(y, 0) if max_height is None else min(max(y, 0), max_height - height0)
+
+    return x0, y0, width0, height0
+
+#-------------------------------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    # Load test : frames per second read from a recording given on the command line, without any display
+    import sys
+
+    ReplayTest = ReplayCamera(sys.argv[1], mode = "fast", loop = False)
+    ReplayTest.capture_video()
+
+    frame = np.zeros((ReplayTest.height_max, ReplayTest.width_max), dtype = ReplayTest.dtype)
+    start = time.perf_counter()
+    for i in range(ReplayTest.nb_frames):
+        np.copyto(frame, ReplayTest.get_image())
+    duration = time.perf_counter() - start
+    print(f"Test - {ReplayTest.nb_frames} frames {ReplayTest.width_max}x{ReplayTest.height_max} : {ReplayTest.nb_frames / duration:.1f} fps")
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+Simulated CMOS camera, with the same interface as BaslerCamera and uEyeCamera.
+
+It is used when no camera is connected, to run and profile the whole pipeline on any computer.
+The frames follow a simple physical model of a CMOS sensor :
+    - signal = scene * photon flux * exposure * PRNU + dark current * exposure  (in electrons)
+    - temporal noise : shot noise (signal) and read noise, drawn from a normal distribution
+    - fixed pattern noise : PRNU (gain per pixel) and DSNU (offset per pixel)
+    - conversion to ADU with a gain fitting the full well to the full scale, plus the black level
+
+Every buffer is allocated when the AOI or the bit depth changes, never per frame. The normal samples are
+drawn once into a pool twice as large as a frame, and every frame reads the pool from a random offset.
+
+The number of simulated cameras listed is set by the environment variable CMOS_SIMULATED.
+"""
+
+#-------------------------------------------------------------------------------------------------------
+
+import os
+import threading
+import time
+import numpy as np
+
+from cameraParameters import CameraParameterCache
+
+# Default sensor (5 MP, 2/3")
+SENSOR_MAX_WIDTH = 2448
+SENSOR_MAX_HEIGHT = 2048
+
+# Number of simulated cameras listed, set by the environment variable CMOS_SIMULATED (e.g. 4 to test the
+# multi-camera view). Defaults to 1
+NB_OF_CAM = max(int(os.environ.get("CMOS_SIMULATED", "1")), 0)
+
+class Simulated_ERROR(Exception):
+    def __init__(self, ERROR_mode = "Simulated_ERROR"):
+        self.ERROR_mode = ERROR_mode
+        super().__init__(self.ERROR_mode)
+
+def get_nb_of_cam():
+    """
+    Return the number of camera connected
+
+    :return: Number of simulated camera
+    """
+    return NB_OF_CAM
+
+def get_cam_list():
+    """
+    Return the list containing the ID, serial number and name of all cameras connected
+
+    :return: list build like that [[cam1_id, cam1_ser_no, cam1_name], ... ]
+    """
+    return [[cam_id, f'SIM{cam_id + 1:05d}', 'Simulated-CMOS'] for cam_id in range(NB_OF_CAM)]
+
+#-------------------------------------------------------------------------------------------------------
+
+class SimulatedCamera():
+    def __init__(self, cam_id = 0, width_max = SENSOR_MAX_WIDTH, height_max = SENSOR_MAX_HEIGHT, max_frame_rate = 200,
+                 photon_flux = 2e5, full_well = 10000, dark_current = 5, read_noise = 2.5, prnu = 0.01, dsnu = 1.0,
+                 noise_bank = 0, seed = None):
+        """
+        Initialisation of the simulated camera.
+
+        Args:
+            cam_id (int, optional): index of the camera. Defaults to 0.
+            width_max (int, optional): width of the sensor in pixels. Defaults to SENSOR_MAX_WIDTH.
+            height_max (int, optional): height of the sensor in pixels. Defaults to SENSOR_MAX_HEIGHT.
+            max_frame_rate (float, optional): maximum frame rate in fps. Defaults to 200.
+            photon_flux (float, optional): electrons per second generated on the brightest pixel of the scene. Defaults to 2e5.
+            full_well (float, optional): full well capacity in electrons. Defaults to 10000.
+            dark_current (float, optional): dark current in electrons per second. Defaults to 5.
+            read_noise (float, optional): read noise in electrons rms. Defaults to 2.5.
+            prnu (float, optional): photo response non uniformity, relative rms. Defaults to 0.01.
+            dsnu (float, optional): dark signal non uniformity in electrons rms. Defaults to 1.0.
+            noise_bank (int, optional): if not 0, number of frames drawn once and then played in a loop, to reach
+                                        high frame rates on large sensors. Defaults to 0 (new noise on every frame).
+            seed (int, optional): seed of the random generator. Defaults to None.
+        """
+        self.cam_id = cam_id
+        self.width_max = width_max
+        self.height_max = height_max
+        self.max_frame_rate = max_frame_rate
+
+        # Sensor model
+        self.photon_flux = photon_flux
+        self.full_well = full_well
+        self.dark_current = dark_current
+        self.read_noise = read_noise
+        self.noise_bank = noise_bank
+        self.rng = np.random.default_rng(seed)
+
+        # Fixed pattern noise and scene, on the whole sensor
+        self.prnu_map = 1 + prnu * self.rng.standard_normal((height_max, width_max), dtype = np.float32)
+        self.dsnu_map = dsnu * self.rng.standard_normal((height_max, width_max), dtype = np.float32)
+        self.scene = generate_scene(width_max, height_max)
+
+        # Settings
+        self.nBitsPerPixel = 8
+        self.colormode = 'Mono8'
+        self.aoi = (0, 0, width_max, height_max)
+        self.exposure = 10000 # µs
+        self.frame_rate = 10
+        self.black_level = 0
+
+        # Buffers, allocated by alloc(). The model is read by the acquisition thread and changed by the GUI,
+        # both hold model_lock
+        self.model_lock = threading.Lock()
+        self.model_changed = True
+        self.is_capturing = False
+        self.next_frame_time = 0
+        self.frame_id = 0
+        self.timestamp = 0
+
+        self.cache = CameraParameterCache()
+        self.alloc()
+
+        self.ser_no, self.id = self.get_cam_info()
+        self.cam_name, self.cam_pixel = get_cam_list()[cam_id][2], width_max * height_max
+
+    def init(self):
+        return True
+
+    def get_cam_info(self):
+        return get_cam_list()[self.cam_id][1], self.cam_id
+
+    def get_sensor_info(self):
+        return self.width_max, self.height_max, self.cam_name, self.cam_pixel
+
+    def get_sensor_max_width(self):
+        return self.width_max
+
+    def get_sensor_max_height(self):
+        return self.height_max
+
+    def set_display_mode(self, mode = None):
+        pass
+
+    def capture_video(self):
+        self.is_capturing = True
+        self.next_frame_time = time.perf_counter()
+
+    def stop_video(self):
+        self.is_capturing = False
+
+    def alloc(self):
+        """
+        Method used to allocate the buffers at the size of the current AOI.
+        """
+        with self.model_lock:
+            offset_x, offset_y, width, height = self.aoi
+            dtype = np.uint16 if self.nBitsPerPixel > 8 else np.uint8
+
+            self.mean_electrons = np.zeros((height, width), dtype = np.float32)
+            self.sigma_electrons = np.zeros((height, width), dtype = np.float32)
+            self.noise = np.zeros((height, width), dtype = np.float32)
+
+            # Normal distribution drawn once, each frame reads it from a random offset (drawing it per frame is too slow)
+            self.noise_pool = self.rng.standard_normal(2 * height * width, dtype = np.float32)
+            self.frames = np.zeros((max(self.noise_bank, 1), height, width), dtype = dtype)
+            self.model_changed = True
+
+    def un_alloc(self):
+        pass
+
+    def stop_camera(self):
+        self.stop_video()
+
+    def get_mem_info(self):
+        pass
+
+    def get_image(self):
+        """
+        Method used to get the next frame, waiting for it at the current frame rate when capturing.
+
+        Returns:
+            np.ndarray: frame (height, width), in uint8 or uint16 (view on an internal buffer).
+        """
+        if self.is_capturing:
+            now = time.perf_counter()
+            if self.next_frame_time > now:
+                time.sleep(self.next_frame_time - now)
+            self.next_frame_time = max(self.next_frame_time, now) + self.get_frame_period()
+
+        with self.model_lock:
+            if self.model_changed:
+                self.update_model()
+
+            if self.noise_bank == 0:
+                frame = self.frames[0]
+                self.draw_frame(frame)
+            else:
+                frame = self.frames[self.frame_id % self.noise_bank]
+
+        self.frame_id += 1
+        self.timestamp = time.perf_counter_ns()
+        return frame
+
+    def update_model(self):
+        """
+        Method used to compute the mean and the temporal noise of every pixel of the AOI, after a change of
+        the AOI, the exposure or the bit depth. The noise bank is drawn again. Called with model_lock held.
+        """
+        offset_x, offset_y, width, height = self.aoi
+        exposure = self.exposure * 1e-6
+        aoi = (slice(offset_y, offset_y + height), slice(offset_x, offset_x + width))
+
+        np.multiply(self.scene[aoi], self.prnu_map[aoi], out = self.mean_electrons)
+        self.mean_electrons *= self.photon_flux * exposure
+        self.mean_electrons += self.dark_current * exposure
+
+        # Shot noise (Poisson, approximated by a normal distribution) and read noise
+        np.sqrt(self.mean_electrons + self.read_noise ** 2, out = self.sigma_electrons)
+
+        # Fixed offset of each pixel
+        self.mean_electrons += self.dsnu_map[aoi]
+
+        self.model_changed = False
+        if self.noise_bank > 0:
+            for frame in self.frames:
+                self.draw_frame(frame)
+
+    def draw_frame(self, frame):
+        """
+        Method used to draw a new frame of the model into a buffer.
+
+        Args:
+            frame (np.ndarray): buffer filled with the frame.
+        """
+        maximum = 2 ** self.nBitsPerPixel - 1
+        adu_per_electron = maximum / self.full_well
+
+        height, width = frame.shape
+        offset = self.rng.integers(height * width)
+        noise = self.noise_pool[offset:offset + height * width].reshape(height, width)
+
+        np.multiply(noise, self.sigma_electrons, out = self.noise)
+        self.noise += self.mean_electrons
+        np.clip(self.noise, 0, self.full_well, out = self.noise)
+
+        self.noise *= adu_per_electron
+        self.noise += self.black_level
+        np.clip(self.noise, 0, maximum, out = self.noise)
+        np.copyto(frame, self.noise, casting = 'unsafe')
+
+    def get_frame_period(self):
+        """
+        Method used to get the time between two frames, limited by the exposure time.
+
+        Returns:
+            float: time between two frames in seconds.
+        """
+        return max(1 / self.frame_rate, self.exposure * 1e-6)
+
+    def get_frame_info(self):
+        """
+        Method used to get the frame ID and the timestamp of the last frame returned by get_image().
+
+        Returns:
+            int, int: frame ID and timestamp in ns (time.perf_counter_ns()).
+        """
+        return self.frame_id, self.timestamp
+
+    def refresh_parameters(self):
+        self.cache.invalidate()
+
+    def get_aoi(self):
+        return self.cache.get("aoi", lambda : self.aoi)
+
+    def set_aoi(self, x, y, w, h):
+        """
+        Method used to set the AOI. The AOI is adjusted to the closest (smaller) possible size.
+
+        Args:
+            x (int): x coordinate of the top left corner of the AOI.
+            y (int): y coordinate of the top left corner of the AOI.
+            w (int): width of the AOI.
+            h (int): height of the AOI.
+        """
+        with self.model_lock:
+            self.aoi = ajust_aoi(x, y, w, h, self.width_max, self.height_max)
+        self.cache.update("aoi", self.aoi)
+        self.alloc()
+
+    def set_aoi_offset(self, x, y):
+        """
+        Method used to move the AOI without changing its size.
+
+        Args:
+            x (int): x coordinate of the top left corner of the AOI.
+            y (int): y coordinate of the top left corner of the AOI.
+        """
+        with self.model_lock:
+            offset_x, offset_y, width, height = self.aoi
+            self.aoi = ajust_aoi(x, y, width, height, self.width_max, self.height_max)
+            self.model_changed = True
+        self.cache.update("aoi", self.aoi)
+
+    def get_colormode(self):
+        return self.cache.get("colormode", lambda : self.colormode)
+
+    def set_colormode(self, mode):
+        try :
+            bit_depth = get_bits_per_pixel(mode)
+        except :
+            raise Simulated_ERROR("set_colormode")
+
+        with self.model_lock:
+            self.nBitsPerPixel = bit_depth
+
+        self.colormode = mode
+        self.cache.update("colormode", mode)
+        self.cache.update("bit_depth", self.nBitsPerPixel)
+        self.alloc()
+
+    def get_bit_depth(self):
+        return self.cache.get("bit_depth", lambda : self.nBitsPerPixel)
+
+    def get_exposure(self):
+        return self.cache.get("exposure", lambda : self.exposure)
+
+    def get_exposure_range(self):
+        return 20, 1000000
+
+    def set_exposure(self, exposure):
+        exposureMin, exposureMax = self.get_exposure_range()
+        with self.model_lock:
+            self.exposure = min(max(exposure, exposureMin), exposureMax)
+            self.model_changed = True
+        self.cache.update("exposure", self.exposure)
+
+    def get_frame_rate(self):
+        return self.cache.get("frame_rate", lambda : self.frame_rate)
+
+    def get_frame_time_range(self):
+        return [1 / self.max_frame_rate, 1, None]
+
+    def set_frame_rate(self, fps):
+        self.frame_rate = min(max(fps, 1), self.max_frame_rate)
+        self.cache.update("frame_rate", self.frame_rate)
+        return self.frame_rate
+
+    def get_pixel_clock(self):
+        pass
+
+    def get_black_level(self):
+        return self.cache.get("black_level", lambda : self.black_level)
+
+    def get_black_level_range(self):
+        return 0, 255
+
+    def set_black_level(self, value):
+        with self.model_lock:
+            self.black_level = value
+            self.model_changed = True
+        self.cache.update("black_level", value)
+
+#-------------------------------------------------------------------------------------------------------
+
+def generate_scene(width, height):
+    """
+    Generate the relative illumination seen by the sensor : a gaussian spot on a uniform background.
+
+    :param width: width of the sensor
+    :param height: height of the sensor
+    :return: array (height, width) of float32 between 0 and 1
+    """
+    x = np.linspace(-1, 1, width, dtype = np.float32)
+    y = np.linspace(-1, 1, height, dtype = np.float32)
+    spot_x = np.exp(-x ** 2 / 0.18)
+    spot_y = np.exp(-y ** 2 / 0.18)
+    return 0.3 + 0.6 * np.outer(spot_y, spot_x)
+
+def ajust_aoi(x, y, width, height, max_width = SENSOR_MAX_WIDTH, max_height = SENSOR_MAX_HEIGHT):
+    """
+    Ajust the AOI parameters to the closest (smaller) possible size, with the same steps as the real cameras :
+        - x with 4 pixels step, y with 2 pixels step
+        - 256 <= width <= max_width with 8 pixels step
+        - 256 <= height <= max_height with 2 pixels step
+    The AOI is then moved to stay inside the sensor.
+
+    :param x: x coordinate (width) of the top left corner of the AOI
+    :param y: y coordinate (height) of the top left corner of the AOI
+    :param width: width of the AOI
+    :param height: height of the AOI
+    :param max_width: width of the sensor
+    :param max_height: height of the sensor
+    :return: same AOI parameter adjusted to the closest (smaller) possible size
+    """
+    width0 = min(max(width, 256), max_width)
+    width0 = width0 - width0 % 8
+    height0 = min(max(height, 256), max_height)
+    height0 = height0 - height0 % 2
+
+    x0 = min(max(x, 0), max_width - width0)
+    x0 = x0 - x0 % 4
+    y0 = min(max(y, 0), max_height - height0)
+    y0 = y0 - y0 % 2
+
+    return x0, y0, width0, height0
+
+def get_bits_per_pixel(color_mode):
+    """
+    Returns the number of bits per pixel for the given color mode raises exception if color mode is not is
+    not in dict
+
+    :param color_mode: color mode for which we want the number of bits per pixel
+    :return : number of bits per pixel of the given color mode
+    """
+
+    return {
+        'Mono8': 8,
+        'Mono10': 10,
+        'Mono12': 12,
+    }[color_mode]
+
+#-------------------------------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    # Load test : frames per second generated without any display
+    for width, height, noise_bank in [(2448, 2048, 0), (5472, 3648, 0), (5472, 3648, 8)]:
+        SimulatedTest = SimulatedCamera(width_max = width, height_max = height, noise_bank = noise_bank)
+        SimulatedTest.set_colormode('Mono12')
+        SimulatedTest.get_image()
+
+        start = time.perf_counter()
+        for i in range(50):
+            SimulatedTest.get_image()
+        duration = time.perf_counter() - start
+        print(f"Test - {width}x{height} Mono12, noise bank {noise_bank} : {50 / duration:.1f} fps")
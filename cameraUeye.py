@@ -14,6 +14,8 @@ Version : 1.0 - 2023-03-08
 
 from pyueye import ueye
 
+from cameraParameters import CameraParameterCache
+
 class uEye_ERROR(Exception):
     def __init__(self, ERROR_mode = "uEye_ERROR"):
         self.ERROR_mode = ERROR_mode
@@ -66,7 +68,11 @@ def get_cam_list():
 #-------------------------------------------------------------------------------------------------------
 
 class uEyeCamera:
-    def __init__(self, cam_id=0):
+    def __init__(self, cam_id=0, nb_buffers=4):
+        """
+        :param cam_id: ID of the camera
+        :param nb_buffers: number of image memories in the sequence (ring) filled by the driver
+        """
         self.h_cam = ueye.HIDS(cam_id)
         self.nBitsPerPixel = ueye.INT()
         self.colormode = None
@@ -76,6 +82,20 @@ class uEyeCamera:
         self.height = ueye.INT()
         self.pitch = ueye.INT()
 
+        # Image sequence : list of [pcImageMemory, MemID], and the buffer locked by the last get_image()
+        self.nb_buffers = nb_buffers
+        self.sequence = []
+        self.locked_buffer = None
+
+        # Frame counters, frame counter of the sensor and timestamp in ns of the last frame
+        self.nb_frames = 0
+        self.nb_timeouts = 0
+        self.frame_id = 0
+        self.timestamp = 0
+
+        # Parameters read from the camera once, updated by the setters
+        self.cache = CameraParameterCache()
+
         self.init()
         self.ser_no, self.id = self.get_cam_info()
         self.width_max, self.height_max, self.cam_name, self.cam_pixel = self.get_sensor_info()
@@ -158,26 +178,60 @@ class uEyeCamera:
         ret = ueye.is_StopLiveVideo(self.h_cam, ueye.IS_DONT_WAIT)
         if ret != ueye.IS_SUCCESS:
             raise uEye_ERROR("is_StopLiveVideo")
+        self.unlock_buffer()
 
     def alloc(self):
-        ret = ueye.is_AllocImageMem(self.h_cam, self.width, self.height, self.nBitsPerPixel, self.pcImageMemory,
-                                    self.MemID)
-        if ret != ueye.IS_SUCCESS:
-            raise uEye_ERROR("is_AllocImageMem")
-        else:
-            # Makes the specified image memory the active memory
-            ret = ueye.is_SetImageMem(self.h_cam, self.pcImageMemory, self.MemID)
+        """
+        Allocate nb_buffers image memories, add them to the sequence and start the image queue.
+        The driver fills the memories in turn and never writes into a memory locked by get_image().
+
+        :return: No return
+        """
+        for i in range(self.nb_buffers):
+            pcImageMemory = ueye.c_mem_p()
+            MemID = ueye.int()
+            ret = ueye.is_AllocImageMem(self.h_cam, self.width, self.height, self.nBitsPerPixel, pcImageMemory,
+                                        MemID)
             if ret != ueye.IS_SUCCESS:
-                raise uEye_ERROR("is_SetImageMem")
+                raise uEye_ERROR("is_AllocImageMem")
 
-    def un_alloc(self):
-        ret = ueye.is_FreeImageMem(self.h_cam, self.pcImageMemory, self.MemID)
+            ret = ueye.is_AddToSequence(self.h_cam, pcImageMemory, MemID)
+            if ret != ueye.IS_SUCCESS:
+                raise uEye_ERROR("is_AddToSequence")
+            self.sequence.append([pcImageMemory, MemID])
+
+        # The first memory is used by is_InquireImageMem and get_mem_info
+        self.pcImageMemory, self.MemID = self.sequence[0]
+
+        ret = ueye.is_InitImageQueue(self.h_cam, 0)
         if ret != ueye.IS_SUCCESS:
-            raise uEye_ERROR("is_FreeImageMem")
-        else:
-            self.MemID = ueye.int()
-            self.pcImageMemory = ueye.c_mem_p()
-            self.pitch = ueye.INT()
+            raise uEye_ERROR("is_InitImageQueue")
+
+    def un_alloc(self):
+        self.unlock_buffer()
+        ueye.is_ExitImageQueue(self.h_cam)
+        ueye.is_ClearSequence(self.h_cam)
+
+        for pcImageMemory, MemID in self.sequence:
+            ret = ueye.is_FreeImageMem(self.h_cam, pcImageMemory, MemID)
+            if ret != ueye.IS_SUCCESS:
+                raise uEye_ERROR("is_FreeImageMem")
+
+        self.sequence = []
+        self.MemID = ueye.int()
+        self.pcImageMemory = ueye.c_mem_p()
+        self.pitch = ueye.INT()
+
+    def unlock_buffer(self):
+        """
+        Give the memory locked by the last get_image() back to the driver.
+
+        :return: No return
+        """
+        if self.locked_buffer is not None:
+            pcImageMemory, MemID = self.locked_buffer
+            ueye.is_UnlockSeqBuf(self.h_cam, MemID, pcImageMemory)
+            self.locked_buffer = None
             
     def stop_camera(self):
         self.stop_video()
@@ -192,10 +246,84 @@ class uEyeCamera:
         ret = ueye.is_InquireImageMem(self.h_cam, self.pcImageMemory, self.MemID, w, h, bit, pit)
         print(w.value, h.value, bit.value, pit.value)
 
-    def get_image(self):
-        return ueye.get_data(self.pcImageMemory, self.width, self.height, self.nBitsPerPixel, self.pitch, copy=False)
+    def get_image(self, timeout = 5000):
+        """
+        Wait for the next frame of the image queue and return its memory (no copy).
+        The memory stays locked, so the sensor cannot overwrite it, until the next call of get_image().
+
+        :param timeout: maximum waiting time in ms
+        :return: image memory as a numpy array, None if no frame arrived in time
+        """
+        # The previous frame has been consumed, it can be filled again
+        self.unlock_buffer()
+
+        pcImageMemory = ueye.c_mem_p()
+        MemID = ueye.int()
+        ret = ueye.is_WaitForNextImage(self.h_cam, timeout, pcImageMemory, MemID)
+        if ret == ueye.IS_TIMED_OUT:
+            self.nb_timeouts += 1
+            return None
+        elif ret != ueye.IS_SUCCESS:
+            raise uEye_ERROR("is_WaitForNextImage")
+
+        self.locked_buffer = [pcImageMemory, MemID]
+        self.nb_frames += 1
+
+        # Frame counter and timestamp of the sensor (in 0.1 µs) of this buffer
+        image_info = ueye.UEYEIMAGEINFO()
+        if ueye.is_GetImageInfo(self.h_cam, MemID, image_info, ueye.sizeof(image_info)) == ueye.IS_SUCCESS:
+            self.frame_id = image_info.u64FrameNumber.value
+            self.timestamp = image_info.u64TimestampDevice.value * 100
+        return ueye.get_data(pcImageMemory, self.width, self.height, self.nBitsPerPixel, self.pitch, copy=False)
+
+    def get_frame_info(self):
+        """
+        Return the frame counter and the timestamp of the last frame returned by get_image().
+
+        :return: frame counter of the sensor and timestamp of the camera in ns
+        """
+        return self.frame_id, self.timestamp
+
+    def get_lost_frames(self):
+        """
+        Return the counters of the frames lost by the driver since the last reset of the capture status.
+
+        :return: dict build like that {'total': ..., 'no_dest_mem': ..., 'out_of_buffers': ..., 'transfer': ...}
+        """
+        info = ueye.UEYE_CAPTURE_STATUS_INFO()
+        ret = ueye.is_CaptureStatus(self.h_cam, ueye.IS_CAPTURE_STATUS_INFO_CMD_GET, info, ueye.sizeof(info))
+        if ret != ueye.IS_SUCCESS:
+            raise uEye_ERROR("is_CaptureStatus")
+
+        return {
+            'total': info.dwCapStatusCnt_Total.value,
+            'no_dest_mem': info.adwCapStatusCnt_Detail[ueye.IS_CAP_STATUS_API_NO_DEST_MEM].value,
+            'out_of_buffers': info.adwCapStatusCnt_Detail[ueye.IS_CAP_STATUS_DRV_OUT_OF_BUFFERS].value,
+            'transfer': info.adwCapStatusCnt_Detail[ueye.IS_CAP_STATUS_USB_TRANSFER_FAILED].value,
+        }
+
+    def reset_lost_frames(self):
+        """
+        Reset the lost frame counters of the driver and of the class.
+
+        :return: No return
+        """
+        ueye.is_CaptureStatus(self.h_cam, ueye.IS_CAPTURE_STATUS_INFO_CMD_RESET, None, 0)
+        self.nb_frames = 0
+        self.nb_timeouts = 0
+
+    def refresh_parameters(self):
+        """
+        Empty the parameter cache, the next getters will read the camera again.
+
+        :return: No return
+        """
+        self.cache.invalidate()
 
     def get_aoi(self):
+        return self.cache.get("aoi", self.read_aoi)
+
+    def read_aoi(self):
         aoi = ueye.IS_RECT()
         ueye.is_AOI(self.h_cam, ueye.IS_AOI_IMAGE_GET_AOI, aoi, ueye.sizeof(aoi))
 
@@ -224,9 +352,31 @@ class uEyeCamera:
         ret = ueye.is_AOI(self.h_cam, ueye.IS_AOI_IMAGE_SET_AOI, aoi, ueye.sizeof(aoi))
         if ret != ueye.IS_SUCCESS:
             raise uEye_ERROR("is_AOI")
+        self.cache.update("aoi", (x0, y0, w0, h0))
+
+    def set_aoi_offset(self, x, y):
+        """
+        Move the AOI without changing its size. The position can be changed during the live video,
+        so the image memories do not need to be allocated again.
+
+        :param x: x coordinate (width) of the top left corner of the AOI
+        :param y: y coordinate (height) of the top left corner of the AOI
+        :return: No return
+        """
+        offset_x, offset_y, width, height = self.get_aoi()
+        x0, y0, w0, h0 = ajust_aoi(x, y, width, height)
+
+        position = ueye.IS_POINT_2D()
+        position.s32X = ueye.INT(x0)
+        position.s32Y = ueye.INT(y0)
+
+        ret = ueye.is_AOI(self.h_cam, ueye.IS_AOI_IMAGE_SET_POS, position, ueye.sizeof(position))
+        if ret != ueye.IS_SUCCESS:
+            raise uEye_ERROR("is_AOI")
+        self.cache.update("aoi", (x0, y0, width, height))
 
     def get_colormode(self):
-        return ueye.is_SetColorMode(self.h_cam, ueye.IS_GET_COLOR_MODE)
+        return self.cache.get("colormode", lambda : ueye.is_SetColorMode(self.h_cam, ueye.IS_GET_COLOR_MODE))
 
     def set_colormode(self, mode):
         """
@@ -241,8 +391,21 @@ class uEyeCamera:
 
         self.nBitsPerPixel = get_bits_per_pixel(mode)
         self.colormode = mode
+        self.cache.update("colormode", mode)
+        self.cache.update("bit_depth", self.nBitsPerPixel.value)
+
+    def get_bit_depth(self):
+        """
+        Return the number of bits per pixel of the current color mode.
+
+        :return: number of bits per pixel
+        """
+        return self.cache.get("bit_depth", lambda : get_bits_per_pixel(self.get_colormode()).value)
 
     def get_exposure(self):
+        return self.cache.get("exposure", self.read_exposure)
+
+    def read_exposure(self):
         exposure = ueye.double()
         ueye.is_Exposure(self.h_cam, ueye.IS_EXPOSURE_CMD_GET_EXPOSURE, exposure, ueye.sizeof(exposure))
 
@@ -260,9 +423,15 @@ class uEyeCamera:
 
     def set_exposure(self, exposure):
         v = ueye.double(exposure)
-        ueye.is_Exposure(self.h_cam, ueye.IS_EXPOSURE_CMD_SET_EXPOSURE, v, ueye.sizeof(v))
+        ret = ueye.is_Exposure(self.h_cam, ueye.IS_EXPOSURE_CMD_SET_EXPOSURE, v, ueye.sizeof(v))
+        if ret == ueye.IS_SUCCESS:
+            # The camera rounds the exposure, and the resulting frame rate can change
+            self.cache.invalidate("exposure", "frame_rate")
 
     def get_frame_rate(self):
+        return self.cache.get("frame_rate", self.read_frame_rate)
+
+    def read_frame_rate(self):
         fps = ueye.double()
         ueye.is_GetFramesPerSecond (self.h_cam, fps)
         return int(fps)
@@ -277,7 +446,9 @@ class uEyeCamera:
     def set_frame_rate(self, fps):
         set_fps = ueye.double(fps)
         new_fps = ueye.double()
-        ueye.is_SetFrameRate(self.h_cam, set_fps, new_fps)
+        ret = ueye.is_SetFrameRate(self.h_cam, set_fps, new_fps)
+        if ret == ueye.IS_SUCCESS:
+            self.cache.update("frame_rate", int(new_fps))
         return int(new_fps)
 
     def get_pixel_clock(self):
@@ -286,13 +457,18 @@ class uEyeCamera:
         return pixel_clock.value
 
     def get_black_level(self):
+        return self.cache.get("black_level", self.read_black_level)
+
+    def read_black_level(self):
         blacklevel = ueye.uint()
         ueye.is_Blacklevel(self.h_cam, ueye.IS_BLACKLEVEL_CMD_GET_OFFSET, blacklevel, ueye.sizeof(blacklevel))
-        return blacklevel
+        return blacklevel.value
     
     def set_black_level(self, value):
         blacklevel = ueye.uint(value)
-        ueye.is_Blacklevel(self.h_cam, ueye.IS_BLACKLEVEL_CMD_SET_OFFSET, blacklevel, ueye.sizeof(blacklevel))
+        ret = ueye.is_Blacklevel(self.h_cam, ueye.IS_BLACKLEVEL_CMD_SET_OFFSET, blacklevel, ueye.sizeof(blacklevel))
+        if ret == ueye.IS_SUCCESS:
+            self.cache.update("black_level", value)
 
     # def get_pixel_clock_list(self):
     #     number = ueye.uint()
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+The modules of the application are flat files at the root of the repository.
+The tests run on the simulated camera, without Qt nor hardware.
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cameraSimulated import SimulatedCamera
+
+@pytest.fixture
+def camera():
+    """
+    Small simulated camera in Mono12, fast enough for the acquisition tests.
+    """
+    camera = SimulatedCamera(width_max = 320, height_max = 256, max_frame_rate = 1000, noise_bank = 4, seed = 0)
+    camera.set_colormode('Mono12')
+    camera.set_frame_rate(500)
+    yield camera
+    camera.stop_camera()
+
+@pytest.fixture
+def frames(camera):
+    """
+    Stack of 6 frames (6, 256, 320) uint16 of the simulated camera.
+    """
+    return np.stack([camera.get_image().copy() for index in range(6)])
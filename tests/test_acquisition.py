@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Frame ring, pipeline counters, burst and acquisition thread of cameraAcquisition.
+"""
+
+import threading
+import time
+import numpy as np
+
+from cameraAcquisition import FrameRingBuffer, PipelineStats, BurstCapture, AcquisitionThread
+
+def publish(ring, value, frame_id):
+    ring.get_write_slot()[:] = value
+    ring.publish(frame_id, 1000 * frame_id)
+
+def wait_for(condition, timeout = 5):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return False
+        time.sleep(0.005)
+    return True
+
+def test_ring_latest_frame_and_info():
+    ring = FrameRingBuffer(3, 4, 5, np.uint16)
+    assert ring.get_latest() == (None, 0)
+
+    for frame_id in range(1, 6):
+        publish(ring, frame_id * 10, frame_id)
+    frame, count = ring.get_latest()
+    assert count == 5 and np.all(frame == 50)
+    assert ring.get_info(count) == (5, 5000)
+
+    # The slot of the count before the last can already be written again
+    assert ring.is_valid(5)
+    assert not ring.is_valid(3)
+
+def test_ring_copy_latest():
+    ring = FrameRingBuffer(3, 4, 5, np.uint16)
+    out = np.empty((4, 5), dtype = np.uint16)
+    assert ring.copy_latest(out)[0] is None
+
+    publish(ring, 7, 42)
+    frame, count, info = ring.copy_latest(out)
+    assert frame is out and count == 1 and np.all(out == 7)
+    assert info[:2] == (42, 42000)
+
+def test_ring_copy_latest_retries_when_the_slot_is_overwritten():
+    ring = FrameRingBuffer(2, 4, 5, np.uint8)
+    publish(ring, 1, 1)
+    checks = []
+
+    # The writer comes back to the slot during the first copy
+    def is_valid(count):
+        checks.append(count)
+        if len(checks) == 1:
+            publish(ring, 2, 2)
+            publish(ring, 3, 3)
+            return False
+        return True
+    ring.is_valid = is_valid
+
+    out = np.empty((4, 5), dtype = np.uint8)
+    frame, count, info = ring.copy_latest(out)
+    assert checks == [1, 3]
+    assert count == 3 and info[0] == 3 and np.all(out == 3)
+
+def test_acquisition_thread_fills_the_ring(camera):
+    camera.capture_video()
+    offset_x, offset_y, width, height = camera.get_aoi()
+    ring = FrameRingBuffer(4, height, width, np.uint16)
+    stats = PipelineStats()
+    thread = AcquisitionThread(camera, ring, 2, stats)
+    thread.start()
+    try:
+        assert wait_for(lambda : ring.write_count >= 10)
+    finally:
+        thread.stop()
+
+    result = stats.get_stats()
+    assert result['delivered'] == ring.write_count and result['dropped'] == 0
+    frame, count = ring.get_latest()
+    assert frame.max() > 0 and frame.max() < 4096
+    assert ring.get_info(count)[0] == camera.get_frame_info()[0]
+
+class LostCamera:
+    def get_image(self):
+        raise RuntimeError("device removed")
+
+def test_acquisition_thread_stops_after_failed_grabs():
+    errors = []
+    ring = FrameRingBuffer(2, 4, 5, np.uint8)
+    thread = AcquisitionThread(LostCamera(), ring, max_failures = 5, on_error = errors.append)
+    thread.start()
+    thread.join(5)
+
+    # The loop gives up by itself and reports the error once
+    assert not thread.is_alive()
+    assert thread.nb_failures == 5 and len(errors) == 1
+    assert "device removed" in errors[0] and thread.error == errors[0]
+
+def test_acquisition_thread_runs_commands(camera):
+    camera.capture_video()
+    offset_x, offset_y, width, height = camera.get_aoi()
+    ring = FrameRingBuffer(4, height, width, np.uint16)
+    thread = AcquisitionThread(camera, ring, 2, PipelineStats())
+    thread.start()
+    try:
+        # The commands are run by the acquisition thread itself, between two frames
+        threads = []
+        thread.submit(lambda : threads.append(threading.get_ident()))
+        assert wait_for(lambda : threads != [])
+        assert threads == [thread.ident]
+    finally:
+        thread.stop()
+
+    # Once the thread is stopped, the last commands are run by stop()
+    thread.submit(lambda : threads.append(threading.get_ident()))
+    thread.stop()
+    assert threads[-1] == threading.get_ident()
+
+def test_burst_report():
+    burst = BurstCapture(4, 2, 2)
+    for frame_id in [10, 11, 13]:
+        assert not burst.add_frame(np.full((2, 2), frame_id, dtype = np.uint8), frame_id, frame_id * 1000000)
+    assert burst.add_frame(np.zeros((2, 2), dtype = np.uint8), 14, 14000000)
+
+    assert burst.wait(0)
+    report = burst.get_report()
+    assert report['frames'] == 4 and report['dropped'] == 1
+    assert abs(report['fps'] - 3 / 0.004) < 1e-6
+    assert np.all(burst.stack[2] == 13)
+
+def test_burst_temporal_noise(frames):
+    burst = BurstCapture(len(frames), frames.shape[1], frames.shape[2], np.uint16)
+    for frame_id, frame in enumerate(frames):
+        burst.add_frame(frame, frame_id)
+
+    # Blocks of a few rows give the same noise as the whole stack at once
+    expected = frames.std(axis = 0, dtype = np.float64).mean()
+    assert abs(burst.get_temporal_noise(max_bytes = 1) - expected) < 1e-3 * expected
+    assert abs(burst.get_temporal_noise() - expected) < 1e-3 * expected
+
+def test_acquisition_thread_burst(camera):
+    camera.capture_video()
+    offset_x, offset_y, width, height = camera.get_aoi()
+    ring = FrameRingBuffer(4, height, width, np.uint16)
+    thread = AcquisitionThread(camera, ring, 2, PipelineStats())
+    thread.start()
+    try:
+        assert wait_for(lambda : ring.write_count >= 2)
+        burst = BurstCapture(8, height, width, np.uint16)
+        thread.start_burst(burst)
+        assert burst.wait(5)
+    finally:
+        thread.stop()
+
+    report = burst.get_report()
+    assert report['frames'] == 8 and report['dropped'] == 0
+    assert np.all(np.diff(burst.frame_ids) == 1)
+
+def test_stats_dropped_and_burst():
+    stats = PipelineStats()
+    for frame_id in [1, 2, 5]:
+        stats.count_delivered(frame_id)
+    for frame_id in [6, 7, 9]:
+        stats.count_burst(frame_id)
+    stats.count_displayed(time.perf_counter_ns())
+
+    result = stats.get_stats()
+    assert result['delivered'] == 3 and result['burst'] == 3
+    assert result['dropped'] == 3
+    assert result['skipped'] == 2
+
+def test_stats_burst_frames_are_not_delivered(camera):
+    camera.capture_video()
+    offset_x, offset_y, width, height = camera.get_aoi()
+    ring = FrameRingBuffer(4, height, width, np.uint16)
+    stats = PipelineStats()
+    thread = AcquisitionThread(camera, ring, 2, stats)
+    thread.start()
+    try:
+        assert wait_for(lambda : ring.write_count >= 2)
+        burst = BurstCapture(8, height, width, np.uint16)
+        thread.start_burst(burst)
+        assert burst.wait(5)
+    finally:
+        thread.stop()
+
+    result = stats.get_stats()
+    assert result['burst'] == 8
+    assert result['delivered'] == ring.write_count
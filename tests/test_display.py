@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Display path of cameraDisplay.
+"""
+
+import numpy as np
+import pytest
+
+from cameraDisplay import DisplayScaler, DisplayLUT, DisplayScheduler, FramePyramid, Display_ERROR
+
+def test_scaler(frames):
+    scaler = DisplayScaler()
+    frame = frames[0]
+    assert scaler.scale(frame, 320, 256) is frame
+
+    scaled = scaler.scale(frames[0], 100, 60)
+    assert scaled.shape == (60, 100) and scaled.dtype == frames.dtype
+    assert abs(float(scaled.mean()) - float(frames[0].mean())) < 0.01 * float(frames[0].mean())
+
+    constant = np.full((256, 320), 1234, dtype = np.uint16)
+    assert np.all(scaler.scale(constant, 100, 60) == 1234)
+
+@pytest.mark.parametrize("bit_depth", [8, 10, 12, 16])
+def test_lut_default_is_a_shift(bit_depth):
+    lut = DisplayLUT(bit_depth)
+    codes = np.arange(2 ** bit_depth, dtype = np.uint16 if bit_depth > 8 else np.uint8).reshape(1, -1)
+    assert lut.is_shift()
+    np.testing.assert_array_equal(lut.apply(codes), codes >> (bit_depth - 8))
+    np.testing.assert_array_equal(np.take(lut.lut, codes), codes >> (bit_depth - 8))
+
+def test_lut_window(frames):
+    lut = DisplayLUT(12)
+    lut.set_window(1000, 2000)
+    assert not lut.is_shift()
+
+    display = lut.apply(frames[0])
+    assert display.dtype == np.uint8 and display.shape == frames[0].shape
+    assert np.all(display[frames[0] <= 1000] == 0)
+    assert np.all(display[frames[0] >= 2000] == 255)
+
+    inside = (frames[0] > 1000) & (frames[0] < 2000)
+    expected = np.floor((frames[0][inside] - 1000) / 1000 * 255 + 0.5)
+    np.testing.assert_array_equal(display[inside], expected)
+
+@pytest.mark.parametrize("mode", ["gamma", "log"])
+def test_lut_curves_are_monotonic(mode):
+    lut = DisplayLUT(12)
+    lut.set_mode(mode, gamma = 2.2)
+    lut.build()
+    assert lut.lut[0] == 0 and lut.lut[-1] == 255
+    assert np.all(np.diff(lut.lut.astype(int)) >= 0)
+
+def test_lut_auto_stretch(frames):
+    lut = DisplayLUT(12)
+    lut.set_auto_stretch(True, 1, 99)
+    display = lut.apply(frames[0])
+    assert (lut.low, lut.high) == (int(np.percentile(frames[0], 1)), int(np.percentile(frames[0], 99)))
+    assert display.min() == 0 and display.max() == 255
+
+def test_lut_errors():
+    with pytest.raises(Display_ERROR):
+        DisplayLUT(7)
+    with pytest.raises(Display_ERROR):
+        DisplayLUT(12).set_mode("sqrt")
+
+def test_scheduler_throttles_and_recovers():
+    scheduler = DisplayScheduler(max_rate = 50, budget = 0.5, smoothing = 1.0)
+    assert scheduler.get_interval() == 20
+    assert scheduler.add_cost(40) == 80 and scheduler.is_throttled()
+    assert scheduler.add_cost(1) == 20 and not scheduler.is_throttled()
+
+def test_pyramid_levels_and_values(frames):
+    pyramid = FramePyramid()
+    frame = frames[0]
+    pyramid.set_frame(frame)
+    assert pyramid.get_level(0) is frame
+
+    # Area average of each 2 x 2 block
+    level = pyramid.get_level(1)
+    expected = frames[0].astype(np.float64).reshape(128, 2, 160, 2).mean(axis = (1, 3))
+    assert level.shape == (128, 160)
+    assert np.max(np.abs(level - expected)) <= 0.5
+
+    assert pyramid.get_value(3, 5) == int(frames[0][5, 3])
+    assert pyramid.get_value(320, 0) is None
+
+def test_pyramid_render(frames):
+    pyramid = FramePyramid()
+    pyramid.set_frame(frames[0])
+
+    # Zoom x1 : the pixels themselves
+    tile, slices = pyramid.render(10.0, 20.0, 1.0, 64, 48)
+    np.testing.assert_array_equal(tile, frames[0][20:68, 10:74])
+    assert slices == (slice(0, 48), slice(0, 64))
+
+    # Zoom x4 : each pixel on 4 x 4 screen pixels
+    tile, slices = pyramid.render(0.0, 0.0, 4.0, 40, 40)
+    np.testing.assert_array_equal(tile, np.repeat(np.repeat(frames[0][:10, :10], 4, axis = 0), 4, axis = 1))
+
+    # Part of the view outside of the frame
+    tile, slices = pyramid.render(-10.0, 0.0, 1.0, 40, 40)
+    assert slices == (slice(0, 40), slice(10, 40))
+    np.testing.assert_array_equal(tile, frames[0][:40, :30])
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Histogram engine, temporal and running histograms of cameraHistogram, checked against numpy.
+"""
+
+import time
+import numpy as np
+import pytest
+
+from cameraAcquisition import FrameRingBuffer
+from cameraHistogram import HistogramEngine, TemporalHistogram, RunningHistogram, Histogram_ERROR, find_first_last_index
+
+def test_engine_matches_bincount(frames):
+    engine = HistogramEngine(4097)
+    for values in [frames[0], frames[1].astype(np.uint8), frames[2].astype(np.int64).ravel().tolist()]:
+        counts = engine.compute(values)
+        expected = np.bincount(np.ravel(values), minlength = 4097)[:4097]
+        np.testing.assert_array_equal(counts, expected)
+
+    mean, std = engine.get_mean_std()
+    values = np.asarray(frames[2], dtype = np.float64)
+    assert mean == pytest.approx(values.mean()) and std == pytest.approx(values.std())
+
+def test_engine_counts_more_than_2_24_values():
+    # A float32 count stops at 2**24, the engine must not
+    values = np.zeros((4097, 4096), dtype = np.uint8)
+    values[0, :3] = 255
+    counts = HistogramEngine(256).compute(values)
+    assert counts[0] == values.size - 3 and counts[255] == 3
+
+def test_engine_sampling(frames):
+    engine = HistogramEngine(4097, sample_budget = 8000)
+    counts = engine.compute(frames[0])
+    assert engine.nb_values == frames[0].size
+    assert counts.sum() * engine.get_scale() == pytest.approx(frames[0].size)
+
+    mean, std = engine.get_mean_std()
+    meanError, stdError = engine.get_errors()
+    assert abs(mean - frames[0].mean()) < 5 * meanError
+    assert abs(std - frames[0].std()) < 5 * stdError
+
+    with pytest.raises(Histogram_ERROR):
+        engine.set_sampling(100, "diagonal")
+
+def test_find_first_last_index():
+    counts = np.zeros(10, dtype = np.int64)
+    counts[[2, 7]] = 1
+    assert find_first_last_index(counts) == (2, 8)
+    assert find_first_last_index(np.zeros(10, dtype = np.int64)) == (0, 0)
+
+def test_temporal_window(frames):
+    histogram = TemporalHistogram(4097, "window", nb_frames = 2)
+    for frame in frames[:3]:
+        assert histogram.add_frame(frame)
+
+    counts, nbFrames = histogram.get_counts()
+    expected = np.bincount(frames[1:3].ravel(), minlength = 4097)
+    assert nbFrames == 2
+    np.testing.assert_array_equal(counts, expected)
+
+    histogram.reset()
+    counts, nbFrames = histogram.get_counts()
+    assert nbFrames == 0 and counts.sum() == 0
+
+def test_temporal_decay(frames):
+    histogram = TemporalHistogram(4097, "decay", decay = 0.5)
+    for frame in frames[:2]:
+        histogram.add_frame(frame)
+
+    counts, nbFrames = histogram.get_counts()
+    expected = 0.5 * np.bincount(frames[0].ravel(), minlength = 4097) + np.bincount(frames[1].ravel(), minlength = 4097)
+    assert nbFrames == pytest.approx(1.5)
+    np.testing.assert_allclose(counts, expected)
+
+def test_temporal_feeding_from_the_ring(frames):
+    ring = FrameRingBuffer(3, 256, 320, np.uint16)
+    histogram = TemporalHistogram(4097, "window", nb_frames = 10)
+    histogram.start_feeding(ring, interval = 0.001)
+    try:
+        for index, frame in enumerate(frames):
+            np.copyto(ring.get_write_slot(), frame)
+            ring.publish(index + 1)
+            start = time.perf_counter()
+            while histogram.nb_added + histogram.nb_skipped < index + 1 and time.perf_counter() - start < 5:
+                time.sleep(0.001)
+    finally:
+        histogram.stop_feeding()
+
+    assert histogram.nb_added == len(frames) and histogram.nb_skipped == 0
+    counts, nbFrames = histogram.get_counts()
+    np.testing.assert_array_equal(counts, np.bincount(frames.ravel(), minlength = 4097))
+
+def test_running_histogram_matches_numpy(frames):
+    histogram = RunningHistogram(4097)
+    series = frames[:, 10, 20:60].astype(np.float64)
+    for values in series:
+        histogram.add_values(values)
+
+    mean, std = histogram.get_mean_std()
+    assert histogram.nb_values == series.size
+    assert mean == pytest.approx(series.mean()) and std == pytest.approx(series.std())
+    np.testing.assert_array_equal(histogram.counts, np.bincount(series.astype(np.intp).ravel(), minlength = 4097))
+
+    # Values outside of the bins only count for the mean and the standard deviation
+    histogram.add_values([-5, 5000])
+    assert histogram.counts.sum() == series.size
+    assert histogram.get_mean_std()[0] == pytest.approx(np.append(series.ravel(), [-5, 5000]).mean())
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Record / replay round trip of cameraRecorder and cameraReplay, without camera.
+"""
+
+import ctypes
+import numpy as np
+import pytest
+
+from cameraRecorder import FrameRecorder, list_chunks, read_chunk
+from cameraReplay import ReplayCamera, Replay_ERROR
+
+def record(path, frames, bit_depth, exposure = 1000, chunk_frames = 4):
+    recorder = FrameRecorder(str(path), frames.shape[1], frames.shape[2], frames.dtype, bit_depth = bit_depth,
+                             exposure = exposure, chunk_frames = chunk_frames, info = {'backend': 'test'})
+    recorder.start()
+    for index, frame in enumerate(frames):
+        recorder.push(frame, frame_id = 100 + index, timestamp = 1000000 * index)
+    return recorder.stop()
+
+@pytest.mark.parametrize("bit_depth", [ctypes.c_int(12), np.int64(12), np.uint8(12)])
+def test_round_trip_with_driver_bit_depth(tmp_path, bit_depth):
+    # The uEye driver gives its bit depth as a ctypes value (ueye.INT), numpy scalars come from the computations
+    frames = np.random.default_rng(0).integers(0, 4096, (10, 32, 48), dtype = np.uint16)
+    stats = record(tmp_path / "rec", frames, bit_depth, exposure = np.float32(1000))
+    assert stats['written'] == 10 and stats['dropped'] == 0
+
+    chunks = list_chunks(str(tmp_path / "rec"))
+    assert len(chunks) == 3
+    header, timestamps, frameIds, chunkFrames = read_chunk(chunks[0])
+    assert header['bit_depth'] == 12 and header['exposure'] == 1000 and header['backend'] == 'test'
+
+    camera = ReplayCamera(str(tmp_path / "rec"), mode = "fast", loop = False)
+    assert camera.get_bit_depth() == 12
+    assert camera.nb_frames == 10
+    for frame in frames:
+        np.testing.assert_array_equal(camera.get_image(), frame)
+    assert camera.get_image() is None
+
+def test_writer_error_keeps_the_written_chunks(tmp_path, monkeypatch):
+    frames = np.arange(10 * 4 * 6, dtype = np.uint16).reshape(10, 4, 6)
+    recorder = FrameRecorder(str(tmp_path / "rec"), 4, 6, np.uint16, bit_depth = 12, chunk_frames = 4)
+    openChunk = recorder.open_chunk
+
+    # The disk is full when the second chunk is created
+    def open_chunk():
+        if recorder.chunk_index == 0:
+            recorder.close_chunk()
+            raise OSError("No space left on device")
+        openChunk()
+    monkeypatch.setattr(recorder, "open_chunk", open_chunk)
+
+    recorder.start()
+    for index, frame in enumerate(frames):
+        recorder.push(frame, frame_id = index)
+    stats = recorder.stop()
+
+    assert "No space left" in stats['error']
+    assert stats['written'] == 4 and stats['written'] + stats['lost'] + stats['dropped'] == 10
+    assert recorder.free.qsize() == len(recorder.pool)
+    assert not recorder.push(frames[0])
+
+    header, timestamps, frameIds, chunkFrames = read_chunk(list_chunks(str(tmp_path / "rec"))[0])
+    assert header['nb_frames'] == 4
+    np.testing.assert_array_equal(chunkFrames, frames[:4])
+
+def test_replay_gives_recorded_frame_info(tmp_path):
+    frames = np.zeros((6, 16, 16), dtype = np.uint8)
+    record(tmp_path / "rec", frames, 8)
+
+    camera = ReplayCamera(str(tmp_path / "rec"), mode = "fast", loop = True)
+    infos = []
+    for index in range(12):
+        camera.get_image()
+        infos.append(camera.get_frame_info())
+
+    # Recorded values, shifted by one recording (plus one frame) at each loop
+    assert infos[:6] == [(100 + index, 1000000 * index) for index in range(6)]
+    assert infos[6:] == [(106 + index, 6000000 + 1000000 * index) for index in range(6)]
+
+def test_replay_npy_counts_frames(tmp_path):
+    np.save(tmp_path / "stack.npy", np.zeros((3, 16, 16), dtype = np.uint8))
+
+    camera = ReplayCamera(str(tmp_path / "stack.npy"), mode = "fast")
+    frameIds = []
+    for index in range(4):
+        camera.get_image()
+        frameIds.append(camera.get_frame_info()[0])
+    assert frameIds == [1, 2, 3, 4]
+
+def test_replay_npy_bit_depth_from_dtype(tmp_path):
+    # A dim 16 bits frame is still played as 16 bits, not guessed from its maximum
+    np.save(tmp_path / "frame.npy", np.full((16, 16), 300, dtype = np.uint16))
+    assert ReplayCamera(str(tmp_path / "frame.npy")).get_bit_depth() == 16
+
+@pytest.mark.parametrize("dtype", [np.float32, np.int16, np.uint32])
+def test_replay_npy_rejects_other_dtypes(tmp_path, dtype):
+    np.save(tmp_path / "frame.npy", np.zeros((16, 16), dtype = dtype))
+    with pytest.raises(Replay_ERROR):
+        ReplayCamera(str(tmp_path / "frame.npy"))